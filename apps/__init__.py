@@ -1,4 +1,6 @@
 import logging
+
+import urllib3
 from fastapi import FastAPI
 from minio import Minio, S3Error
 #from openai import AsyncOpenAI
@@ -64,11 +66,11 @@ class AppContext:
             self.app.state.db_session_factory = db_session_factory
         self.db_engine = engine
         self.db_session_factory = db_session_factory
-        # 自动建表（仅开发环境建议使用！）
+        # 自动建表（仅开发环境建议使用！），只创建不存在的表，已有表的列变更见 migrations/ 下的脚本
         # 基类
         from apps.repository.entity import Base
-        from apps.repository.entity.file_entity import FileRecordEntity
-        from apps.repository.entity.tender_entity import BidPlagiarismCheckTask, SubBidPlagiarismCheckTask, DocumentSimilarityRecord
+        from apps.repository.entity.file_entity import FileRecordEntity, FileVectorIngestEntity
+        from apps.repository.entity.tender_entity import BidPlagiarismCheckTask, SubBidPlagiarismCheckTask, DocumentSimilarityRecord, BidCheckTaskFile
         Base.metadata.create_all(bind=engine)
 
     def _init_milvus(self):
@@ -90,11 +92,18 @@ class AppContext:
         """
         初始化minio
         """
+        # 共享连接池，大小覆盖文件预取的并行下载数
+        http_client = urllib3.PoolManager(
+            maxsize=int(self.minio_config.get("pool_size", 10)),
+            timeout=urllib3.Timeout(connect=10, read=300),
+            retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        )
         minio_client = Minio(
             endpoint=self.minio_config["host"],
             access_key=self.minio_config["access_key"],
             secret_key=self.minio_config["secret_key"],
-            secure=False
+            secure=False,
+            http_client=http_client
         )
         if self.app:
             self.app.state.minio_client = minio_client
@@ -5,6 +5,8 @@ import jieba
 import numpy as np
 import requests
 
+from apps import AppContext
+
 
 class BaseVectorizer(metaclass=abc.ABCMeta):
 
@@ -22,6 +24,14 @@ class BaseVectorizer(metaclass=abc.ABCMeta):
         """
         pass
 
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成文本向量，默认逐条调用 encode，子类可重写为单次批量请求
+        :param texts: 文本列表
+        :return: 向量列表，与文本一一对应
+        """
+        return [self.encode(text) for text in texts]
+
     def preprocess_text(self, text: str) -> str:
         """
         通用文本预处理（可被子类重写）
@@ -136,6 +146,19 @@ class QwenEmbeddingVectorizer(BaseVectorizer):
         return response.data[0].embedding
 
 class OllamaQwenEmbeddingVectorizer(BaseVectorizer):
+    def __init__(self, model_name: str = None, host: str = None, batch_host: str = None):
+        """
+        模型名与接口地址默认取自 model.embedding 配置
+        :param model_name: 模型名
+        :param host: 单条向量化接口（/api/embeddings）
+        :param batch_host: 批量向量化接口（/api/embed），未配置时由 host 推出
+        """
+        embedding_config = (AppContext().app_config.get("model") or {}).get("embedding") or {}
+        self.model_name = model_name or embedding_config.get("name") or "qwen3-Embedding:0.6b"
+        self.host = host or embedding_config.get("host") or "http://localhost:11434/api/embeddings"
+        self.batch_host = batch_host or (embedding_config.get("batch_host") if host is None else None) or \
+            self.host.rsplit("/api/", 1)[0] + "/api/embed"
+
     def get_vector_dim(self) -> int:
         return 4096  # 通义千问向量维度
 
@@ -155,14 +178,14 @@ class OllamaQwenEmbeddingVectorizer(BaseVectorizer):
         
         # 构造API请求参数
         payload = {
-            "model": "qwen3-Embedding:0.6b",
+            "model": self.model_name,
             "prompt": texts
         }
 
         try:
             # 发送POST请求
             response = requests.post(
-                "http://localhost:11434/api/embeddings",
+                self.host,
                 json=payload,
                 headers={"Content-Type": "application/json"},
                 timeout=30  # 批量请求延长超时
@@ -175,5 +198,30 @@ class OllamaQwenEmbeddingVectorizer(BaseVectorizer):
             return result["embedding"]
         except requests.exceptions.RequestException as e:
             raise ValueError(f"API调用失败：{str(e)}")
+        except KeyError as e:
+            raise ValueError(f"响应解析失败：缺失字段{e}")
+
+    def encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成文本向量，一次请求完成一个微批次
+        :param texts: 文本列表
+        :return: 向量列表，与文本一一对应
+        """
+        payload = {
+            "model": self.model_name,
+            "input": texts
+        }
+
+        try:
+            response = requests.post(
+                self.batch_host,
+                json=payload,
+                headers={"Content-Type": "application/json"},
+                timeout=120  # 批量请求延长超时
+            )
+            response.raise_for_status()
+            return response.json()["embeddings"]
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"API调用失败：{str(e)}")
         except KeyError as e:
             raise ValueError(f"响应解析失败：缺失字段{e}")
\ No newline at end of file
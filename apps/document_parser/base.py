@@ -1,3 +1,8 @@
+from array import array
+from bisect import bisect_right
+from typing import List
+
+
 
 class HFiledocument:
     def __init__(self, file_id, page, page_content):
@@ -30,4 +35,101 @@ class HDocument:
         self.file_id = file_id
         self.page = page
         self.start_index = start_index
-        self.text:str = text
\ No newline at end of file
+        self.text:str = text
+
+    @property
+    def end_index(self) -> int:
+        return self.start_index + len(self.text)
+
+class HChunk:
+    """
+    切片视图，与 HDocument 属性一致，只记录在切片列表中的下标，文本在访问时才从文本缓冲区中截取；
+    跨页切片的页码与页内起始位置按页面起始位置数组二分查找得到
+    """
+    __slots__ = ("chunks", "index")
+
+    def __init__(self, chunks: "HChunkList", index: int):
+        self.chunks = chunks
+        self.index = index
+
+    def _page_index(self) -> int:
+        """切片起始位置所在页面在缓冲区页面数组中的下标"""
+        return bisect_right(self.chunks.page_starts[self.chunks.text_refs[self.index]], self.chunks.starts[self.index]) - 1
+
+    @property
+    def file_id(self):
+        return self.chunks.file_ids[self.chunks.text_refs[self.index]]
+
+    @property
+    def page(self) -> int:
+        return self.chunks.page_numbers[self.chunks.text_refs[self.index]][self._page_index()]
+
+    @property
+    def start_index(self) -> int:
+        """切片在起始页面（空白归一化后）文本中的起始位置"""
+        return self.chunks.starts[self.index] - self.chunks.page_starts[self.chunks.text_refs[self.index]][self._page_index()]
+
+    @property
+    def end_index(self) -> int:
+        """切片结束位置，与 start_index 使用同一坐标，跨页切片可超过起始页面长度"""
+        return self.start_index + self.chunks.ends[self.index] - self.chunks.starts[self.index]
+
+    @property
+    def text(self) -> str:
+        return self.chunks.texts[self.chunks.text_refs[self.index]][self.chunks.starts[self.index]:self.chunks.ends[self.index]]
+
+
+class HChunkList:
+    """
+    切片列表，切片以 (文本缓冲区, 起始位置, 结束位置) 偏移量保存在数组中，不为每个切片复制子串，
+    按下标或迭代访问时返回 HChunk 视图。
+    文本缓冲区为单页文本（按页切片）或多页拼接的文本（文档级切片），缓冲区内各页面的起始位置有序保存
+    """
+
+    def __init__(self):
+        self.texts: List[str] = []  # 文本缓冲区（空白归一化后）
+        self.file_ids = []
+        self.page_starts: List[array] = []  # 每个缓冲区内各页面的起始位置（升序）
+        self.page_numbers: List[array] = []  # 每个缓冲区内各页面的页码
+        self.text_refs = array("l")  # 切片所在缓冲区在 texts 中的下标
+        self.starts = array("l")
+        self.ends = array("l")
+
+    def add_text(self, file_id, text: str, page_starts: array, page_numbers: array) -> int:
+        """登记文本缓冲区，返回缓冲区下标"""
+        self.texts.append(text)
+        self.file_ids.append(file_id)
+        self.page_starts.append(page_starts)
+        self.page_numbers.append(page_numbers)
+        return len(self.texts) - 1
+
+    def add_page(self, file_id, page: int, text: str) -> int:
+        """登记单页文本缓冲区，返回缓冲区下标"""
+        return self.add_text(file_id, text, array("l", [0]), array("l", [page]))
+
+    def add(self, text_ref: int, start: int, end: int):
+        self.text_refs.append(text_ref)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> HChunk:
+        if index < 0:
+            index += len(self.starts)
+        if not 0 <= index < len(self.starts):
+            raise IndexError("切片下标越界")
+        return HChunk(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.starts)):
+            yield HChunk(self, index)
+
+
+class HTable:
+    def __init__(self, file_id, page, index, rows):
+        self.file_id = file_id
+        self.page = page
+        self.index = index  # 表格在页面中的序号
+        self.rows: list[list[str]] = rows  # 归一化后的行、单元格文本
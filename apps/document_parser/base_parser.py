@@ -1,12 +1,17 @@
 from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
 import re
-from typing import List
+from typing import Iterable, Iterator, Tuple
 
-from apps.document_parser.base import HDocument, HFiledocument
+from apps.document_parser.base import HChunk, HChunkList, HDocument, HFiledocument
 
 
 class BaseParser(ABC):
-   
+
+    # 解析器版本，解析/切片逻辑变更时需递增，使解析缓存失效
+    PARSER_VERSION = "1"
+
     @abstractmethod
     def parse(self, filename=None, stream=None, file_id = None) -> HFiledocument:
         """
@@ -19,6 +24,19 @@ class BaseParser(ABC):
         :rtype: str
         """ 
         pass
+
+    def iter_pages(self, filename=None, stream=None, file_id = None) -> Iterator[HFiledocument]:
+        """
+        流式解析，逐页产出页面，默认基于 parse 的结果迭代，解析器可重写为真正的惰性解析
+
+        :param filename: 需要解析的文件
+        :param stream: 二进制流
+        :param file_id: 文件标识id
+        :return: 页面生成器
+        """
+        file_document = self.parse(filename=filename, stream=stream, file_id=file_id)
+        if file_document is not None:
+            yield from file_document
     
     def clean_text(self, text: str) -> str:
         """
@@ -43,21 +61,11 @@ class BaseParser(ABC):
 
     def _get_stop_words(self):
         """加载中文停用词（无实际语义的词，如：的、了、在）"""
-        stop_words = [
-            '的', '了', '在', '是', '我', '你', '他', '她', '它', '我们', '你们', '他们',
-            '和', '或', '但', '如果', '就', '都', '也', '还', '只', '个', '本', '该',
-            '及', '与', '等', '对', '对于', '关于', '根据', '按照', '为了', '由于',
-            '之', '其', '所', '以', '而', '并', '又', '且', '即', '则', '因', '故'
-        ]
-        return stop_words
+        return list(STOP_WORDS)
     
     def preprocess_text(self, text):
         """文本预处理：去特殊符号、去多余空格、统一格式"""
-        # 去除特殊符号（保留中文、英文、数字）
-        text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', ' ', text)
-        # 去除多余空格（多个空格合并为一个，首尾空格去除）
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
+        return preprocess_text(text)
 
     
     # def langchain_text_splitting(file_path: str, chunk_size: int = 2000, overlap: int = 100) -> list[str]:
@@ -80,7 +88,7 @@ class BaseParser(ABC):
     #     return [document.page_content for document in documents]
 
     
-    def overlapping_splitting(self, filedocument: HFiledocument, chunk_size: int = 2000, overlap: int = 100) -> List[HDocument]:
+    def overlapping_splitting(self, filedocument: HFiledocument, chunk_size: int = 2000, overlap: int = 100) -> HChunkList:
         """
         重叠切片逻辑，将长文本内容切割成不同的小段，选择重叠切片，真强语义的连贯性
         
@@ -90,61 +98,235 @@ class BaseParser(ABC):
         :type chunk_size: int
         :param overlap: 重叠部分的长度
         :type overlap: int
-        :return: 返回字符串数组，为切好的多片段数据
-        :rtype: list[str]
+        :return: 切片列表，切片以偏移量保存，访问文本时才截取
+        :rtype: HChunkList
         """
-        documents:list[HDocument] = []
+        chunks = HChunkList()
+        if filedocument is None:
+            return chunks
         for pageducument in filedocument:
-            text = pageducument.page_content
-            punctuations: str = r'，  。！？；…'
-            text = re.sub(r'\s+', ' ', text).strip()
-            text_length = len(text)
-            current_start = 0
-            if text_length <= chunk_size:
-                document = HDocument(pageducument.file_id, pageducument.page, current_start, text[current_start:])
-                documents.append(document)
-                continue
-            # 编译正则：匹配任意结束标点（用于快速查找）
-            punctuation_pattern = re.compile(f'[{punctuations}]')
-            chunks = []
-            
-            while current_start < text_length:
-                # 1. 计算目标结束位置（当前起始 + 目标长度）
-                target_end = current_start + chunk_size
-                
-                # 2. 处理边界：如果目标结束超过文本长度，直接取剩余部分
-                if target_end >= text_length:
-                    chunks.append(text[current_start:])
-                    document = HDocument(pageducument.file_id, pageducument.page, current_start, text[current_start:])
-                    documents.append(document)
-                    break
-                
-                # 3. 检查目标结束位置是否是标点
-                if text[target_end] in punctuations:
-                    split_end = target_end + 1  # 包含标点
-                else:
-                    # 4. 向后找最近的标点（最多搜索200字符，避免无标点极端情况）
-                    match = punctuation_pattern.search(text, target_end, target_end + 200)
-                    if match:
-                        split_end = match.end()  # 匹配到的标点结束位置
-                    else:
-                        # 兜底：找不到标点则按目标长度切分
-                        split_end = target_end
-                
-                # 5. 截取当前块并加入列表
-                current_chunk = text[current_start:split_end]
-                chunks.append(current_chunk)
-                document = HDocument(pageducument.file_id, pageducument.page, current_start, current_chunk)
-                documents.append(document)
-                # 6. 更新下一块的起始位置（当前结束 - 重叠长度）
-                current_start = split_end - overlap
-                
-                # 防护：避免起始位置回退过多（比如重叠长度大于当前块）
-                if current_start < 0:
-                    current_start = 0
-                # 防护：避免死循环（相邻起始位置无变化）
-                if current_start >= text_length or (len(chunks) >= 2 and current_start == chunks[-2]):
-                    break
-            
-        return documents
+            self._split_page(chunks, pageducument, chunk_size, overlap)
+        return chunks
+
+    def iter_splitting(self, pages: Iterable[HFiledocument], chunk_size: int = 2000, overlap: int = 100) -> Iterator[HChunk]:
+        """
+        流式重叠切片，逐页消费页面并逐个产出切片，不在内存中保留全部切片
+
+        :param pages: 页面迭代器，可以是页面链表，也可以是 iter_pages 产出的生成器
+        :param chunk_size: 切片大小
+        :param overlap: 重叠部分的长度
+        :return: 切片生成器
+        """
+        for pageducument in pages:
+            # 每页单独的切片列表，页面处理完即可释放
+            chunks = HChunkList()
+            self._split_page(chunks, pageducument, chunk_size, overlap)
+            yield from chunks
+
+    def _split_page(self, chunks: HChunkList, pageducument: HFiledocument, chunk_size: int, overlap: int):
+        """
+        单页切片，结果以偏移量追加到切片列表
+        """
+        text = normalize_page_text(pageducument.page_content)
+        page_ref = chunks.add_page(pageducument.file_id, pageducument.page, text)
+        for start, end in split_offsets(text, chunk_size, overlap):
+            chunks.add(page_ref, start, end)
+
+    def document_splitting(self, filedocument: HFiledocument, chunk_size: int = 2000, overlap: int = 100) -> HChunkList:
+        """
+        文档级重叠切片，各页文本拼接为一个缓冲区后整体切片，跨页的段落不会在分页处被截断为两个短片段；
+        切片的页码与页内起始位置按页面起始位置二分查找得到
+
+        :param filedocument: 页面链表
+        :param chunk_size: 切片大小
+        :param overlap: 重叠部分的长度
+        :return: 切片列表
+        """
+        chunks = HChunkList()
+        if filedocument is None:
+            return chunks
+        text, page_starts, page_numbers = join_pages(filedocument)
+        if not text:
+            return chunks
+        text_ref = chunks.add_text(filedocument.file_id, text, page_starts, page_numbers)
+        for start, end, _ in _iter_splits(text, 0, chunk_size, overlap, True):
+            chunks.add(text_ref, start, end)
+        return chunks
+
+    def iter_document_splitting(self, pages: Iterable[HFiledocument], chunk_size: int = 2000, overlap: int = 100) -> Iterator[HChunk]:
+        """
+        文档级流式切片，结果与 document_splitting 一致，只在内存中保留尚未切分的文本
+
+        :param pages: 页面迭代器
+        :param chunk_size: 切片大小
+        :param overlap: 重叠部分的长度
+        :return: 切片生成器
+        """
+        splitter = DocumentSplitter(chunk_size, overlap)
+        for pageducument in pages:
+            yield from splitter.add_page(pageducument)
+        yield from splitter.finish()
+
+
+# 中文停用词（无实际语义的词）
+STOP_WORDS = (
+    '的', '了', '在', '是', '我', '你', '他', '她', '它', '我们', '你们', '他们',
+    '和', '或', '但', '如果', '就', '都', '也', '还', '只', '个', '本', '该',
+    '及', '与', '等', '对', '对于', '关于', '根据', '按照', '为了', '由于',
+    '之', '其', '所', '以', '而', '并', '又', '且', '即', '则', '因', '故'
+)
+
+# 切片模式：page 按页切片，document 各页拼接后文档级切片
+CHUNKING_PAGE = "page"
+CHUNKING_DOCUMENT = "document"
+
+# 切片结束标点（含空格，空白已统一为单个空格）
+_PUNCTUATIONS = r'，  。！？；…'
+_punctuation_pattern = re.compile(f'[{_PUNCTUATIONS}]')
+_whitespace_pattern = re.compile(r'\s+')
+# 目标结束位置之后向后查找标点的最大距离，避免无标点极端情况
+_PUNCTUATION_LOOKAHEAD = 200
+# 文档级切片时页面之间的分隔符
+PAGE_SEPARATOR = " "
+
+
+def preprocess_text(text: str) -> str:
+    """文本预处理：去特殊符号、去多余空格、统一格式"""
+    # 去除特殊符号（保留中文、英文、数字）
+    text = re.sub(r'[^\u4e00-\u9fa5a-zA-Z0-9]', ' ', text)
+    # 去除多余空格（多个空格合并为一个，首尾空格去除）
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def normalize_page_text(text: str) -> str:
+    """页面文本空白归一化，切片偏移量基于归一化后的文本"""
+    return _whitespace_pattern.sub(' ', text).strip()
+
+
+def join_pages(pages: Iterable[HFiledocument]) -> Tuple[str, array, array]:
+    """
+    拼接各页（空白归一化后）文本，空页面跳过
+    :return: (拼接文本, 各页面起始位置, 各页面页码)
+    """
+    texts = []
+    page_starts = array("l")
+    page_numbers = array("l")
+    length = 0
+    for pageducument in pages:
+        text = normalize_page_text(pageducument.page_content)
+        if not text:
+            continue
+        if texts:
+            length += len(PAGE_SEPARATOR)
+        page_starts.append(length)
+        page_numbers.append(pageducument.page)
+        texts.append(text)
+        length += len(text)
+    return PAGE_SEPARATOR.join(texts), page_starts, page_numbers
+
+
+def split_offsets(text: str, chunk_size: int, overlap: int) -> Iterator[Tuple[int, int]]:
+    """
+    计算单页文本的切片偏移量
+    一次扫描得到所有标点位置，切分点通过二分查找目标结束位置之后最近的标点确定，
+    整体为线性复杂度，不为每个切片复制子串
+
+    :param text: 空白归一化后的页面文本
+    :param chunk_size: 切片大小
+    :param overlap: 重叠部分的长度
+    :return: (起始位置, 结束位置) 生成器，左闭右开
+    """
+    if len(text) <= chunk_size:
+        yield 0, len(text)
+        return
+    for start, end, _ in _iter_splits(text, 0, chunk_size, overlap, True):
+        yield start, end
+
+
+def _iter_splits(text: str, current_start: int, chunk_size: int, overlap: int, final: bool) -> Iterator[Tuple[int, int, int]]:
+    """
+    从 current_start 开始切分文本
+    :param final: 文本是否已完整；为False时，切分点无法确定（后续还有文本）的位置停止
+    :return: (起始位置, 结束位置, 下一块起始位置) 生成器
+    """
+    text_length = len(text)
+    boundaries = array("l", (match.start() for match in _punctuation_pattern.finditer(text, current_start)))
+    boundary_count = len(boundaries)
+    while current_start < text_length:
+        target_end = current_start + chunk_size
+        if not final and target_end + _PUNCTUATION_LOOKAHEAD > text_length:
+            return
+        # 剩余部分不足一个切片，直接取剩余部分
+        if target_end >= text_length:
+            yield current_start, text_length, text_length
+            return
+        # 目标结束位置或之后最近的标点（包含标点），找不到则按目标长度切分
+        index = bisect_left(boundaries, target_end)
+        if index < boundary_count and boundaries[index] < target_end + _PUNCTUATION_LOOKAHEAD:
+            split_end = boundaries[index] + 1
+        else:
+            split_end = target_end
+        # 下一块的起始位置（当前结束 - 重叠长度），重叠长度不小于切片时不回退，避免死循环
+        next_start = max(split_end - overlap, 0)
+        next_start = next_start if next_start > current_start else split_end
+        yield current_start, split_end, next_start
+        current_start = next_start
+
+
+class DocumentSplitter:
+    """
+    文档级流式切片器，逐页追加文本，切分点确定的切片立即产出，
+    已产出切片之前的文本随即丢弃，缓冲区只保留未切分的尾部文本
+    """
+
+    def __init__(self, chunk_size: int, overlap: int):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.file_id = None
+        self.buffer = ""
+        self.page_starts = array("l")  # 缓冲区内各页面起始位置，丢弃文本后可为负数
+        self.page_numbers = array("l")
+        self.current_start = 0
+        self.has_text = False
+
+    def add_page(self, pageducument: HFiledocument) -> HChunkList:
+        """追加页面，返回切分点已确定的切片"""
+        text = normalize_page_text(pageducument.page_content)
+        if not text:
+            return HChunkList()
+        if self.has_text:
+            self.buffer += PAGE_SEPARATOR
+        self.has_text = True
+        self.file_id = pageducument.file_id
+        self.page_starts.append(len(self.buffer))
+        self.page_numbers.append(pageducument.page)
+        self.buffer += text
+        return self._split(False)
+
+    def finish(self) -> HChunkList:
+        """文档结束，返回剩余切片"""
+        return self._split(True)
+
+    def _split(self, final: bool) -> HChunkList:
+        chunks = HChunkList()
+        if not self.buffer:
+            return chunks
+        # 页面数组复制一份，后续追加页面不影响已产出的切片
+        text_ref = chunks.add_text(self.file_id, self.buffer, array("l", self.page_starts), array("l", self.page_numbers))
+        for start, end, next_start in _iter_splits(self.buffer, self.current_start, self.chunk_size, self.overlap, final):
+            chunks.add(text_ref, start, end)
+            self.current_start = next_start
+        self._trim()
+        return chunks
 
+    def _trim(self):
+        """丢弃下一块起始位置之前的文本"""
+        cut = self.current_start
+        if cut <= 0:
+            return
+        first_page = bisect_right(self.page_starts, cut) - 1
+        self.buffer = self.buffer[cut:]
+        self.page_starts = array("l", (page_start - cut for page_start in self.page_starts[first_page:]))
+        self.page_numbers = self.page_numbers[first_page:]
+        self.current_start = 0
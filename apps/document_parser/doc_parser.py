@@ -0,0 +1,138 @@
+import re
+import zipfile
+from io import BytesIO
+from typing import Iterator, List
+from xml.etree import ElementTree
+
+from apps.document_parser.base import HFiledocument
+from apps.document_parser.base_parser import BaseParser
+
+# WordprocessingML 命名空间
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_BODY = f"{_W}body"
+_PARAGRAPH = f"{_W}p"
+_TEXT = f"{_W}t"
+_TAB = f"{_W}tab"
+_BREAK = f"{_W}br"
+_RENDERED_PAGE_BREAK = f"{_W}lastRenderedPageBreak"
+_PAGE_BREAK_BEFORE = f"{_W}pageBreakBefore"
+_SECTION_PROPERTIES = f"{_W}sectPr"
+_TYPE = f"{_W}type"
+_VAL = f"{_W}val"
+
+
+class DocxParser(BaseParser):
+    """
+    Word（docx）解析器
+    从 zip 包中流式读取 word/document.xml，使用增量XML解析（iterparse）逐段落处理，处理完的元素立即清除，
+    内存占用与文档大小无关。按分页符（显式分页、段前分页、分节符、Word保存时记录的排版分页）切分页面，
+    没有分页信息的长文档按 max_page_chars 切分为多个节，页眉页脚位于独立的 header/footer 部件中，不会进入正文
+    """
+
+    PARSER_VERSION = "1"
+
+    def __init__(self, max_page_chars: int = 5000):
+        """
+        :param max_page_chars: 单页（节）最大字符数，超过后在段落边界切分
+        """
+        self.max_page_chars = max_page_chars
+
+    def iter_pages(self, filename=None, stream=None, file_id = None) -> Iterator[HFiledocument]:
+        """
+        流式解析，逐页（节）产出页面
+
+        :param filename: 需要解析的文件，使用路径
+        :param stream: 数据流（可选）,如果要解析的是二进制流则使用该参数
+        :param file_id: 文件在数据库表中的id
+        :return: 页面生成器
+        """
+        if isinstance(stream, (bytes, bytearray)):
+            stream = BytesIO(stream)
+        try:
+            with zipfile.ZipFile(filename or stream) as docx, docx.open("word/document.xml") as document_xml:
+                yield from self._iter_document_pages(document_xml, file_id)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+            raise ValueError(f"标书Word解析失败：{str(e)}")
+
+    def _iter_document_pages(self, document_xml, file_id) -> Iterator[HFiledocument]:
+        page_num = 0
+        lines: List[str] = []  # 当前页已完成的段落
+        line_chars = 0
+        texts: List[str] = []  # 当前段落的文本
+        section_end = False  # 当前段落是本节最后一个段落
+        body = None
+        depth = 0
+
+        def end_line():
+            nonlocal line_chars
+            line = "".join(texts).strip()
+            texts.clear()
+            if line:
+                lines.append(line)
+                line_chars += len(line)
+
+        def end_page():
+            nonlocal line_chars
+            page_text = re.sub(r'\n+', '\n', "\n".join(lines)).strip()
+            lines.clear()
+            line_chars = 0
+            return HFiledocument(file_id, page_num, page_text) if page_text else None
+
+        for event, elem in ElementTree.iterparse(document_xml, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                depth += 1
+                if tag == _BODY:
+                    body = elem
+                elif (tag == _RENDERED_PAGE_BREAK
+                      or (tag == _BREAK and elem.get(_TYPE) == "page")
+                      or (tag == _PAGE_BREAK_BEFORE and elem.get(_VAL) not in ("0", "false"))):
+                    # 分页：当前段落已识别的文本归入上一页
+                    end_line()
+                    page = end_page()
+                    if page:
+                        yield page
+                        page_num += 1
+                continue
+            depth -= 1
+            if tag == _TEXT:
+                texts.append(elem.text or "")
+            elif tag == _TAB:
+                texts.append(" ")
+            elif tag == _SECTION_PROPERTIES and depth > 2:
+                # 段落属性中的分节符，在该段落结束后分页（正文末尾的 sectPr 为整篇文档的节属性）
+                section_end = True
+            elif tag == _PARAGRAPH:
+                end_line()
+                if section_end or line_chars >= self.max_page_chars:
+                    section_end = False
+                    page = end_page()
+                    if page:
+                        yield page
+                        page_num += 1
+            # 正文的直接子元素（段落、表格）处理完后整体清除，保证内存占用恒定
+            if depth == 2 and body is not None:
+                body.clear()
+        end_line()
+        page = end_page()
+        if page:
+            yield page
+
+    def parse(self, filename=None, stream=None, file_id = None) -> HFiledocument:
+        """
+        文档解析器功能，将文件中的内容转化为可读字符串
+
+        :param filename: 需要解析的文件，使用路径
+        :param stream: 数据流（可选）,如果要解析的是二进制流则使用该参数
+        :param file_id: 文件在数据库表中的id
+        :return: 页面链表的头节点
+        """
+        file_document = None
+        top = None
+        for current in self.iter_pages(filename, stream, file_id):
+            if file_document:
+                file_document.next = current
+            else:
+                top = current
+            file_document = current
+        return top
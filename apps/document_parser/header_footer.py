@@ -0,0 +1,108 @@
+import hashlib
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# 页眉页脚区域：页面上下15%
+EDGE_RATIO = 0.15
+
+_digit_pattern = re.compile(r'\d+')
+_space_pattern = re.compile(r'\s+')
+
+# 文本块：(文本, 边缘区域文本哈希)，不在页眉页脚区域的文本块哈希为None
+PageBlocks = List[Tuple[str, Optional[int]]]
+
+
+def edge_block_hash(text: str) -> int:
+    """
+    页眉页脚区域文本块的归一化哈希：去除空白、数字统一替换为#，
+    使 "第9页"、"第10页" 这类只有页码不同的页脚得到相同哈希
+    """
+    normalized = _digit_pattern.sub("#", _space_pattern.sub("", text))
+    return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+class RepeatedBlockFilter:
+    """
+    跨页重复页眉页脚检测
+    统计页眉页脚区域每个文本块哈希出现的页数，出现页数超过一定比例的文本块视为页眉页脚并删除；
+    只出现一次的短文本（如正文中 "见第9页"）予以保留。
+    流式解析时先缓冲前 window 页统计后统一判定，之后的页面使用累计统计逐页判定。
+    """
+
+    def __init__(self, repeat_ratio: float = 0.3, min_pages: int = 3, window: Optional[int] = 30,
+                 fallback: Callable[[str], bool] = None):
+        """
+        :param repeat_ratio: 出现页数占比超过该值视为重复页眉页脚
+        :param min_pages: 文本页数少于该值时无法统计重复，使用 fallback 逐块判断
+        :param window: 先缓冲统计的页数，None 表示缓冲整本文档
+        :param fallback: 页数不足时的判断函数，参数为文本块内容
+        """
+        self.repeat_ratio = repeat_ratio
+        self.min_pages = min_pages
+        self.window = window
+        self.fallback = fallback
+        self.page_counts: Dict[int, int] = {}
+        self.text_pages = 0
+
+    def _is_repeated(self, page_count: int) -> bool:
+        return page_count >= max(self.min_pages, self.repeat_ratio * self.text_pages)
+
+    def _count(self, blocks: PageBlocks):
+        self.text_pages += 1
+        for edge_hash in {edge_hash for _, edge_hash in blocks if edge_hash is not None}:
+            self.page_counts[edge_hash] = self.page_counts.get(edge_hash, 0) + 1
+
+    def _filter_buffer(self, buffer: List[Tuple[int, Optional[PageBlocks]]]) -> Iterator[Tuple[int, Optional[PageBlocks]]]:
+        """对缓冲页面一次性向量化判定"""
+        if self.text_pages < self.min_pages:
+            for page_num, blocks in buffer:
+                if blocks is None:
+                    yield page_num, None
+                    continue
+                yield page_num, [
+                    block for block in blocks
+                    if block[1] is None or not (self.fallback and self.fallback(block[0]))
+                ]
+            return
+        repeated = np.fromiter(
+            (edge_hash for edge_hash, page_count in self.page_counts.items() if self._is_repeated(page_count)),
+            dtype=np.int64
+        )
+        edge_hashes = np.fromiter(
+            (edge_hash for _, blocks in buffer if blocks for _, edge_hash in blocks if edge_hash is not None),
+            dtype=np.int64
+        )
+        drop = iter(np.isin(edge_hashes, repeated).tolist())
+        for page_num, blocks in buffer:
+            if blocks is None:
+                yield page_num, None
+                continue
+            yield page_num, [block for block in blocks if block[1] is None or not next(drop)]
+
+    def filter(self, pages: Iterable[Tuple[int, Optional[PageBlocks]]]) -> Iterator[Tuple[int, Optional[PageBlocks]]]:
+        """
+        过滤页眉页脚
+        :param pages: (页码, 文本块列表) 迭代器，扫描页的文本块列表为None
+        :return: 过滤后的 (页码, 文本块列表) 生成器
+        """
+        buffer = []
+        pages = iter(pages)
+        for page_num, blocks in pages:
+            buffer.append((page_num, blocks))
+            if blocks is not None:
+                self._count(blocks)
+            if self.window is not None and self.text_pages >= self.window:
+                break
+        yield from self._filter_buffer(buffer)
+        del buffer
+        for page_num, blocks in pages:
+            if blocks is None:
+                yield page_num, None
+                continue
+            self._count(blocks)
+            yield page_num, [
+                block for block in blocks
+                if block[1] is None or not self._is_repeated(self.page_counts[block[1]])
+            ]
@@ -0,0 +1,208 @@
+import copy
+import hashlib
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# OCR识别结果：[(文本行纵向中心位置占图片高度的比例, 文本)]
+OcrLines = List[Tuple[float, str]]
+
+
+# 版面分析保留送入识别的区域类型，页眉、页脚、图片（印章、签字）等区域在识别前丢弃
+LAYOUT_KEEP_LABELS = ("text", "title", "table")
+
+
+class LocalOcrEngine:
+    """
+    本地CPU OCR引擎，使用项目自带的 PP-OCRv4 检测、识别模型
+    配置版面分析模型时，先对整页做版面分析，只对正文、标题、表格区域做文本检测与识别；
+    一批图片的文本行裁剪图合并后，交给识别模型按 rec_batch_num 批量识别
+    """
+
+    def __init__(self, det_model_dir: str, rec_model_dir: str, rec_batch_num: int = 32,
+                 drop_score: float = 0.5, cpu_threads: int = 1, layout_model_dir: str = None,
+                 layout_keep_labels=LAYOUT_KEEP_LABELS):
+        """
+        :param det_model_dir: 文本检测模型目录
+        :param rec_model_dir: 文本识别模型目录
+        :param rec_batch_num: 识别模型单次推理的文本行数
+        :param drop_score: 识别置信度低于该值的文本行丢弃
+        :param cpu_threads: 单个引擎的推理线程数，多进程部署时每个进程使用少量线程
+        :param layout_model_dir: 版面分析模型目录（CDLA版面类别），为空时整页识别
+        :param layout_keep_labels: 送入识别的版面区域类型
+        """
+        self.layout_predictor = None
+        self.layout_keep_labels = set(layout_keep_labels)
+        if layout_model_dir:
+            self.layout_predictor = _create_layout_predictor(layout_model_dir, cpu_threads)
+        from paddleocr import PaddleOCR
+        self.engine = PaddleOCR(
+            det_model_dir=det_model_dir,
+            rec_model_dir=rec_model_dir,
+            use_angle_cls=False,
+            lang="ch",
+            ocr_version="PP-OCRv4",
+            use_gpu=False,
+            cpu_threads=cpu_threads,
+            rec_batch_num=rec_batch_num,
+            show_log=False
+        )
+        self.drop_score = drop_score
+
+    def recognize(self, images: List[np.ndarray]) -> List[OcrLines]:
+        """
+        批量识别图片中的文字
+        :param images: BGR格式图片数组列表
+        :return: 每张图片的识别结果，文本行按阅读顺序排列
+        """
+        from paddleocr.tools.infer.predict_system import sorted_boxes
+        from paddleocr.tools.infer.utility import get_rotate_crop_image
+
+        crops = []
+        owners = []
+        for image_index, image in enumerate(images):
+            image_height = image.shape[0]
+            for x0, y0, region in self._text_regions(image):
+                dt_boxes, _ = self.engine.text_detector(region)
+                if dt_boxes is None or len(dt_boxes) == 0:
+                    continue
+                for box in sorted_boxes(dt_boxes):
+                    crops.append(get_rotate_crop_image(region, copy.deepcopy(box)))
+                    owners.append((image_index, (y0 + float(box[:, 1].mean())) / image_height))
+        results: List[OcrLines] = [[] for _ in images]
+        if not crops:
+            return results
+        # 跨图片合并后批量识别
+        rec_res, _ = self.engine.text_recognizer(crops)
+        for (image_index, y_ratio), (text, score) in zip(owners, rec_res):
+            if score >= self.drop_score and text.strip():
+                results[image_index].append((y_ratio, text.strip()))
+        return results
+
+    def _text_regions(self, image: np.ndarray) -> List[Tuple[int, int, np.ndarray]]:
+        """
+        版面分析，返回需要识别的区域 [(区域左上角x, 区域左上角y, 区域图片)]，按阅读顺序排列
+        未配置版面分析模型时整张图片作为一个区域
+        """
+        if self.layout_predictor is None:
+            return [(0, 0, image)]
+        layout_res, _ = self.layout_predictor(image)
+        regions = []
+        height, width = image.shape[:2]
+        for region in layout_res:
+            if region["label"] not in self.layout_keep_labels:
+                continue
+            x0, y0, x1, y1 = (int(round(value)) for value in region["bbox"])
+            x0, y0 = max(x0, 0), max(y0, 0)
+            x1, y1 = min(x1, width), min(y1, height)
+            if x1 > x0 and y1 > y0:
+                regions.append((x0, y0, image[y0:y1, x0:x1]))
+        regions.sort(key=lambda item: (item[1], item[0]))
+        return regions
+
+
+def _create_layout_predictor(layout_model_dir: str, cpu_threads: int):
+    """加载 PP-Structure 版面分析模型（picodet CDLA 十类版面）"""
+    import paddleocr
+    from paddleocr.ppstructure.layout.predict_layout import LayoutPredictor
+    from paddleocr.ppstructure.utility import init_args
+
+    args = init_args().parse_args([])
+    args.layout_model_dir = layout_model_dir
+    args.layout_dict_path = os.path.join(
+        os.path.dirname(paddleocr.__file__), "ppocr", "utils", "dict", "layout_dict", "layout_cdla_dict.txt"
+    )
+    args.use_gpu = False
+    args.cpu_threads = cpu_threads
+    return LayoutPredictor(args)
+
+
+# OCR子进程中的引擎，每个进程只加载一次模型
+_worker_engine: LocalOcrEngine = None
+
+
+def _init_ocr_worker(engine_kwargs: dict):
+    global _worker_engine
+    _worker_engine = LocalOcrEngine(**engine_kwargs)
+
+
+def _ocr_batch(images: List[np.ndarray]) -> List[OcrLines]:
+    return _worker_engine.recognize(images)
+
+
+class OcrPool:
+    """
+    OCR进程池，每个子进程加载一次模型，调用方按批提交图片
+    进程池在多个文档之间共享，多个文档同时解析时各自的批次由同一组进程处理
+    """
+
+    def __init__(self, det_model_dir: str, rec_model_dir: str, pool_size: int = 0, batch_size: int = 8,
+                 rec_batch_num: int = 32, drop_score: float = 0.5, layout_model_dir: str = None,
+                 layout_keep_labels=LAYOUT_KEEP_LABELS):
+        """
+        :param pool_size: 子进程数，0 表示使用 CPU 核数
+        :param batch_size: 每批提交的图片数
+        :param layout_model_dir: 版面分析模型目录，配置后页眉页脚由版面分析剔除
+        """
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self.batch_size = batch_size
+        # 是否已经过版面分析路由（页眉页脚、图片区域已在识别前剔除）
+        self.layout_routed = bool(layout_model_dir)
+        engine_kwargs = {
+            "det_model_dir": det_model_dir,
+            "rec_model_dir": rec_model_dir,
+            "rec_batch_num": rec_batch_num,
+            "drop_score": drop_score,
+            "layout_model_dir": layout_model_dir,
+            "layout_keep_labels": tuple(layout_keep_labels),
+            # 多进程并行，每个进程单线程推理，避免线程争抢
+            "cpu_threads": 1,
+        }
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            initializer=_init_ocr_worker,
+            initargs=(engine_kwargs,)
+        )
+
+    def submit(self, images: List[np.ndarray]) -> Future:
+        """提交一批图片，返回 Future，结果为每张图片的识别结果"""
+        return self.executor.submit(_ocr_batch, images)
+
+    def recognize(self, images: List[np.ndarray]) -> List[OcrLines]:
+        """按 batch_size 切分后并行识别，结果顺序与图片顺序一致"""
+        futures = [self.submit(images[start:start + self.batch_size]) for start in range(0, len(images), self.batch_size)]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+class ImageOcrCache:
+    """
+    图片OCR结果缓存，以图片内容哈希为键，同一张图片只识别一次
+    同一文档中多页共用的图片（公章、信笺抬头）以及同一任务中不同投标人嵌入的相同图片共享识别结果；
+    缓存只保存识别出的文本行，可在整个查重任务的所有文档之间共享
+    """
+
+    def __init__(self):
+        self.results: Dict[str, OcrLines] = {}
+        self.hits = 0
+
+    @staticmethod
+    def image_key(raw: bytes) -> str:
+        """图片内容哈希，使用PDF中图片的原始（未解码）数据计算，不需要先解码图片"""
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[OcrLines]:
+        lines = self.results.get(key)
+        if lines is not None:
+            self.hits += 1
+        return lines
+
+    def put(self, key: str, lines: OcrLines):
+        self.results[key] = lines
@@ -0,0 +1,196 @@
+import json
+import os
+import zlib
+from typing import Iterable, Optional, Tuple
+
+from apps.document_parser.base import HChunkList, HDocument, HFiledocument
+from apps.document_parser.base_parser import CHUNKING_DOCUMENT, CHUNKING_PAGE, join_pages, normalize_page_text
+
+
+class ParseCache:
+    """
+    解析结果缓存
+    以 (文件内容SHA256, 解析器版本, chunk_size, overlap, 切片模式) 为键，将解析后的页面与切片结果
+    按行压缩后存放在本地磁盘，超过容量上限时按最近访问时间（LRU）淘汰。
+    投标人重复提交相同附件、任务重跑时，命中缓存即可跳过下载与PDF解析。
+    """
+
+    SUFFIX = ".jsonl.z"
+    # 缓存文件格式版本，格式变更时递增（切片只保存偏移量，读取时从页面文本截取）
+    FORMAT_VERSION = "2"
+    # 其他解析产物（如表格结构），按 (产物类型, 内容哈希, 产物版本) 缓存
+    ARTIFACT_SUFFIX = ".json.z"
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存目录容量上限（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, content_hash: str, parser_version: str, chunk_size: int, overlap: int,
+              chunking_mode: str = CHUNKING_PAGE) -> str:
+        return os.path.join(
+            self.cache_dir,
+            f"{content_hash}_v{parser_version}_{chunk_size}_{overlap}_{chunking_mode}_f{self.FORMAT_VERSION}{self.SUFFIX}"
+        )
+
+    def contains(self, content_hash: str, parser_version: str, chunk_size: int, overlap: int,
+                 chunking_mode: str = CHUNKING_PAGE) -> bool:
+        """是否存在缓存（不读取内容，不刷新访问时间）"""
+        return os.path.exists(self._path(content_hash, parser_version, chunk_size, overlap, chunking_mode))
+
+    def get(self, content_hash: str, parser_version: str, chunk_size: int, overlap: int,
+            file_id=None, chunking_mode: str = CHUNKING_PAGE) -> Optional[Tuple[HFiledocument, HChunkList]]:
+        """
+        读取缓存
+        :param file_id: 文件标识id，缓存与文件无关，读取时重新赋值
+        :param chunking_mode: 切片模式，page 按页切片，document 文档级跨页切片
+        :return: (页面链表, 切片列表)，未命中返回None
+        """
+        path = self._path(content_hash, parser_version, chunk_size, overlap, chunking_mode)
+        try:
+            with open(path, "rb") as f:
+                lines = zlib.decompress(f.read()).decode("utf-8").split("\n")
+            records = [json.loads(line) for line in lines if line]
+        except (OSError, ValueError, zlib.error):
+            return None
+        # 刷新访问时间，作为LRU依据
+        os.utime(path)
+        top = None
+        current = None
+        for record in records:
+            if record[0] == "p":
+                node = HFiledocument(file_id, record[1], record[2])
+                if current:
+                    current.next = node
+                else:
+                    top = node
+                current = node
+        documents = HChunkList()
+        chunk_records = (record for record in records if record[0] == "c")
+        if chunking_mode == CHUNKING_DOCUMENT:
+            # 切片页内偏移量换算为拼接文本中的偏移量
+            text, page_starts, page_numbers = join_pages(top or [])
+            text_ref = documents.add_text(file_id, text, page_starts, page_numbers)
+            page_offsets = dict(zip(page_numbers, page_starts))
+            for _, page, start_index, end_index in chunk_records:
+                documents.add(text_ref, page_offsets[page] + start_index, page_offsets[page] + end_index)
+        else:
+            page_refs = {node.page: documents.add_page(file_id, node.page, normalize_page_text(node.page_content)) for node in top or []}
+            for _, page, start_index, end_index in chunk_records:
+                documents.add(page_refs[page], start_index, end_index)
+        return top, documents
+
+    def put(self, content_hash: str, parser_version: str, chunk_size: int, overlap: int,
+            file_document: HFiledocument, documents: Iterable[HDocument], chunking_mode: str = CHUNKING_PAGE):
+        """
+        写入缓存，写入后按容量上限淘汰最久未访问的缓存
+        """
+        writer = self.writer(content_hash, parser_version, chunk_size, overlap, chunking_mode)
+        for node in file_document or []:
+            writer.add_page(node)
+        for document in documents:
+            writer.add_chunk(document)
+        writer.commit()
+
+    def writer(self, content_hash: str, parser_version: str, chunk_size: int, overlap: int,
+               chunking_mode: str = CHUNKING_PAGE) -> "ParseCacheWriter":
+        """
+        创建流式写入器，流式解析时边解析边写入，不需要在内存中保留全部页面与切片
+        """
+        return ParseCacheWriter(self, self._path(content_hash, parser_version, chunk_size, overlap, chunking_mode))
+
+    def _artifact_path(self, kind: str, content_hash: str, version: str) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}_{kind}_v{version}{self.ARTIFACT_SUFFIX}")
+
+    def contains_artifact(self, kind: str, content_hash: str, version: str) -> bool:
+        """是否存在解析产物缓存"""
+        return os.path.exists(self._artifact_path(kind, content_hash, version))
+
+    def get_artifact(self, kind: str, content_hash: str, version: str):
+        """
+        读取解析产物缓存
+        :param kind: 产物类型，如 tables
+        :return: 缓存的JSON数据，未命中返回None
+        """
+        path = self._artifact_path(kind, content_hash, version)
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            return None
+        os.utime(path)
+        return data
+
+    def put_artifact(self, kind: str, content_hash: str, version: str, data):
+        """写入解析产物缓存，data 需可JSON序列化"""
+        path = self._artifact_path(kind, content_hash, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        """按最近访问时间淘汰，直至总大小不超过上限"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith((self.SUFFIX, self.ARTIFACT_SUFFIX)):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class ParseCacheWriter:
+    """
+    解析缓存流式写入器，每条记录为一行JSON（页面 ["p", 页码, 内容]，切片 ["c", 页码, 起始位置, 结束位置]），
+    整体以zlib流式压缩写入临时文件，commit 时原子替换为正式缓存文件
+    """
+
+    def __init__(self, cache: ParseCache, path: str):
+        self.cache = cache
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.{id(self)}.tmp"
+        self.file = open(self.tmp_path, "wb")
+        self.compressor = zlib.compressobj()
+
+    def _write(self, record: list):
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self.file.write(self.compressor.compress(line.encode("utf-8")))
+
+    def add_page(self, node: HFiledocument):
+        self._write(["p", node.page, node.page_content])
+
+    def add_chunk(self, document: HDocument):
+        # 切片只保存偏移量，文本读取时从页面文本截取
+        self._write(["c", document.page, document.start_index, document.end_index])
+
+    def commit(self):
+        """完成写入并生效，随后按容量上限淘汰"""
+        self.file.write(self.compressor.flush())
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        self.cache._evict()
+
+    def abort(self):
+        """放弃写入（解析失败时调用）"""
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
@@ -1,17 +1,50 @@
-import base64
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import fitz
+import numpy as np
 from pymupdf import Document
 
-from apps.document_parser.base import HFiledocument
+from apps.document_parser.base import HFiledocument, HTable
 from apps.document_parser.base_parser import BaseParser
+from apps.document_parser.header_footer import EDGE_RATIO, PageBlocks, RepeatedBlockFilter, edge_block_hash
+from apps.document_parser.ocr import ImageOcrCache, OcrPool
+from apps.document_parser.table_parser import TableParser, collect_tables, extract_page_tables
+
+# 扫描页等待OCR期间最多缓冲的页数，达到后不等图片攒满一批即提交识别
+OCR_PENDING_PAGES = 16
 
 
 class PdfParser(BaseParser):
 
-    def __init__(self):
-        
+    # 扫描页OCR前增加版面分析，解析结果变化
+    PARSER_VERSION = "4"
+
+    def __init__(self, pool_size: int = 0, parallel_min_pages: int = 50,
+                 header_footer_repeat_ratio: float = 0.3, header_footer_window: int = 30,
+                 ocr_pool: OcrPool = None, ocr_cache: ImageOcrCache = None, table_parser: TableParser = None):
+        """
+        :param pool_size: 并行解析的进程数，0或1时串行解析
+        :param parallel_min_pages: 页数达到该值才启用并行解析，避免小文件承担进程启动开销
+        :param header_footer_repeat_ratio: 页眉页脚区域文本块出现页数占比超过该值视为重复页眉页脚
+        :param header_footer_window: 流式解析时统计重复页眉页脚的缓冲页数
+        :param ocr_pool: 扫描页OCR进程池，为None时跳过扫描页
+        :param ocr_cache: 图片OCR结果缓存，查重任务内共享；为None时只在单个文档内去重
+        :param table_parser: 表格解析器，不为None时在文本解析的同一遍逐页读取中抽取表格，不再单独遍历文档
+        """
+        self.pool_size = pool_size or 0
+        self.parallel_min_pages = parallel_min_pages
+        self.header_footer_repeat_ratio = header_footer_repeat_ratio
+        self.header_footer_window = header_footer_window
+        self.ocr_pool = ocr_pool
+        self.ocr_cache = ocr_cache
+        self.table_parser = table_parser
+        # 最近一次完整解析中抽取的表格；未启用或表格抽取失败时为None，由调用方单独抽取
+        self.tables: Optional[List[HTable]] = None
+
         # 1. 标书页码正则（覆盖标书常见样式）
         self.page_num_pattern = re.compile(
             r'^\s*'
@@ -32,40 +65,227 @@ class PdfParser(BaseParser):
             "商务部分", "页码", "Page", "日期", "公司名称"
         ]
     
-    def _is_header_footer(self, page: fitz.Page, text: str, bbox: fitz.Rect) -> bool:
+    def _extract_page_blocks(self, page: fitz.Page) -> Optional[PageBlocks]:
         """
-        判断文本块是否是标书的页眉/页脚/页码
-        核心逻辑：位置（上下15%） + 文本特征（短文本+关键词/页码）
+        提取单页文本块，文本块只提取一次（不再先 get_text() 判空再提取 blocks）
+        页眉页脚区域（上下15%）的文本块同时计算归一化哈希，供文档级重复页眉页脚检测
+        :return: [(文本, 边缘区域哈希或None)]；页面没有文本层（扫描件）时返回None
         """
-        page_rect = page.rect
-        # 标书页眉页脚区域：上下15%
-        top_margin = page_rect.height * 0.15
-        bottom_margin = page_rect.height * 0.85
-        text_mid_y = (bbox.y0 + bbox.y1) / 2
+        page_height = page.rect.height
+        top_margin = page_height * EDGE_RATIO
+        bottom_margin = page_height * (1 - EDGE_RATIO)
+        blocks = []
+        # 按文本块提取（保留位置信息），block[6] == 0 为文本块，1 为图片块
+        for block in page.get_text("blocks"):
+            block_text = block[4].strip()
+            if block[6] != 0 or not block_text:
+                continue
+            text_mid_y = (block[1] + block[3]) / 2
+            if text_mid_y < top_margin or text_mid_y > bottom_margin:
+                blocks.append((block_text, edge_block_hash(block_text)))
+            else:
+                blocks.append((block_text, None))
+        return blocks or None
 
-        # 条件1：文本在上下15%区域
-        if not (text_mid_y < top_margin or text_mid_y > bottom_margin):
-            return False
-        
-        # 条件2：文本是短文本块（标书页眉页脚通常<30字符）
-        text_stripped = text.strip()
-        if len(text_stripped) > 30:
+    def _is_header_footer_text(self, text: str) -> bool:
+        """
+        页数不足以统计跨页重复时，按文本特征（短文本+关键词/页码）判断页眉页脚区域的文本块
+        """
+        # 标书页眉页脚通常<30字符
+        if len(text) > 30:
             return False
-        
-        # 条件3：包含页码特征 或 标书页眉页脚关键词
-        has_page_num = bool(self.page_num_pattern.match(text_stripped))
-        has_keyword = any(keyword in text_stripped for keyword in self.header_footer_keywords)
-        
-        return has_page_num or has_keyword
+        return bool(self.page_num_pattern.match(text)) or any(keyword in text for keyword in self.header_footer_keywords)
+
+    def _iter_page_blocks(self, doc: Document, filename=None, stream=None,
+                          page_tables: Dict[int, Optional[list]] = None) -> Iterator[Tuple[int, Optional[PageBlocks]]]:
+        """
+        按页码顺序逐页产出文本块，页数较多且配置了进程池时并行解析
+        :param page_tables: 不为None时同时抽取有文本层页面的表格，写入 {页码: 表格列表}，扫描页写入None待识别；
+                            表格抽取失败的页面不写入
+        :return: (页码, 文本块列表或None) 生成器
+        """
+        page_count = len(doc)
+        if self.pool_size <= 1 or page_count < self.parallel_min_pages:
+            for page_num, page in enumerate(doc):
+                blocks = self._extract_page_blocks(page)
+                if page_tables is not None:
+                    _collect_page_tables(page_tables, page_num, page, blocks)
+                yield page_num, blocks
+            return
+        if stream is not None and not isinstance(stream, (bytes, bytearray)):
+            # 子进程需要可序列化的二进制数据
+            stream = stream.getvalue() if hasattr(stream, "getvalue") else stream.read()
+        # 每个进程处理若干连续页段，段数多于进程数以平衡负载
+        shard_count = min(page_count, self.pool_size * 4)
+        shard_size = -(-page_count // shard_count)
+        page_ranges = iter([(start, min(start + shard_size, page_count)) for start in range(0, page_count, shard_size)])
+        with ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            initializer=_init_parse_worker,
+            initargs=(filename, stream)
+        ) as executor:
+            # 只保留有限个在途页段，下游消费慢时不会堆积整本文档的解析结果
+            with_tables = page_tables is not None
+            pending = deque(executor.submit(_parse_page_range, page_range, with_tables)
+                            for page_range in islice(page_ranges, self.pool_size * 2))
+            while pending:
+                shard = pending.popleft().result()
+                for page_range in islice(page_ranges, 1):
+                    pending.append(executor.submit(_parse_page_range, page_range, with_tables))
+                # 按提交顺序取结果，即为页码顺序
+                for page_num, blocks, tables in shard:
+                    if with_tables and (blocks is None or tables is not None):
+                        page_tables[page_num] = tables
+                    yield page_num, blocks
 
-    async def _pdf_orc_parse(self, image: str):
+    def _page_images(self, doc: Document, page_num: int, xref_keys: Dict[int, str]) -> List[Tuple[int, str, fitz.Rect]]:
         """
-        将orc图片解析成文本， image时图片的base64_str
+        列出扫描页中的图片，不解码
+        :param xref_keys: 文档内图片 xref -> 内容哈希，同一 xref 只计算一次哈希
+        :return: [(图片xref, 图片内容哈希, 图片在页面中的位置)]
         """
+        page = doc[page_num]
+        images = []
+        for image_info in page.get_images():
+            xref, smask = image_info[0], image_info[1]
+            rects = page.get_image_rects(xref)
+            if not rects:
+                continue
+            key = xref_keys.get(xref)
+            if key is None:
+                raw = doc.xref_stream_raw(xref) or b""
+                if smask:
+                    raw += doc.xref_stream_raw(smask) or b""
+                key = xref_keys[xref] = ImageOcrCache.image_key(raw)
+            images.append((xref, key, rects[0]))
+        return images
 
-        return ""
+    def _ocr_scanned_pages(self, doc: Document, pages: Iterator[Tuple[int, Optional[PageBlocks]]]) -> Iterator[Tuple[int, Optional[PageBlocks]]]:
+        """
+        扫描页OCR：跨页攒够一批图片后一次提交给OCR进程池，识别结果转为文本块后按页码顺序产出
+        批次大小为 进程数 × 每批图片数，保证所有OCR进程同时工作，同时限制内存中的图片数量
+        图片按内容哈希去重，已识别过或本批已排队的图片不再解码、识别（直接解码为像素数组，不经过 base64）
+        没有等待识别的页面时，文本页、空白页、图片均已识别过的扫描页直接产出；
+        等待识别期间缓冲的页数达到 OCR_PENDING_PAGES 时提前识别，保证流式处理的内存上限与首批产出时间
+        """
+        if self.ocr_pool is None:
+            yield from pages
+            return
+        window = self.ocr_pool.pool_size * self.ocr_pool.batch_size
+        ocr_cache = self.ocr_cache if self.ocr_cache is not None else ImageOcrCache()
+        xref_keys: Dict[int, str] = {}
+        pending = []  # [[页码, 文本块, 页面高度]]，扫描页的文本块待识别后填充
+        images = []
+        image_keys = []  # 本批待识别图片的内容哈希，与 images 一一对应
+        queued_keys = set()
+        image_owners = []  # [(pending下标, 图片内容哈希, 图片在页面中的位置)]
 
-    
+        def fill(entry, key, rect):
+            """识别结果转为页面文本块"""
+            for y_ratio, text in ocr_cache.results[key]:
+                if self.ocr_pool.layout_routed:
+                    # 版面分析已剔除页眉页脚区域，不再按位置判断
+                    entry[1].append((text, None))
+                    continue
+                y = (rect.y0 + y_ratio * rect.height) / entry[2]
+                is_edge = y < EDGE_RATIO or y > 1 - EDGE_RATIO
+                entry[1].append((text, edge_block_hash(text) if is_edge else None))
+
+        def flush():
+            for key, lines in zip(image_keys, self.ocr_pool.recognize(images)):
+                ocr_cache.put(key, lines)
+            for pending_index, key, rect in image_owners:
+                fill(pending[pending_index], key, rect)
+            for page_num, blocks, _ in pending:
+                yield page_num, blocks or None
+            pending.clear()
+            images.clear()
+            image_keys.clear()
+            queued_keys.clear()
+            image_owners.clear()
+
+        for page_num, blocks in pages:
+            if blocks is not None:
+                if pending:
+                    pending.append([page_num, blocks, None])
+                else:
+                    yield page_num, blocks
+            else:
+                entry = [page_num, [], doc[page_num].rect.height]
+                # 需要识别的图片登记到 image_owners，已有识别结果的图片直接填充
+                waiting = []
+                for xref, key, rect in self._page_images(doc, page_num, xref_keys):
+                    if key not in queued_keys and ocr_cache.get(key) is None:
+                        images.append(_pixmap_to_array(fitz.Pixmap(doc, xref)))
+                        image_keys.append(key)
+                        queued_keys.add(key)
+                    if key in queued_keys:
+                        waiting.append((key, rect))
+                    else:
+                        fill(entry, key, rect)
+                if waiting or pending:
+                    pending.append(entry)
+                    image_owners.extend((len(pending) - 1, key, rect) for key, rect in waiting)
+                else:
+                    yield page_num, entry[1] or None
+            if len(images) >= window or len(pending) >= OCR_PENDING_PAGES:
+                yield from flush()
+        if pending:
+            yield from flush()
+
+    def iter_pages(self, filename=None, stream=None, file_id = None) -> Iterator[HFiledocument]:
+        """
+        流式解析，逐页产出页面（页面之间不建立链表），解析完一页即可交给下游切片、向量化
+        重复页眉页脚按前 header_footer_window 页的统计判定，之后逐页累计
+
+        :param filename: 需要解析的文件，使用路径
+        :param stream: 数据流（可选）,如果要解析的是二进制流则使用该参数
+        :param file_id: 文件在数据库表中的id
+        :return: 页面生成器
+        """
+        return self._iter_pages(filename, stream, file_id, self.header_footer_window)
+
+    def _iter_pages(self, filename, stream, file_id, header_footer_window: Optional[int]) -> Iterator[HFiledocument]:
+        self.tables = None
+        try:
+            doc: Document = fitz.open(filename=filename, filetype="pdf", stream=stream)
+        except Exception as e:
+            raise ValueError(f"标书PDF解析失败：{str(e)}")
+        # 解析完成、失败或下游提前停止读取时都关闭文档
+        with doc:
+            try:
+                header_footer_filter = RepeatedBlockFilter(
+                    repeat_ratio=self.header_footer_repeat_ratio,
+                    window=header_footer_window,
+                    fallback=self._is_header_footer_text
+                )
+                page_tables = {} if self.table_parser is not None else None
+                page_blocks = self._iter_page_blocks(doc, filename, stream, page_tables)
+                # 扫描件OCR后的文本块与文本页走同样的页眉页脚过滤
+                page_blocks = header_footer_filter.filter(self._ocr_scanned_pages(doc, page_blocks))
+                for page_num, blocks in page_blocks:
+                    # 无文本层且未识别出文字的页面跳过
+                    if blocks is not None:
+                        # 清理当前页空行，避免冗余
+                        page_clean_text = re.sub(r'\n+', '\n', "\n".join(block[0] for block in blocks)).strip()
+                        yield HFiledocument(file_id, page_num, page_clean_text)
+            except Exception as e:
+                raise ValueError(f"标书PDF解析失败：{str(e)}")
+            if page_tables is not None:
+                self.tables = self._finish_tables(doc, page_tables, file_id)
+
+    def _finish_tables(self, doc: Document, page_tables: Dict[int, Optional[list]], file_id) -> Optional[List[HTable]]:
+        """
+        文本解析完成后识别扫描页表格，与文本页表格合并；有页面表格抽取失败时返回None，由调用方单独抽取
+        """
+        if len(page_tables) < len(doc):
+            return None
+        try:
+            scanned_page_nums = [page_num for page_num, tables in page_tables.items() if tables is None]
+            page_tables.update(self.table_parser.scanned_tables(doc, scanned_page_nums))
+        except Exception:
+            return None
+        return collect_tables({page_num: tables or [] for page_num, tables in page_tables.items()}, file_id)
 
     def parse(self, filename=None, stream=None, file_id = None) -> HFiledocument:
         """
@@ -77,56 +297,69 @@ class PdfParser(BaseParser):
         :return: 返回解析的文本内容，字符串类型
         :rtype: str
         """ 
-        try:
-            doc:Document= fitz.open(filename=filename, filetype="pdf", stream=stream)
-            file_document = None
-            top = None
-            for page_num, page in enumerate(doc):
-                # 按文本块提取（保留位置信息）
-                text = page.get_text().strip()
-                if text:
-                    text_blocks = page.get_text("blocks")
-                    page_clean_text = ""
-
-                    for block in text_blocks:
-                        block_text = block[4].strip()
-                        block_bbox = fitz.Rect(block[:4])
-
-                        # 过滤页眉/页脚/页码
-                        if not self._is_header_footer(page, block_text, block_bbox):
-                            page_clean_text += block_text + "\n"
-
-                    # 清理当前页空行，避免冗余
-                    page_clean_text = re.sub(r'\n+', '\n', page_clean_text).strip()
-                    if file_document:
-                        current = HFiledocument(file_id, page_num, page_clean_text)
-                        current_parent = file_document
-                        current_parent.next = current
-                        file_document = current
-                    else:
-                        file_document = HFiledocument(file_id, page_num, page_clean_text)
-                        top = file_document
-                else:
-                    # 扫描件处理
-                    image_ids = page.get_images()
-                    for image_id in image_ids:
-                        img_data = doc.extract_image(image_id)
-                        base64_str = base64.b64encode(img_data["image"]).decode("utf-8")
-                        text = self._pdf_orc_parse(base64_str)
-                        if file_document:
-                            current = HFiledocument(file_id, page_num, text)
-                            current_parent = file_document
-                            current_parent.next = current
-                            file_document = current
-                        else:
-                            file_document = HFiledocument(file_id, page_num, text)
-                            top = file_document
-
-                #full_clean_text += page_clean_text + "\n\n"
-
-            # 最终清理：移除多余空行，返回纯文本
-            #full_clean_text = re.sub(r'\n{3,}', '\n\n', full_clean_text).strip()
-            return top
+        file_document = None
+        top = None
+        # 整本文档统计重复页眉页脚
+        for current in self._iter_pages(filename, stream, file_id, None):
+            if file_document:
+                file_document.next = current
+            else:
+                top = current
+            file_document = current
+        return top
 
-        except Exception as e:
-            raise ValueError(f"标书PDF解析失败：{str(e)}")
\ No newline at end of file
+
+# 并行解析子进程的文档来源（路径或二进制数据），每个页段打开一次文档，解析完即关闭
+_worker_source: Tuple = (None, None)
+
+
+def _init_parse_worker(filename, stream):
+    """并行解析子进程初始化：记录文档路径或二进制数据，二进制数据只向每个进程传递一次"""
+    global _worker_source
+    _worker_source = (filename, stream)
+
+
+def _parse_page_range(page_range, with_tables: bool = False):
+    """
+    子进程解析一段连续页
+    :param page_range: (起始页, 结束页)，左闭右开
+    :param with_tables: 是否同时抽取有文本层页面的表格
+    :return: [(页码, 文本块列表或None, 表格列表；扫描页、未抽取或抽取失败时为None)]
+    """
+    start, end = page_range
+    pdf_parser = PdfParser()
+    results = []
+    filename, stream = _worker_source
+    with fitz.open(filename=filename, filetype="pdf", stream=stream) as doc:
+        for page_num in range(start, end):
+            page = doc[page_num]
+            blocks = pdf_parser._extract_page_blocks(page)
+            page_tables = {}
+            if with_tables:
+                _collect_page_tables(page_tables, page_num, page, blocks)
+            results.append((page_num, blocks, page_tables.get(page_num)))
+    return results
+
+
+def _collect_page_tables(page_tables: Dict[int, Optional[list]], page_num: int, page: fitz.Page,
+                         blocks: Optional[PageBlocks]):
+    """有文本层的页面抽取表格，扫描页登记为None待识别；抽取失败时不登记，整份文档的表格由调用方单独抽取"""
+    if blocks is None:
+        page_tables[page_num] = None
+        return
+    try:
+        page_tables[page_num] = extract_page_tables(page)
+    except Exception:
+        pass
+
+
+def _pixmap_to_array(pix: fitz.Pixmap) -> np.ndarray:
+    """将图片像素转换为OCR模型需要的 BGR 三通道数组"""
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is not None and pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n == 1:
+        return np.repeat(image, 3, axis=2)
+    return np.ascontiguousarray(image[:, :, ::-1])
@@ -0,0 +1,395 @@
+import copy
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import fitz
+import numpy as np
+from pymupdf import Document
+
+from apps.document_parser.base import HTable
+from apps.document_parser.ocr import _create_layout_predictor
+
+# 表格抽取逻辑版本，变更时递增使表格缓存失效
+TABLE_PARSER_VERSION = "1"
+
+_space_pattern = re.compile(r'\s+')
+# 表头单元格去除的单位说明，如 单价(元)、金额（万元）
+_unit_pattern = re.compile(r'[(（][^()（）]*[)）]$')
+_digit_pattern = re.compile(r'\d')
+# 招标文件表格模板常见的表头，表头行在所有投标文件中都相同，不作为抄袭证据
+HEADER_WORDS = {
+    "序号", "编号", "名称", "项目", "项目名称", "内容", "工作内容", "单位", "数量", "单价", "合价", "总价", "金额",
+    "报价", "投标报价", "小计", "合计", "总计", "备注", "说明", "规格", "型号", "规格型号", "品牌", "产地", "厂家",
+    "生产厂家", "材质", "技术参数", "参数", "要求", "技术要求", "偏离", "偏离情况", "响应", "姓名", "性别", "年龄",
+    "职务", "职称", "岗位", "学历", "专业", "证书", "证书编号", "资格证书", "工作年限", "联系方式", "日期", "时间",
+    "工期", "页码", "签字", "盖章",
+}
+
+
+def normalize_cell(text) -> str:
+    """单元格文本归一化：全角转半角、去除空白"""
+    if text is None:
+        return ""
+    return _space_pattern.sub("", unicodedata.normalize("NFKC", str(text)))
+
+
+def normalize_rows(rows: List[List]) -> List[List[str]]:
+    """表格行归一化，丢弃全空行"""
+    normalized = []
+    for row in rows:
+        cells = [normalize_cell(cell) for cell in row]
+        if any(cells):
+            normalized.append(cells)
+    return normalized
+
+
+class _TableHtmlParser(HTMLParser):
+    """解析SLANet输出的表格HTML为行、单元格，colspan 展开为空单元格"""
+
+    def __init__(self):
+        super().__init__()
+        self.rows: List[List[str]] = []
+        self._cell = None
+        self._colspan = 1
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self.rows.append([])
+        elif tag == "td" and self.rows:
+            self._cell = []
+            self._colspan = int(dict(attrs).get("colspan") or 1)
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self._cell is not None:
+            self.rows[-1].append("".join(self._cell))
+            self.rows[-1].extend([""] * (self._colspan - 1))
+            self._cell = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_table_html(html: str) -> List[List[str]]:
+    """表格HTML转换为归一化的行、单元格"""
+    parser = _TableHtmlParser()
+    parser.feed(html)
+    return normalize_rows(parser.rows)
+
+
+class TableStructureEngine:
+    """
+    扫描件表格结构识别引擎，使用项目自带的 SLANet 表格结构模型与 PP-OCRv4 检测、识别模型
+    先做版面分析找出表格区域，再对表格区域识别单元格结构与文字，输出表格HTML；
+    一批页面的表格区域合并后，结构模型按 table_batch_num 批量推理，文本行跨区域批量识别
+    """
+
+    def __init__(self, table_model_dir: str, det_model_dir: str, rec_model_dir: str,
+                 layout_model_dir: str, cpu_threads: int = 1, table_batch_num: int = 8):
+        import paddleocr
+        from paddleocr.ppstructure.table.predict_table import TableSystem
+        from paddleocr.ppstructure.utility import init_args
+
+        args = init_args().parse_args([])
+        args.table_model_dir = table_model_dir
+        args.table_char_dict_path = os.path.join(
+            os.path.dirname(paddleocr.__file__), "ppocr", "utils", "dict", "table_structure_dict_ch.txt"
+        )
+        args.det_model_dir = det_model_dir
+        args.rec_model_dir = rec_model_dir
+        args.use_gpu = False
+        args.cpu_threads = cpu_threads
+        args.show_log = False
+        self.table_system = TableSystem(args)
+        self.layout_predictor = _create_layout_predictor(layout_model_dir, cpu_threads)
+        self.table_batch_num = table_batch_num
+
+    def table_crops(self, image: np.ndarray) -> List[np.ndarray]:
+        """版面分析，返回页面图片中的表格区域"""
+        layout_res, _ = self.layout_predictor(image)
+        crops = []
+        height, width = image.shape[:2]
+        for region in sorted(layout_res, key=lambda item: (item["bbox"][1], item["bbox"][0])):
+            if region["label"] != "table":
+                continue
+            x0, y0, x1, y1 = (int(round(value)) for value in region["bbox"])
+            x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+            if x1 > x0 and y1 > y0:
+                crops.append(image[y0:y1, x0:x1])
+        return crops
+
+    def recognize(self, images: List[np.ndarray]) -> List[List[List[List[str]]]]:
+        """
+        识别一批页面图片中的表格
+        先收集整批页面的表格区域，结构模型批量推理、文本行批量识别后逐个区域匹配单元格
+        :return: 每张图片中的表格列表，每个表格为归一化的行、单元格
+        """
+        crops = []
+        owners = []
+        for image_index, image in enumerate(images):
+            for crop in self.table_crops(image):
+                crops.append(crop)
+                owners.append(image_index)
+        results = [[] for _ in images]
+        if not crops:
+            return results
+        structures = self._structure(crops)
+        boxes, texts = self._ocr(crops)
+        for image_index, structure, dt_boxes, rec_res in zip(owners, structures, boxes, texts):
+            rows = parse_table_html(self.table_system.match(structure, dt_boxes, rec_res))
+            if rows:
+                results[image_index].append(rows)
+        return results
+
+    def _structure(self, crops: List[np.ndarray]) -> List[Tuple[List[str], np.ndarray]]:
+        """
+        表格结构模型批量推理：预处理后各区域缩放、填充为相同尺寸，按 table_batch_num 堆叠为一个批次
+        :return: 每个区域的 (结构标签, 单元格框)
+        """
+        from paddleocr.ppocr.data import transform
+
+        structurer = self.table_system.table_structurer
+        results = []
+        for start in range(0, len(crops), self.table_batch_num):
+            inputs, shapes = [], []
+            for crop in crops[start:start + self.table_batch_num]:
+                data = transform({"image": crop}, structurer.preprocess_op)
+                inputs.append(data[0])
+                shapes.append(data[-1])
+            structurer.input_tensor.copy_from_cpu(np.stack(inputs))
+            structurer.predictor.run()
+            outputs = [tensor.copy_to_cpu() for tensor in structurer.output_tensors]
+            post_result = structurer.postprocess_op(
+                {"loc_preds": outputs[0], "structure_probs": outputs[1]}, [np.stack(shapes)]
+            )
+            for structure, bboxes in zip(post_result["structure_batch_list"], post_result["bbox_batch_list"]):
+                results.append((["<html>", "<body>", "<table>"] + structure[0] + ["</table>", "</body>", "</html>"], bboxes))
+        return results
+
+    def _ocr(self, crops: List[np.ndarray]) -> Tuple[List[np.ndarray], List[List[Tuple[str, float]]]]:
+        """
+        逐个区域检测文本框，所有区域的文本行裁剪图合并后批量识别
+        :return: (每个区域的文本框 [x0, y0, x1, y1], 每个区域的识别结果 [(文本, 置信度)])
+        """
+        from paddleocr.tools.infer.predict_system import sorted_boxes
+
+        boxes, lines, owners = [], [], []
+        for crop_index, crop in enumerate(crops):
+            height, width = crop.shape[:2]
+            dt_boxes, _ = self.table_system.text_detector(copy.deepcopy(crop))
+            crop_boxes = []
+            for box in sorted_boxes(dt_boxes) if dt_boxes is not None and len(dt_boxes) else []:
+                x0, y0 = max(0, box[:, 0].min() - 1), max(0, box[:, 1].min() - 1)
+                x1, y1 = min(width, box[:, 0].max() + 1), min(height, box[:, 1].max() + 1)
+                crop_boxes.append([x0, y0, x1, y1])
+                lines.append(crop[int(y0):int(y1), int(x0):int(x1)])
+                owners.append(crop_index)
+            boxes.append(np.array(crop_boxes))
+        texts = [[] for _ in crops]
+        if lines:
+            rec_res, _ = self.table_system.text_recognizer(lines)
+            for crop_index, result in zip(owners, rec_res):
+                texts[crop_index].append(result)
+        return boxes, texts
+
+
+# 表格识别子进程中的引擎，每个进程只加载一次模型
+_worker_engine: TableStructureEngine = None
+
+
+def _init_table_worker(engine_kwargs: dict):
+    global _worker_engine
+    _worker_engine = TableStructureEngine(**engine_kwargs)
+
+
+def _table_batch(images: List[np.ndarray]):
+    return _worker_engine.recognize(images)
+
+
+class TablePool:
+    """
+    扫描件表格识别进程池，每个子进程加载一次模型，跨页面按批提交
+    """
+
+    def __init__(self, table_model_dir: str, det_model_dir: str, rec_model_dir: str, layout_model_dir: str,
+                 pool_size: int = 0, batch_size: int = 4, table_batch_num: int = 8):
+        """
+        :param pool_size: 子进程数，0 表示使用 CPU 核数
+        :param batch_size: 每批提交的页面图片数
+        :param table_batch_num: 表格结构模型单次推理的表格区域数
+        """
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self.batch_size = batch_size
+        engine_kwargs = {
+            "table_model_dir": table_model_dir,
+            "det_model_dir": det_model_dir,
+            "rec_model_dir": rec_model_dir,
+            "layout_model_dir": layout_model_dir,
+            "cpu_threads": 1,
+            "table_batch_num": table_batch_num,
+        }
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            initializer=_init_table_worker,
+            initargs=(engine_kwargs,)
+        )
+
+    def recognize(self, images: List[np.ndarray]) -> List[List[List[List[str]]]]:
+        """按 batch_size 切分后并行识别，结果顺序与图片顺序一致"""
+        futures = [
+            self.executor.submit(_table_batch, images[start:start + self.batch_size])
+            for start in range(0, len(images), self.batch_size)
+        ]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+class TableParser:
+    """
+    表格抽取
+    有文本层的页面直接读取PDF中的表格线与文字（find_tables），不需要模型；
+    扫描页跨页攒批后交给 SLANet 表格结构识别进程池。
+    输出归一化的行、单元格结构，表格可以逐行比对而不经过向量化
+    """
+
+    def __init__(self, table_pool: TablePool = None, dpi: int = 144):
+        """
+        :param table_pool: 扫描件表格识别进程池，为None时只抽取有文本层页面的表格
+        :param dpi: 扫描页栅格化分辨率
+        """
+        self.table_pool = table_pool
+        self.dpi = dpi
+
+    def parse(self, filename=None, stream=None, file_id=None) -> List[HTable]:
+        """
+        抽取文档中的所有表格（解析缓存已命中、没有随文本解析抽取表格时使用）
+        :return: 表格列表，按页码、页内序号排列
+        """
+        try:
+            with fitz.open(filename=filename, filetype="pdf", stream=stream) as doc:
+                tables: Dict[int, List[List[List[str]]]] = {}
+                scanned_page_nums = []
+                for page_num, page in enumerate(doc):
+                    if page.get_text("text").strip():
+                        tables[page_num] = extract_page_tables(page)
+                    else:
+                        scanned_page_nums.append(page_num)
+                tables.update(self.scanned_tables(doc, scanned_page_nums))
+        except Exception as e:
+            raise ValueError(f"标书表格抽取失败：{str(e)}")
+        return collect_tables(tables, file_id)
+
+    def scanned_tables(self, doc: Document, page_nums: Iterable[int]) -> Dict[int, List[List[List[str]]]]:
+        """
+        扫描页跨页攒批识别表格，未配置表格识别进程池时不识别
+        :return: {页码: 表格列表}
+        """
+        tables: Dict[int, List[List[List[str]]]] = {}
+        if not self.table_pool:
+            return tables
+        window = self.table_pool.pool_size * self.table_pool.batch_size
+        scanned_pages: List[Tuple[int, np.ndarray]] = []
+        for page_num in page_nums:
+            scanned_pages.append((page_num, _render_page(doc[page_num], self.dpi)))
+            if len(scanned_pages) >= window:
+                self._recognize_scanned(scanned_pages, tables)
+        if scanned_pages:
+            self._recognize_scanned(scanned_pages, tables)
+        return tables
+
+    def _recognize_scanned(self, scanned_pages: List[Tuple[int, np.ndarray]], tables: Dict[int, List]):
+        results = self.table_pool.recognize([image for _, image in scanned_pages])
+        for (page_num, _), page_tables in zip(scanned_pages, results):
+            tables[page_num] = page_tables
+        scanned_pages.clear()
+
+
+def extract_page_tables(page: fitz.Page) -> List[List[List[str]]]:
+    """读取有文本层页面中的表格线与文字（find_tables），不需要模型"""
+    page_tables = [normalize_rows(table.extract()) for table in page.find_tables().tables]
+    return [rows for rows in page_tables if rows]
+
+
+def collect_tables(tables: Dict[int, List[List[List[str]]]], file_id=None) -> List[HTable]:
+    """各页表格转换为表格列表，按页码、页内序号排列"""
+    return [
+        HTable(file_id, page_num, index, rows)
+        for page_num in sorted(tables)
+        for index, rows in enumerate(tables[page_num])
+    ]
+
+
+def _render_page(page: fitz.Page, dpi: int) -> np.ndarray:
+    """页面栅格化为 BGR 数组"""
+    pix = page.get_pixmap(dpi=dpi, alpha=False)
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    return np.ascontiguousarray(image[:, :, ::-1])
+
+
+def tables_to_json(tables: List[HTable]) -> list:
+    """表格序列化，用于按内容哈希缓存"""
+    return [[table.page, table.index, table.rows] for table in tables]
+
+
+def tables_from_json(data: list, file_id=None) -> List[HTable]:
+    return [HTable(file_id, page, index, rows) for page, index, rows in data]
+
+
+def is_header_row(row: List[str]) -> bool:
+    """表头行：不含数字，且多数非空单元格（去除单位说明后）为常见表头"""
+    cells = [cell for cell in row if cell]
+    if not cells or any(_digit_pattern.search(cell) for cell in cells):
+        return False
+    return sum(1 for cell in cells if _unit_pattern.sub("", cell) in HEADER_WORDS) * 2 >= len(cells)
+
+
+def template_rows(tables: List[HTable]) -> Set[Tuple[str, ...]]:
+    """招标文件表格的全部行，投标文件照抄模板的行不作为抄袭证据"""
+    return {tuple(row) for table in tables for row in table.rows}
+
+
+def _comparable_rows(tables: List[HTable], min_filled_cells: int,
+                     excluded: Set[Tuple[str, ...]]) -> Dict[Tuple[str, ...], Tuple[HTable, int, int]]:
+    """
+    参与比对的行，重复出现的行只保留第一次出现的位置
+    :return: {行: (表格, 行号, 出现次数)}
+    """
+    rows: Dict[Tuple[str, ...], Tuple[HTable, int, int]] = {}
+    for table in tables:
+        for row_index, row in enumerate(table.rows):
+            key = tuple(row)
+            if key in rows:
+                first_table, first_row, count = rows[key]
+                rows[key] = (first_table, first_row, count + 1)
+            elif (sum(1 for cell in row if cell) >= min_filled_cells and key not in excluded
+                  and not is_header_row(row)):
+                rows[key] = (table, row_index, 1)
+    return rows
+
+
+def match_table_rows(left_tables: List[HTable], right_tables: List[HTable], min_filled_cells: int = 2,
+                     excluded_rows: Optional[Set[Tuple[str, ...]]] = None) -> List[Tuple[HTable, int, HTable, int, int]]:
+    """
+    表格逐行比对：归一化后完全相同的行视为抄袭行（报价、人员等表格）
+    表头行与招标文件模板中的行不参与比对；同一行在文件中重复出现时每个文件对只记录一次，不产生 m×n 条记录
+    :param min_filled_cells: 非空单元格少于该值的行不参与比对，避免空行、单列标题行误报
+    :param excluded_rows: 不参与比对的行（招标文件表格的行）
+    :return: [(左表格, 左行号, 右表格, 右行号, 两侧出现次数的较小值)]，按左侧首次出现顺序排列
+    """
+    excluded = excluded_rows or set()
+    right_rows = _comparable_rows(right_tables, min_filled_cells, excluded)
+    matches = []
+    for key, (table, row_index, count) in _comparable_rows(left_tables, min_filled_cells, excluded).items():
+        if key in right_rows:
+            right_table, right_row_index, right_count = right_rows[key]
+            matches.append((table, row_index, right_table, right_row_index, min(count, right_count)))
+    return matches
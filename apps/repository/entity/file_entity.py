@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Text, func
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, Text, UniqueConstraint, func
 
 from apps.repository.entity import Base
 
@@ -11,7 +11,7 @@ class FileRecordEntity(Base):
     file_path = Column(String(512), nullable=False, unique=True)  # 存储路径（唯一）
     file_size = Column(BigInteger, nullable=False)  # 文件大小（字节）
     mime_type = Column(String(100), nullable=False)  # MIME 类型
-    #hash = Column(String(64), nullable=False, index=True)  # SHA256 哈希（64字符）
+    hash = Column(String(64), nullable=True, index=True)  # SHA256 哈希（64字符），上传时计算；历史记录为空时不使用解析缓存
     business_id = Column(String(100), nullable=True, index=True)  # 业务ID（字符串兼容多种类型）
 
     #status = Column(String(20), default="uploaded")  # 状态：uploaded, processing, parsed, failed
@@ -19,4 +19,20 @@ class FileRecordEntity(Base):
 
 
     def __repr__(self):
-        return f"<FileRecord(id={self.id}, name='{self.file_name}')>"
\ No newline at end of file
+        return f"<FileRecord(id={self.id}, name='{self.file_name}')>"
+
+
+class FileVectorIngestEntity(Base):
+    """
+    文件向量入库完成标记，入库内容由 ingest_key（文件内容哈希、解析器版本、切片参数、切片模式、模板过滤）决定，
+    每个 (文件, 入库参数) 一条标记，Milvus中的切片同样带有 ingest_key，不同参数的任务互不删除对方的切片
+    """
+    __tablename__ = "file_vector_ingest"
+    __table_args__ = (UniqueConstraint("file_id", "ingest_key", name="uq_file_vector_ingest_file_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, nullable=False, index=True)
+    ingest_key = Column(String(255), nullable=False)
+    vector_number = Column(Integer, default=0, nullable=False)  # 入库的切片数
+    chunk_number = Column(Integer, default=0, nullable=False)  # 模板过滤前的切片总数（登记招标文件时统计）
+    suppressed_number = Column(Integer, default=0, nullable=False)  # 模板过滤掉的切片数
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Text
 
 from apps.repository.entity import Base
 
@@ -13,7 +13,11 @@ class BidPlagiarismCheckTask(Base):
     check_type = Column(Integer, nullable=False)
     task_name = Column(String(100), nullable=False)
     file_name_list = Column(String(255),default="", nullable=False)
+    engine = Column(String(20), default="vector", nullable=False)  # 比对引擎：vector, local, winnowing, tfidf, two_stage, simhash
+    tender_file_id = Column(Integer, nullable=True)  # 招标文件id，投标文件中与招标文件相同的切片不参与比对
     process_status = Column(String(20), default="processing")  # 进度状态：completed, processing, parsed, failed
+    embedded_chunk_ratio = Column(Float, nullable=True)  # 两阶段比对：向量化切片数占切片总数的比例
+    scored_pair_ratio = Column(Float, nullable=True)  # 两阶段比对：计算相似度的切片对数占切片对总数的比例
 
 
 
@@ -24,11 +28,27 @@ class SubBidPlagiarismCheckTask(Base):
     __tablename__ = "sub_bid_plagiarism_check_task"
 
     id = Column(Integer, primary_key=True, index=True)
-    process_status = Column(String(20), default="processing")  # 进度状态：completed, processing, parsed, failed
+    process_status = Column(String(20), default="processing")  # 进度状态：completed, processing, parsed, failed, skipped（候选对筛选未通过）
     bid_plagiarism_check_task_id = Column(Integer, nullable=False)
     left_file_id = Column(Integer, nullable=False)
     right_file_id = Column(Integer, nullable=False)
     similarity_number = Column(Integer, default=0, nullable=False)
+    right_task_id = Column(Integer, nullable=True)  # 历史库比对时右侧（历史）文件所属的任务
+    estimated_similarity = Column(Float, nullable=True)  # MinHash 估计的文本相似度（Jaccard），仅跳过的子任务记录
+
+class BidCheckTaskFile(Base):
+    """
+    标书查重任务文件，任务内每个文件只解析、向量化一次，记录其处理状态
+    """
+    __tablename__ = "bid_check_task_file"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bid_plagiarism_check_task_id = Column(Integer, nullable=False, index=True)
+    file_id = Column(Integer, nullable=False)
+    process_status = Column(String(20), default="processing")  # 进度状态：processing, parsed, embedded, failed
+    error_message = Column(Text, nullable=True)  # 处理失败时的错误信息
+    chunk_number = Column(Integer, default=0, nullable=False)  # 切片总数（登记招标文件时统计）
+    suppressed_number = Column(Integer, default=0, nullable=False)  # 与招标文件相同而过滤掉的切片数
 
 class DocumentSimilarityRecord(Base):
     """
@@ -40,10 +60,17 @@ class DocumentSimilarityRecord(Base):
     sub_bid_plagiarism_check_task_id = Column(Integer, nullable=False)
     left_file_id = Column(Integer, nullable=False)
     left_file_page = Column(Integer, nullable=False)
-    left_file_page_start_index = Column(Integer, nullable=False)
-    left_file_page_chunk = Column(String(255), nullable=False)
+    left_file_page_start_index = Column(Integer, nullable=False)  # 表格行记录为0，位置见 left_file_table_index / left_file_table_row
+    left_file_page_end_index = Column(Integer, nullable=True)  # 片段结束位置（与起始位置同一坐标，跨页片段可超过起始页面长度）
+    left_file_page_chunk = Column(String(255), nullable=True)  # 相似片段不保存文本，按起止位置从解析结果截取；表格行记录保存行文本
+    left_file_table_index = Column(Integer, nullable=True)  # 表格行记录：表格在页面中的序号，文本片段记录为空
+    left_file_table_row = Column(Integer, nullable=True)  # 表格行记录：表格内行号
     right_file_id = Column(Integer, nullable=False)
     right_file_page = Column(Integer, nullable=False)
     right_file_page_start_index = Column(Integer, nullable=False)
-    right_file_page_chunk = Column(String(255), nullable=False)
-    similarity = Column(Float, nullable=False)
\ No newline at end of file
+    right_file_page_end_index = Column(Integer, nullable=True)
+    right_file_page_chunk = Column(String(255), nullable=True)
+    right_file_table_index = Column(Integer, nullable=True)
+    right_file_table_row = Column(Integer, nullable=True)
+    similarity = Column(Float, nullable=False)  # 片段所含切片命中的平均相似度
+    hit_number = Column(Integer, default=1, nullable=False)  # 合并为该片段的切片命中数
\ No newline at end of file
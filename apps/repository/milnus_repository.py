@@ -1,4 +1,5 @@
-from typing import List
+import json
+from typing import Iterable, List
 
 from pymilvus import (
     Collection,
@@ -13,6 +14,14 @@ from apps.document_parser.base import HDocument
 TOP_K = 10  # 查询返回Top3相似结果
 
 
+def file_expr(file_id: int, ingest_key: str = None) -> str:
+    """
+    文件某一入库参数下切片的过滤条件，同一文件按不同参数（如不同的模板过滤）入库的切片互不影响
+    :param ingest_key: 入库参数标识，为None时对应未记录内容哈希的文件
+    """
+    return f"file_id == {int(file_id)} and ingest_key == {json.dumps(ingest_key or '')}"
+
+
 # ------------------- 3. Milvus 核心操作 -------------------
 class MilvusVectorDB:
     def __init__(self, fields, collection_name, index_field_name, index_params):
@@ -63,8 +72,11 @@ class MilvusVectorDB:
         """
         self.collection.create_index(field_name=field_name, index_params=index_params)
 
-    def insert_data(self, documents: List[HDocument]):
-        """插入文本数据（存储）"""
+    def insert_data(self, documents: List[HDocument], ingest_key: str = None):
+        """
+        插入文本数据（存储）
+        :param ingest_key: 入库参数标识，与切片一起写入
+        """
         # 文本转向量
         #vectorizer = QwenEmbeddingVectorizer()
         vectorizer = OllamaQwenEmbeddingVectorizer()
@@ -72,6 +84,7 @@ class MilvusVectorDB:
         data = []
         vec_list = []
         file_ids = []
+        ingest_keys = []
         pages = []
         start_indexes = []
         texts = []
@@ -83,22 +96,148 @@ class MilvusVectorDB:
                 print(f"向量数据: {vectors}")
                 vec_list.append(vectors)
                 file_ids.append(document.file_id)
+                ingest_keys.append(ingest_key or "")
                 pages.append(document.page)
                 start_indexes.append(document.start_index)
                 texts.append(document.text)
        
         # 插入Milvus
-        insert_result = self.get_collection().insert([file_ids, pages, start_indexes, texts, vec_list])
+        insert_result = self.get_collection().insert([file_ids, ingest_keys, pages, start_indexes, texts, vec_list])
         self.collection.flush()  # 刷盘，确保数据持久化
         print(f"插入成功，插入ID：{insert_result.primary_keys}")
         print(f"集合总数据量：{self.collection.num_entities}")
         self.collection.load()
         return insert_result
-    
+
+    def insert_stream(self, documents: Iterable[HDocument], embed_batch_size: int = 32, insert_batch_size: int = 512,
+                      ingest_key: str = None) -> int:
+        """
+        流式插入文本数据：按微批次向量化，按固定批次写入Milvus
+        内存占用只与批次大小相关，与文档大小无关，首批向量在文档解析完成前即可入库
+        :param documents: 切片迭代器（可为生成器）
+        :param embed_batch_size: 向量化微批次大小
+        :param insert_batch_size: 单次写入Milvus的条数
+        :param ingest_key: 入库参数标识，与切片一起写入
+        :return: 插入的总条数
+        """
+        vectorizer = OllamaQwenEmbeddingVectorizer()
+        collection = self.get_collection()
+        columns = ([], [], [], [], [], [])  # file_ids, ingest_keys, pages, start_indexes, texts, vec_list
+        batch: List[HDocument] = []
+        batch_texts: List[str] = []  # 切片文本只截取一次
+        total = 0
+
+        def embed_batch():
+            vectors = vectorizer.encode_batch(batch_texts)
+            for document, text, vector in zip(batch, batch_texts, vectors):
+                columns[0].append(document.file_id)
+                columns[1].append(ingest_key or "")
+                columns[2].append(document.page)
+                columns[3].append(document.start_index)
+                columns[4].append(text)
+                columns[5].append(vector)
+            batch.clear()
+            batch_texts.clear()
+
+        def insert_columns():
+            collection.insert([list(column) for column in columns])
+            inserted = len(columns[0])
+            for column in columns:
+                column.clear()
+            return inserted
+
+        for document in documents:
+            text = document.text
+            if not text.strip():
+                continue
+            batch.append(document)
+            batch_texts.append(text)
+            if len(batch) >= embed_batch_size:
+                embed_batch()
+                if len(columns[0]) >= insert_batch_size:
+                    total += insert_columns()
+        if batch:
+            embed_batch()
+        if columns[0]:
+            total += insert_columns()
+        collection.flush()  # 刷盘，确保数据持久化
+        collection.load()
+        return total
+
     def query_data(self, expr:str, output_fields:List[str] = None):
         self.collection.load()
         return self.collection.query(expr=expr, output_fields=output_fields)
 
+    def delete_file(self, file_id: int, ingest_key: str = None):
+        """删除文件在某一入库参数下的全部切片（重新入库前清除不完整的切片），其他参数下的切片保留"""
+        self.get_collection().delete(expr=file_expr(file_id, ingest_key))
+
+    def query_file_vectors(self, file_id: int, ingest_key: str = None, batch_size: int = 1000) -> List[dict]:
+        """
+        读取文件在某一入库参数下的全部切片与向量，分批迭代读取，不受单次查询条数上限限制
+        :param file_id: 文件id
+        :param ingest_key: 入库参数标识
+        :param batch_size: 每批读取条数
+        :return: [{"page", "start_index", "text_content", "vector"}]
+        """
+        collection = self.get_collection()
+        collection.load()
+        iterator = collection.query_iterator(
+            batch_size=batch_size,
+            expr=file_expr(file_id, ingest_key),
+            output_fields=["page", "start_index", "text_content", "vector"]
+        )
+        rows = []
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                rows.extend(batch)
+        finally:
+            iterator.close()
+        return rows
+
+    def search_batch(self, expr, query_vectors, limit: int = TOP_K, nq_batch_size: int = 256,
+                     radius: float = None, output_fields: List[str] = None) -> List[List[dict]]:
+        """
+        批量相似性查询，多个查询向量合并为一次请求（nq），按 nq_batch_size 分批
+        :param expr: 过滤条件
+        :param query_vectors: 查询向量列表
+        :param limit: 每个查询向量返回的结果数
+        :param nq_batch_size: 单次请求的查询向量数
+        :param radius: 相似度下限，低于该值的结果由Milvus直接过滤（范围查询）
+        :param output_fields: 返回的字段（除向量外）
+        :return: 与查询向量一一对应的结果列表
+        """
+        collection = self.get_collection()
+        collection.load()
+        output_fields = output_fields or ["text_content"]
+        params = {"nprobe": 128}
+        if radius is not None:
+            params["radius"] = radius
+        search_params = {"metric_type": "COSINE", "params": params}
+        search_results = []
+        for start in range(0, len(query_vectors), nq_batch_size):
+            results = collection.search(
+                data=query_vectors[start:start + nq_batch_size],
+                expr=expr,
+                anns_field="vector",
+                param=search_params,
+                limit=limit,
+                output_fields=output_fields
+            )
+            for hits in results:
+                search_results.append([
+                    {
+                        "id": hit.id,
+                        "similarity": hit.score,
+                        **{field: hit.entity.get(field) for field in output_fields}
+                    }
+                    for hit in hits
+                ])
+        return search_results
+
     def search_similar(self, expr, query_vector):
         """相似性查询"""
         # 2. 加载集合到内存（查询前必须加载）
@@ -1,3 +1,33 @@
-# app/core/minio_client.py
+import os
+import tempfile
+
 from minio import Minio
-from minio.error import S3Error
+
+# 下载时每次从连接读取的字节数
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+def fetch_object_to_file(minio_client: Minio, bucket_name: str, object_name: str, suffix: str = "",
+                         download_dir: str = None) -> str:
+    """
+    将对象流式下载到本地临时文件，内存中只保留一个读取块，不在内存中保存整个文件
+    :param bucket_name: 桶名称
+    :param object_name: 对象名称
+    :param suffix: 临时文件后缀
+    :param download_dir: 临时文件目录，为None时使用系统临时目录
+    :return: 临时文件路径，由调用方负责删除
+    """
+    response = minio_client.get_object(bucket_name, object_name)
+    try:
+        with tempfile.NamedTemporaryFile(suffix=suffix, dir=download_dir, delete=False) as f:
+            try:
+                for chunk in response.stream(STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+            except Exception:
+                f.close()
+                os.remove(f.name)
+                raise
+        return f.name
+    finally:
+        response.close()
+        response.release_conn()
@@ -1,2 +1,426 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from apps import AppContext
+from apps.document_parser.base import HChunkList, HDocument, HTable
+from apps.document_parser.base_parser import BaseParser, CHUNKING_DOCUMENT, CHUNKING_PAGE
+from apps.document_parser.doc_parser import DocxParser
+from apps.document_parser.ocr import LAYOUT_KEEP_LABELS, ImageOcrCache, OcrPool
+from apps.document_parser.parse_cache import ParseCache
+from apps.document_parser.pdf_parser import PdfParser
+from apps.document_parser.table_parser import TABLE_PARSER_VERSION, TablePool, TableParser, tables_from_json, \
+    tables_to_json
+from apps.repository.entity.file_entity import FileRecordEntity, FileVectorIngestEntity
+from apps.repository.minio_repository import fetch_object_to_file
+from apps.service.milnus_service import create_tender_vector_milvus_db
+
+app_context = AppContext()
+
+# 切片参数：切片大小与重叠长度
+CHUNK_SIZE = 50
+CHUNK_OVERLAP = 5
+
+_parse_cache: ParseCache = None
+_ocr_pool: OcrPool = None
+_table_pool: TablePool = None
+
+
+def get_parse_cache() -> ParseCache:
+    """获取解析结果缓存（按配置懒加载）"""
+    global _parse_cache
+    if _parse_cache is None:
+        cache_config = app_context.app_config.get("parse_cache") or {}
+        _parse_cache = ParseCache(
+            cache_config.get("dir", "./cache/parse"),
+            int(cache_config.get("max_size_mb", 2048)) * 1024 * 1024
+        )
+    return _parse_cache
+
+
+def get_ocr_pool() -> Optional[OcrPool]:
+    """获取扫描页OCR进程池（按配置懒加载，进程池在所有文档之间共享）"""
+    global _ocr_pool
+    ocr_config = app_context.app_config.get("ocr") or {}
+    if not ocr_config.get("enabled", False):
+        return None
+    if _ocr_pool is None:
+        _ocr_pool = OcrPool(
+            det_model_dir=ocr_config["det_model_dir"],
+            rec_model_dir=ocr_config["rec_model_dir"],
+            pool_size=int(ocr_config.get("pool_size", 0)),
+            batch_size=int(ocr_config.get("batch_size", 4)),
+            rec_batch_num=int(ocr_config.get("rec_batch_num", 32)),
+            drop_score=float(ocr_config.get("drop_score", 0.5)),
+            layout_model_dir=ocr_config.get("layout_model_dir"),
+            layout_keep_labels=ocr_config.get("layout_keep_labels") or LAYOUT_KEEP_LABELS
+        )
+    return _ocr_pool
+
+
+def create_pdf_parser(ocr_cache: ImageOcrCache = None, table_parser: TableParser = None) -> PdfParser:
+    """
+    按配置创建PDF解析器
+    :param ocr_cache: 图片OCR结果缓存，查重任务内共享
+    :param table_parser: 表格解析器，不为None时随文本解析抽取表格
+    """
+    parser_config = app_context.app_config.get("parser") or {}
+    return PdfParser(
+        pool_size=int(parser_config.get("pool_size", 0)),
+        parallel_min_pages=int(parser_config.get("parallel_min_pages", 50)),
+        header_footer_repeat_ratio=float(parser_config.get("header_footer_repeat_ratio", 0.3)),
+        header_footer_window=int(parser_config.get("header_footer_window", 30)),
+        ocr_pool=get_ocr_pool(),
+        ocr_cache=ocr_cache,
+        table_parser=table_parser
+    )
+
+
+def create_parser(file_record: FileRecordEntity, ocr_cache: ImageOcrCache = None) -> BaseParser:
+    """
+    按文件类型创建解析器，PDF文件的表格尚未缓存时随文本解析一并抽取
+    :param file_record: 文件管理数据表记录
+    :param ocr_cache: 图片OCR结果缓存，查重任务内共享
+    """
+    _check_supported(file_record)
+    if _file_type(file_record) == "docx":
+        parser_config = app_context.app_config.get("parser") or {}
+        return DocxParser(max_page_chars=int(parser_config.get("docx_max_page_chars", 5000)))
+    table_parser = None
+    if file_record.hash and not get_parse_cache().contains_artifact("tables", file_record.hash, TABLE_PARSER_VERSION):
+        table_parser = create_table_parser()
+    return create_pdf_parser(ocr_cache, table_parser)
+
+
+def get_table_pool() -> Optional[TablePool]:
+    """获取扫描页表格识别进程池（按配置懒加载），依赖 ocr 配置中的检测、识别、版面分析模型"""
+    global _table_pool
+    table_config = app_context.app_config.get("table") or {}
+    ocr_config = app_context.app_config.get("ocr") or {}
+    if not table_config.get("enabled", False) or not ocr_config.get("enabled", False):
+        return None
+    if not ocr_config.get("layout_model_dir"):
+        # 没有版面分析无法定位扫描页中的表格区域
+        return None
+    if _table_pool is None:
+        _table_pool = TablePool(
+            table_model_dir=table_config["table_model_dir"],
+            det_model_dir=ocr_config["det_model_dir"],
+            rec_model_dir=ocr_config["rec_model_dir"],
+            layout_model_dir=ocr_config["layout_model_dir"],
+            pool_size=int(table_config.get("pool_size", 0)),
+            batch_size=int(table_config.get("batch_size", 4)),
+            table_batch_num=int(table_config.get("table_batch_num", 8))
+        )
+    return _table_pool
+
+
+def create_table_parser() -> Optional[TableParser]:
+    """按配置创建表格解析器，未启用表格抽取时返回None"""
+    table_config = app_context.app_config.get("table") or {}
+    if not table_config.get("enabled", False):
+        return None
+    return TableParser(table_pool=get_table_pool())
+
+
 def handle_file(file1, file2):
-    pass
\ No newline at end of file
+    pass
+
+
+def fetch_file_record(file_record: FileRecordEntity) -> str:
+    """
+    从MinIO流式下载文件到本地临时文件，解析器按路径打开，不在内存中保存文件内容
+    :param file_record: 文件管理数据表记录
+    :return: 临时文件路径，由调用方负责删除
+    """
+    return fetch_object_to_file(
+        app_context.minio_client,
+        app_context.minio_config["bucket_name"],
+        file_record.file_path,
+        suffix=f".{_file_type(file_record)}",
+        download_dir=app_context.minio_config.get("download_dir")
+    )
+
+
+def remove_fetched_file(file_path: Optional[str]):
+    """删除下载的临时文件"""
+    if file_path:
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+
+# 支持解析的文件类型，doc（二进制Word格式）暂不支持
+SUPPORTED_FILE_TYPES = ("pdf", "docx")
+
+
+def _file_type(file_record: FileRecordEntity) -> str:
+    return (file_record.mime_type or "").lower()
+
+
+def _check_supported(file_record: FileRecordEntity):
+    if _file_type(file_record) not in SUPPORTED_FILE_TYPES:
+        # 其他格式暂不支持，由调用方记录为失败状态
+        raise ValueError(f"暂不支持的文件类型：{file_record.mime_type}")
+
+
+def chunking_mode() -> str:
+    """切片模式：page 按页切片，document 各页拼接后跨页切片"""
+    chunking_config = app_context.app_config.get("chunking") or {}
+    return chunking_config.get("mode") or CHUNKING_PAGE
+
+
+def parser_version(file_record: FileRecordEntity) -> str:
+    """文件对应解析器的版本"""
+    return DocxParser.PARSER_VERSION if _file_type(file_record) == "docx" else PdfParser.PARSER_VERSION
+
+
+def vector_ingest_key(file_record: FileRecordEntity, filter_key: str = None) -> Optional[str]:
+    """
+    文件向量入库参数标识：(文件内容哈希, 解析器版本, 切片大小, 重叠长度, 切片模式, 模板过滤)，
+    标识一致的入库结果可以复用；未记录内容哈希的文件返回None，每次重新入库
+    :param filter_key: 模板过滤标识，未过滤时为None
+    """
+    if not file_record.hash:
+        return None
+    return (f"{file_record.hash}_v{parser_version(file_record)}_{CHUNK_SIZE}_{CHUNK_OVERLAP}_{chunking_mode()}"
+            f"_{filter_key or 'all'}")
+
+
+def get_vector_ingest(file_id, ingest_key: Optional[str]) -> Optional[FileVectorIngestEntity]:
+    """文件按相同参数完整入库的标记，未入库或入库参数不同时返回None"""
+    if ingest_key is None:
+        return None
+    with app_context.db_session_factory() as session:
+        return session.query(FileVectorIngestEntity).filter(
+            FileVectorIngestEntity.file_id == file_id,
+            FileVectorIngestEntity.ingest_key == ingest_key
+        ).first()
+
+
+def reset_vector_ingest(file_id, ingest_key: Optional[str]):
+    """
+    清除文件在本次入库参数下的入库标记与Milvus中的切片，重新入库前调用，避免失败时残留的部分切片与本次切片混在一起；
+    其他入库参数下的标记与切片（其他任务正在使用）保留
+    """
+    if ingest_key is not None:
+        with app_context.db_session_factory() as session:
+            session.query(FileVectorIngestEntity).filter(
+                FileVectorIngestEntity.file_id == file_id,
+                FileVectorIngestEntity.ingest_key == ingest_key
+            ).delete()
+            session.commit()
+    create_tender_vector_milvus_db(1024).delete_file(file_id, ingest_key)
+
+
+def mark_vector_ingest(file_id, ingest_key: Optional[str], vector_number: int, chunk_number: int = 0,
+                       suppressed_number: int = 0):
+    """入库完成后写入标记"""
+    if ingest_key is None:
+        return
+    with app_context.db_session_factory() as session:
+        session.add(FileVectorIngestEntity(file_id=file_id, ingest_key=ingest_key, vector_number=vector_number,
+                                           chunk_number=chunk_number, suppressed_number=suppressed_number))
+        session.commit()
+
+
+def streaming_enabled() -> bool:
+    """是否启用流式解析-向量化流水线"""
+    pipeline_config = app_context.app_config.get("pipeline") or {}
+    return bool(pipeline_config.get("streaming", False))
+
+
+def parse_file_record(file_record: FileRecordEntity, ocr_cache: ImageOcrCache = None, file_path: str = None) -> HChunkList:
+    """
+    下载并解析文件，返回切片后的文档片段，相同内容的文件优先复用解析缓存
+    :param file_record: 文件管理数据表记录
+    :param ocr_cache: 图片OCR结果缓存，查重任务内共享
+    :param file_path: 已下载（预取）的本地文件路径，为None时按需下载
+    """
+    parser = create_parser(file_record, ocr_cache)
+    parse_cache = get_parse_cache()
+    mode = chunking_mode()
+    if file_record.hash:
+        cached = parse_cache.get(file_record.hash, parser.PARSER_VERSION, CHUNK_SIZE, CHUNK_OVERLAP, file_record.id, mode)
+        if cached:
+            return cached[1]
+    fetched_path = None if file_path else fetch_file_record(file_record)
+    try:
+        file_document = parser.parse(filename=file_path or fetched_path, file_id=file_record.id)
+        if mode == CHUNKING_DOCUMENT:
+            documents = parser.document_splitting(file_document, CHUNK_SIZE, CHUNK_OVERLAP)
+        else:
+            documents = parser.overlapping_splitting(file_document, CHUNK_SIZE, CHUNK_OVERLAP)
+        if file_record.hash:
+            parse_cache.put(file_record.hash, parser.PARSER_VERSION, CHUNK_SIZE, CHUNK_OVERLAP, file_document, documents, mode)
+            _prime_file_tables(file_record, parser, file_path or fetched_path)
+    finally:
+        remove_fetched_file(fetched_path)
+    return documents
+
+
+def _prime_file_tables(file_record: FileRecordEntity, parser: BaseParser, file_path: str):
+    """
+    表格写入缓存，后续读取表格时不再重复下载：文本解析时已抽取的表格直接写入，
+    否则复用已下载的文件单独抽取；表格抽取失败不影响文本解析
+    """
+    tables = getattr(parser, "tables", None)
+    if tables is not None:
+        get_parse_cache().put_artifact("tables", file_record.hash, TABLE_PARSER_VERSION, tables_to_json(tables))
+        return
+    try:
+        extract_file_tables(file_record, file_path)
+    except Exception:
+        app_context.logger.exception(f"表格抽取失败：{file_record.id}")
+
+
+def extract_file_tables(file_record: FileRecordEntity, file_path: str = None) -> List[HTable]:
+    """
+    抽取文件中的表格，按文件内容哈希缓存，相同内容的文件只识别一次
+    :param file_record: 文件管理数据表记录
+    :param file_path: 已下载的本地文件路径，为None时按需下载
+    :return: 表格列表，未启用表格抽取时为空
+    """
+    table_parser = create_table_parser()
+    if table_parser is None or _file_type(file_record) != "pdf":
+        return []
+    parse_cache = get_parse_cache()
+    if file_record.hash:
+        cached = parse_cache.get_artifact("tables", file_record.hash, TABLE_PARSER_VERSION)
+        if cached is not None:
+            return tables_from_json(cached, file_record.id)
+    fetched_path = None if file_path else fetch_file_record(file_record)
+    try:
+        tables = table_parser.parse(filename=file_path or fetched_path, file_id=file_record.id)
+    finally:
+        remove_fetched_file(fetched_path)
+    if file_record.hash:
+        parse_cache.put_artifact("tables", file_record.hash, TABLE_PARSER_VERSION, tables_to_json(tables))
+    return tables
+
+
+def embed_documents(documents: Iterable[HDocument], ingest_key: str = None):
+    """
+    文档片段向量化并写入Milvus
+    :param documents: 切片后的文档片段
+    :param ingest_key: 入库参数标识
+    """
+    milvus_vector_db = create_tender_vector_milvus_db(1024)
+    return milvus_vector_db.insert_data(documents, ingest_key)
+
+
+def stream_file_record(file_record: FileRecordEntity, ocr_cache: ImageOcrCache = None, file_path: str = None,
+                       chunk_filter: Callable[[HDocument], bool] = None, ingest_key: str = None) -> int:
+    """
+    流式处理文件：逐页解析、增量切片、微批次向量化、分批写入Milvus，边处理边写入解析缓存
+    内存占用只与批次大小相关，与文档大小无关
+    :param file_record: 文件管理数据表记录
+    :param ocr_cache: 图片OCR结果缓存，查重任务内共享
+    :param file_path: 已下载（预取）的本地文件路径，为None时按需下载
+    :param chunk_filter: 切片过滤，返回False的切片不向量化、不写入Milvus（解析缓存仍保存全部切片）
+    :param ingest_key: 入库参数标识，与切片一起写入Milvus
+    :return: 写入Milvus的切片数量
+    """
+    pipeline_config = app_context.app_config.get("pipeline") or {}
+    embed_batch_size = int(pipeline_config.get("embed_batch_size", 32))
+    insert_batch_size = int(pipeline_config.get("insert_batch_size", 512))
+    milvus_vector_db = create_tender_vector_milvus_db(1024)
+    parser = create_parser(file_record, ocr_cache)
+    parse_cache = get_parse_cache()
+    mode = chunking_mode()
+    if file_record.hash:
+        cached = parse_cache.get(file_record.hash, parser.PARSER_VERSION, CHUNK_SIZE, CHUNK_OVERLAP, file_record.id, mode)
+        if cached:
+            chunks = cached[1] if chunk_filter is None else filter(chunk_filter, cached[1])
+            return milvus_vector_db.insert_stream(chunks, embed_batch_size, insert_batch_size, ingest_key)
+
+    fetched_path = None if file_path else fetch_file_record(file_record)
+    file_path = file_path or fetched_path
+    cache_writer = parse_cache.writer(file_record.hash, parser.PARSER_VERSION, CHUNK_SIZE, CHUNK_OVERLAP, mode) if file_record.hash else None
+
+    def cached_pages() -> Iterator:
+        for page in parser.iter_pages(filename=file_path, file_id=file_record.id):
+            if cache_writer:
+                cache_writer.add_page(page)
+            yield page
+
+    splitting = parser.iter_document_splitting if mode == CHUNKING_DOCUMENT else parser.iter_splitting
+
+    def cached_chunks() -> Iterator[HDocument]:
+        for document in splitting(cached_pages(), CHUNK_SIZE, CHUNK_OVERLAP):
+            if cache_writer:
+                cache_writer.add_chunk(document)
+            if chunk_filter is None or chunk_filter(document):
+                yield document
+
+    try:
+        try:
+            total = milvus_vector_db.insert_stream(cached_chunks(), embed_batch_size, insert_batch_size, ingest_key)
+        except Exception:
+            if cache_writer:
+                cache_writer.abort()
+            raise
+        if cache_writer:
+            cache_writer.commit()
+            _prime_file_tables(file_record, parser, file_path)
+    finally:
+        remove_fetched_file(fetched_path)
+    return total
+
+
+def needs_fetch(file_record: FileRecordEntity) -> bool:
+    """
+    文件是否需要下载：解析结果与表格均已缓存时不需要下载
+    :param file_record: 文件管理数据表记录
+    """
+    if _file_type(file_record) not in SUPPORTED_FILE_TYPES:
+        # 不支持的文件类型在解析时直接记为失败
+        return False
+    if not file_record.hash:
+        return True
+    parse_cache = get_parse_cache()
+    if not parse_cache.contains(file_record.hash, parser_version(file_record), CHUNK_SIZE, CHUNK_OVERLAP, chunking_mode()):
+        return True
+    if create_table_parser() is None or _file_type(file_record) != "pdf":
+        return False
+    return not parse_cache.contains_artifact("tables", file_record.hash, TABLE_PARSER_VERSION)
+
+
+class FilePrefetcher:
+    """
+    文件预取：解析当前文件时，后台线程并行下载后续文件到本地临时文件
+    解析结果已缓存的文件不下载
+    """
+
+    def __init__(self, workers: int = 2):
+        """
+        :param workers: 并行下载线程数，同时也是预取的文件数
+        """
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1)) if workers > 0 else None
+        self.futures: Dict[int, Future] = {}
+
+    def prefetch(self, file_record: FileRecordEntity):
+        """提交后台下载"""
+        if self.executor is None or file_record.id in self.futures or not needs_fetch(file_record):
+            return
+        self.futures[file_record.id] = self.executor.submit(fetch_file_record, file_record)
+
+    def take(self, file_record: FileRecordEntity) -> Optional[str]:
+        """
+        取出预取的文件，等待下载完成
+        :return: 本地文件路径，未预取时返回None（由解析流程按需下载），调用方负责删除
+        """
+        future = self.futures.pop(file_record.id, None)
+        return future.result() if future else None
+
+    def close(self):
+        """关闭下载线程，删除未使用的预取文件"""
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True)
+        for future in self.futures.values():
+            if future.exception() is None:
+                remove_fetched_file(future.result())
+        self.futures.clear()
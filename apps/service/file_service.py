@@ -1,3 +1,4 @@
+import hashlib
 import os
 import tempfile
 import zipfile
@@ -19,12 +20,16 @@ def upload_file(files, business_id)->List[int]:
     file_record_list = []
     for file in files:
         if business_id == "tender" and file.filename.endswith(".zip"):
-            file_record_list.append(zip_unzip(file, business_id))
+            file_record_list.extend(zip_unzip(file, business_id))
 
         with tempfile.TemporaryDirectory() as tmp_dir:
             file_path = os.path.join(tmp_dir, file.filename)
+            file_hash = hashlib.sha256()
             with open(file_path, "wb") as f:
-                f.write(file.file.read())
+                # 分块写入并同时计算SHA256，避免整文件读入内存
+                while chunk := file.file.read(HASH_CHUNK_SIZE):
+                    file_hash.update(chunk)
+                    f.write(chunk)
             p = Path(file_path)
             # TODO: 上传到 MinIO / 保存到数据库 / OCR 扫描等
             minio_client.fput_object(
@@ -38,6 +43,7 @@ def upload_file(files, business_id)->List[int]:
                 mime_type=p.suffix[1:] if p.suffix else "",
                 file_name=file.filename,
                 file_path=f"files/{business_id}/{file.filename}",
+                hash=file_hash.hexdigest(),
                 business_id=business_id,
             ))
     with app_context.db_session_factory() as session:
@@ -95,6 +101,7 @@ def zip_unzip(file, business_id):
                         mime_type = p.suffix[1:] if p.suffix else "",
                         file_name = p.name,
                         file_path=f"files/{business_id}/{member}",
+                        hash=file_sha256(target_path),
                         business_id=business_id,
                     ))
 
@@ -107,6 +114,16 @@ def zip_unzip(file, business_id):
 ALLOWED_EXTENSIONS = {".pdf", ".docx", ".doc"}
 MAX_FILES = 100  # 防止 zip 炸弹
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+HASH_CHUNK_SIZE = 1024 * 1024  # 计算哈希时每次读取1MB
+
+
+def file_sha256(file_path: str) -> str:
+    """计算文件内容的SHA256哈希（64字符）"""
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
 
 def is_safe_path(basedir: str, path: str) -> bool:
     """防止路径遍历攻击（Zip Slip 漏洞）"""
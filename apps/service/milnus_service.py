@@ -5,7 +5,7 @@ from apps.repository.milnus_repository import MilvusVectorDB
 
 
 def create_tender_vector_milvus_db(vector_dim) -> MilvusVectorDB:
-    # 定义字段：主键ID + 文件唯一 + 标识符 + 文件页 + 片段在文档页中的位置 + 片段的文本内容 + 向量字段
+    # 定义字段：主键ID + 文件唯一 + 标识符 + 入库参数标识 + 文件页 + 片段在文档页中的位置 + 片段的文本内容 + 向量字段
     fields = [
         FieldSchema(
             name="id",
@@ -18,6 +18,11 @@ def create_tender_vector_milvus_db(vector_dim) -> MilvusVectorDB:
             dtype=DataType.INT64,
             max_length=50
         ),
+        FieldSchema(
+            name="ingest_key",
+            dtype=DataType.VARCHAR,
+            max_length=255  # 与 file_vector_ingest.ingest_key 一致
+        ),
         FieldSchema(
             name="page",
             dtype=DataType.INT16
@@ -0,0 +1,707 @@
+import hashlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from apps import AppContext
+from apps.algorithms.embedding import OllamaQwenEmbeddingVectorizer
+from apps.document_parser.base import HChunkList, HDocument
+from apps.document_parser.ocr import ImageOcrCache
+from apps.repository.entity.file_entity import FileRecordEntity
+from apps.repository.milnus_repository import file_expr
+from apps.service.document_service import parse_file_record, embed_documents, stream_file_record, streaming_enabled, \
+    vector_ingest_key, get_vector_ingest, reset_vector_ingest, mark_vector_ingest
+from apps.service.milnus_service import create_tender_vector_milvus_db
+from apps.similarity.base import FileText
+from apps.similarity.dense import cross_file_topk, normalize_rows, pair_topk
+from apps.similarity.minhash import MinHash, banded_candidate_pairs, shingle_hashes
+from apps.similarity.simhash import SIMHASH_BITS, SIMHASH_FEATURE_VERSION, SimHashStore, simhash_fingerprints, \
+    token_hashes
+from apps.similarity.template import TemplateIndex
+from apps.similarity.tfidf import TfidfModel, cross_file_sparse_topk, tokenize
+from apps.similarity.vector_store import CompactVectorStore, STORE_FLOAT16, STORE_INT8
+from apps.similarity.winnowing import WinnowingFingerprint, match_spans
+
+app_context = AppContext()
+
+# 比对引擎：vector 切片向量化后Milvus检索（语义相似），local 切片向量加载到内存后分块矩阵乘法比对，
+# winnowing 文本指纹（原文复制、近似复制），tfidf 分词后稀疏 TF-IDF 词汇相似（不调用向量化服务），
+# two_stage 切片 MinHash 签名筛选候选切片对后只对候选切片向量化并计算相似度，
+# simhash 切片64位 SimHash 指纹多索引汉明距离检索（近似重复切片，不依赖向量库）
+ENGINE_VECTOR = "vector"
+ENGINE_LOCAL = "local"
+ENGINE_TFIDF = "tfidf"
+ENGINE_WINNOWING = "winnowing"
+ENGINE_TWO_STAGE = "two_stage"
+ENGINE_SIMHASH = "simhash"
+
+
+def comparison_config() -> Dict:
+    return app_context.app_config.get("comparison") or {}
+
+
+class ChunkFilter:
+    """
+    招标文件模板片段过滤：被招标文件覆盖比例达到 min_coverage 的切片视为模板内容，不向量化、不入库、不参与比对，
+    同时统计单个文件的切片总数与过滤数
+    """
+
+    def __init__(self, template_text: str, template: TemplateIndex, min_coverage: float = 0.8):
+        self.template_text = template_text
+        self.template = template
+        self.min_coverage = min_coverage
+        # 过滤参数标识，过滤结果只由招标文件内容与过滤参数决定
+        self.key = f"{hashlib.sha256(template_text.encode('utf-8')).hexdigest()[:16]}_{template.k}_{min_coverage}"
+        self.total = 0
+        self.suppressed = 0
+
+    def __call__(self, document: HDocument) -> bool:
+        """
+        :return: 切片是否保留
+        """
+        self.total += 1
+        if not self.keeps(document):
+            self.suppressed += 1
+            return False
+        return True
+
+    def keeps(self, document: HDocument) -> bool:
+        """切片是否保留，不计入统计（复用已有入库结果时使用）"""
+        return self.template.coverage(document.text) < self.min_coverage
+
+
+def chunk_predicate(chunk_filter: ChunkFilter = None, on_chunk: Callable[[HDocument], None] = None,
+                    counted: bool = True) -> Optional[Callable[[HDocument], bool]]:
+    """
+    模板过滤与切片回调合并为单个切片判断：保留的切片交给 on_chunk（如计算文件签名），
+    流式流水线中逐个切片调用，切片不在内存中保留
+    :param counted: 是否计入过滤统计
+    :return: 切片判断，既不过滤也没有回调时为None
+    """
+    if chunk_filter is None and on_chunk is None:
+        return None
+
+    def keep(document: HDocument) -> bool:
+        if chunk_filter is not None and not (chunk_filter(document) if counted else chunk_filter.keeps(document)):
+            return False
+        if on_chunk is not None:
+            on_chunk(document)
+        return True
+    return keep
+
+
+def filter_chunks(chunks: Iterable[HDocument], chunk_filter: ChunkFilter = None,
+                  on_chunk: Callable[[HDocument], None] = None, counted: bool = True) -> Iterator[HDocument]:
+    """参与比对的切片（模板过滤后保留的切片），逐个交给 on_chunk"""
+    keep = chunk_predicate(chunk_filter, on_chunk, counted)
+    return iter(chunks) if keep is None else (chunk for chunk in chunks if keep(chunk))
+
+
+def swap_sides(record: Dict) -> Dict:
+    """相似记录左右两侧字段互换（left_* <-> right_*）"""
+    swapped = {}
+    for key, value in record.items():
+        if key.startswith("left_"):
+            key = "right_" + key[len("left_"):]
+        elif key.startswith("right_"):
+            key = "left_" + key[len("right_"):]
+        swapped[key] = value
+    return swapped
+
+
+def pop_pair_results(results: Dict[Tuple[int, int], List[Dict]], left_file_id, right_file_id) -> List[Dict]:
+    """
+    取出一次性比对结果中某个文件对的相似记录
+    结果只按一种文件顺序保存，按反向顺序取出时左右两侧字段互换，保证 left_* 始终对应 left_file_id
+    :param results: {(左文件id, 右文件id): 相似记录}
+    :return: 相似记录，文件对无命中时为空列表
+    """
+    if (left_file_id, right_file_id) in results:
+        return results.pop((left_file_id, right_file_id))
+    return [swap_sides(record) for record in results.pop((right_file_id, left_file_id), [])]
+
+
+class FileVectorCache:
+    """
+    比对阶段的文件向量缓存
+    子任务按 (左文件, 右文件) 组合顺序执行，左文件相同的子任务连续出现，只缓存当前左文件的切片与向量，
+    每个文件的向量只从Milvus读取一次
+    """
+
+    def __init__(self):
+        self.file_id = None
+        self.rows: List[dict] = []
+
+    def get(self, file_id, ingest_key: Optional[str]) -> List[dict]:
+        if file_id != self.file_id:
+            self.rows = create_tender_vector_milvus_db(1024).query_file_vectors(file_id, ingest_key)
+            self.file_id = file_id
+        return self.rows
+
+
+class VectorEngine:
+    """
+    向量比对引擎：阶段一文件切片向量化写入Milvus，阶段二左文件切片向量批量检索右文件
+    """
+    # 文件完成阶段一后的处理状态
+    ready_state = "embedded"
+
+    def __init__(self):
+        self.vector_cache = FileVectorCache()
+        # 各文件本次任务的入库参数标识，对应Milvus中的一份切片
+        self.ingest_keys: Dict[int, Optional[str]] = {}
+
+    def ingest(self, file_record: FileRecordEntity, file_path: str, ocr_cache: ImageOcrCache,
+               on_parsed: Callable[[], None], chunk_filter: ChunkFilter = None,
+               on_chunk: Callable[[HDocument], None] = None) -> Optional[HChunkList]:
+        """
+        阶段一：文件解析、向量化入库
+        :param on_parsed: 非流式模式下解析完成（向量化之前）的回调，用于记录中间状态
+        :param chunk_filter: 招标文件模板片段过滤，过滤掉的切片不向量化、不入库
+        :param on_chunk: 参与比对的每个切片（模板过滤后）的回调，流式模式下随流水线调用
+        :return: 切片列表（未过滤），流式模式下切片不在内存中保留、文件已入库时不解析，返回None
+        """
+        # 此前已按相同参数（文件内容、解析器版本、切片参数、模板过滤）完整入库的文件不重复向量化
+        ingest_key = vector_ingest_key(file_record, chunk_filter.key if chunk_filter is not None else None)
+        marker = get_vector_ingest(file_record.id, ingest_key)
+        self.ingest_keys[file_record.id] = ingest_key
+        if marker is not None:
+            if chunk_filter is not None:
+                # 复用时过滤统计取自入库时的记录
+                chunk_filter.total, chunk_filter.suppressed = marker.chunk_number, marker.suppressed_number
+            if on_chunk is not None:
+                # 切片从解析缓存读取
+                for _ in filter_chunks(parse_file_record(file_record, ocr_cache, file_path), chunk_filter, on_chunk, False):
+                    pass
+            return None
+        # 本次参数下残留的不完整切片删除后重新入库
+        reset_vector_ingest(file_record.id, ingest_key)
+        if streaming_enabled():
+            # 流式模式下解析与向量化交替进行，完成即为已向量化
+            total = stream_file_record(file_record, ocr_cache, file_path, chunk_predicate(chunk_filter, on_chunk),
+                                       ingest_key)
+            documents = None
+        else:
+            documents: HChunkList = parse_file_record(file_record, ocr_cache, file_path)
+            on_parsed()
+            total = len(embed_documents(list(filter_chunks(documents, chunk_filter, on_chunk)), ingest_key).primary_keys)
+        mark_vector_ingest(file_record.id, ingest_key, total,
+                           chunk_filter.total if chunk_filter is not None else 0,
+                           chunk_filter.suppressed if chunk_filter is not None else 0)
+        return documents
+
+    def compare(self, left_file_id, right_file_id) -> List[Dict]:
+        """
+        左文件全部切片向量按批（nq）检索右文件，相似度达到阈值的结果记为相似记录
+        :return: 相似记录字段（页码、页内起始位置、文本、相似度）
+        """
+        config = comparison_config()
+        threshold = float(config.get("threshold", 0.85))
+        left_rows = self.vector_cache.get(left_file_id, self.ingest_keys.get(left_file_id))
+        if not left_rows:
+            return []
+        results = create_tender_vector_milvus_db(1024).search_batch(
+            file_expr(right_file_id, self.ingest_keys.get(right_file_id)),
+            [row["vector"] for row in left_rows],
+            limit=int(config.get("top_k", 3)),
+            nq_batch_size=int(config.get("nq_batch_size", 256)),
+            radius=threshold,
+            output_fields=["page", "start_index", "text_content"]
+        )
+        return [
+            {
+                "left_page": left_row["page"],
+                "left_start_index": left_row["start_index"],
+                "left_text": left_row["text_content"],
+                "right_page": hit["page"],
+                "right_start_index": hit["start_index"],
+                "right_text": hit["text_content"],
+                "similarity": hit["similarity"],
+            }
+            for left_row, hits in zip(left_rows, results)
+            for hit in hits
+            if hit["similarity"] >= threshold
+        ]
+
+
+    def search_corpus(self, file_id, exclude_file_ids: List[int]) -> Dict[int, List[Dict]]:
+        """
+        历史库比对：文件全部切片向量按批检索整个向量库（排除本任务文件），开销只与本文件切片数相关，与库容量无关
+        :param file_id: 新文件id
+        :param exclude_file_ids: 不参与比对的文件（本任务的文件）
+        :return: {历史文件id: 相似记录字段}
+        """
+        config = comparison_config()
+        threshold = float(config.get("threshold", 0.85))
+        milvus_vector_db = create_tender_vector_milvus_db(1024)
+        rows = milvus_vector_db.query_file_vectors(file_id, self.ingest_keys.get(file_id))
+        if not rows:
+            return {}
+        results = milvus_vector_db.search_batch(
+            f"file_id not in {[int(exclude_file_id) for exclude_file_id in exclude_file_ids]}",
+            [row["vector"] for row in rows],
+            limit=int(config.get("top_k", 3)),
+            nq_batch_size=int(config.get("nq_batch_size", 256)),
+            radius=threshold,
+            output_fields=["file_id", "page", "start_index", "text_content"]
+        )
+        groups: Dict[int, List[Dict]] = {}
+        for row, hits in zip(rows, results):
+            for hit in hits:
+                if hit["similarity"] < threshold:
+                    continue
+                groups.setdefault(hit["file_id"], []).append({
+                    "left_page": row["page"],
+                    "left_start_index": row["start_index"],
+                    "left_text": row["text_content"],
+                    "right_page": hit["page"],
+                    "right_start_index": hit["start_index"],
+                    "right_text": hit["text_content"],
+                    "similarity": hit["similarity"],
+                })
+        return groups
+
+
+class LocalVectorEngine(VectorEngine):
+    """
+    本地向量比对引擎：阶段一与向量比对相同，阶段二将任务内全部文件的切片向量一次性加载为归一化矩阵，
+    按文件分块做矩阵乘法得到余弦相似度，每个切片的 top_k 由 argpartition 选出，
+    一次遍历得到所有文件对的结果，不再逐个子任务请求Milvus检索。
+    存储精度为 float16 / int8 时，文件向量在阶段一写入本地紧凑向量存储（每个文件只从Milvus读取一次），
+    阶段二内存映射读取，不再查询Milvus
+    """
+
+    def __init__(self):
+        super().__init__()
+        config = comparison_config()
+        local_config = config.get("local") or {}
+        self.threshold = float(config.get("threshold", 0.85))
+        self.top_k = int(config.get("top_k", 3))
+        dtype = local_config.get("dtype", "float32")
+        self.dtype = np.float16 if dtype == STORE_FLOAT16 else np.float32
+        self.vector_store = CompactVectorStore(local_config.get("store_dir", "./cache/vectors"), dtype) \
+            if dtype in (STORE_FLOAT16, STORE_INT8) else None
+        self.memory_budget = int(local_config.get("memory_budget_mb", 256)) * 1024 * 1024
+        # 阶段一成功的文件，按处理顺序（即子任务组合顺序）排列
+        self.file_ids: List[int] = []
+        self.results: Optional[Dict[Tuple[int, int], List[Dict]]] = None
+
+    def ingest(self, file_record: FileRecordEntity, file_path: str, ocr_cache: ImageOcrCache,
+               on_parsed: Callable[[], None], chunk_filter: ChunkFilter = None,
+               on_chunk: Callable[[HDocument], None] = None) -> Optional[HChunkList]:
+        documents = super().ingest(file_record, file_path, ocr_cache, on_parsed, chunk_filter, on_chunk)
+        if self.vector_store is not None:
+            # 本地向量与Milvus入库参数一致（内容哈希、解析器版本、切片参数、模板过滤），参数变化时重新写入
+            ingest_key = self.ingest_keys.get(file_record.id)
+            if not self.vector_store.contains(file_record.id, ingest_key):
+                self.vector_store.put(file_record.id, ingest_key,
+                                      create_tender_vector_milvus_db(1024).query_file_vectors(file_record.id, ingest_key))
+        self.file_ids.append(file_record.id)
+        return documents
+
+    def compare(self, left_file_id, right_file_id) -> List[Dict]:
+        if self.results is None:
+            self.results = self._compare_all()
+        return pop_pair_results(self.results, left_file_id, right_file_id)
+
+    def _compare_all(self) -> Dict[Tuple[int, int], List[Dict]]:
+        """
+        加载全部文件的切片向量并计算所有文件对的相似切片
+        """
+        if self.vector_store is not None:
+            return self._compare_stored()
+        milvus_vector_db = create_tender_vector_milvus_db(1024)
+        file_offsets = [0]
+        pages, start_indexes, texts, vectors = [], [], [], []
+        for file_id in self.file_ids:
+            for row in milvus_vector_db.query_file_vectors(file_id, self.ingest_keys.get(file_id)):
+                pages.append(row["page"])
+                start_indexes.append(row["start_index"])
+                texts.append(row["text_content"])
+                vectors.append(row["vector"])
+            file_offsets.append(len(vectors))
+        if not vectors:
+            return {}
+        matrix = normalize_rows(vectors, self.dtype)
+        del vectors
+        files = [matrix[file_offsets[i]:file_offsets[i + 1]] for i in range(len(self.file_ids))]
+        results = {}
+        for (i, j), (left_rows, right_rows, scores) in cross_file_topk(
+                files, self.top_k, self.threshold, self.memory_budget).items():
+            left_rows, right_rows = left_rows + file_offsets[i], right_rows + file_offsets[j]
+            results[(self.file_ids[i], self.file_ids[j])] = [
+                {
+                    "left_page": pages[left_row],
+                    "left_start_index": start_indexes[left_row],
+                    "left_text": texts[left_row],
+                    "right_page": pages[right_row],
+                    "right_start_index": start_indexes[right_row],
+                    "right_text": texts[right_row],
+                    "similarity": float(score),
+                }
+                for left_row, right_row, score in zip(left_rows.tolist(), right_rows.tolist(), scores.tolist())
+            ]
+        return results
+
+    def _compare_stored(self) -> Dict[Tuple[int, int], List[Dict]]:
+        """
+        内存映射读取本地紧凑向量存储中各文件的向量，逐个文件对按块反量化计算，不拼接、不整体读入内存，
+        相似记录只保存起止位置，不读取切片文本
+        """
+        stored = [self.vector_store.get(file_id, self.ingest_keys.get(file_id)) for file_id in self.file_ids]
+        results = {}
+        for (i, j), (left_rows, right_rows, scores) in cross_file_topk(
+                [vectors for vectors, _ in stored], self.top_k, self.threshold, self.memory_budget).items():
+            left_index, right_index = stored[i][1][left_rows].tolist(), stored[j][1][right_rows].tolist()
+            results[(self.file_ids[i], self.file_ids[j])] = [
+                {
+                    "left_page": left[0],
+                    "left_start_index": left[1],
+                    "left_end_index": left[2],
+                    "left_text": None,
+                    "right_page": right[0],
+                    "right_start_index": right[1],
+                    "right_end_index": right[2],
+                    "right_text": None,
+                    "similarity": float(score),
+                }
+                for left, right, score in zip(left_index, right_index, scores.tolist())
+            ]
+        return results
+
+
+class TfidfEngine:
+    """
+    词汇相似比对引擎：阶段一只解析文件并对切片分词，阶段二在任务全部切片上统计文档频率构建 TF-IDF 稀疏矩阵，
+    文件之间分块稀疏矩阵乘法得到余弦相似度，每个切片保留 top_k，全程使用CPU，不调用向量化服务。
+    任务内少见、却在两份标书中同时出现的词（如相同的错别字、报价细节、人员名称）权重更高
+    """
+    ready_state = "parsed"
+
+    def __init__(self):
+        config = comparison_config()
+        tfidf_config = config.get("tfidf") or {}
+        self.threshold = float(tfidf_config.get("threshold", 0.6))
+        self.top_k = int(config.get("top_k", 3))
+        self.file_ids: List[int] = []
+        # 各文件切片的 (页码, 页内起始位置, 文本, 分词)
+        self.file_chunks: Dict[int, List[Tuple[int, int, str, List[str]]]] = {}
+        self.results: Optional[Dict[Tuple[int, int], List[Dict]]] = None
+
+    def ingest(self, file_record: FileRecordEntity, file_path: str, ocr_cache: ImageOcrCache,
+               on_parsed: Callable[[], None], chunk_filter: ChunkFilter = None,
+               on_chunk: Callable[[HDocument], None] = None) -> Optional[HChunkList]:
+        """
+        阶段一：文件解析、切片分词
+        :param chunk_filter: 招标文件模板片段过滤，过滤掉的切片不参与比对
+        :param on_chunk: 参与比对的每个切片（模板过滤后）的回调
+        """
+        chunks = parse_file_record(file_record, ocr_cache, file_path)
+        self.file_chunks[file_record.id] = [
+            (chunk.page, chunk.start_index, chunk.text, tokenize(chunk.text))
+            for chunk in filter_chunks(chunks, chunk_filter, on_chunk)
+        ]
+        self.file_ids.append(file_record.id)
+        return chunks
+
+    def compare(self, left_file_id, right_file_id) -> List[Dict]:
+        if self.results is None:
+            self.results = self._compare_all()
+        return pop_pair_results(self.results, left_file_id, right_file_id)
+
+    def _compare_all(self) -> Dict[Tuple[int, int], List[Dict]]:
+        """
+        任务全部切片构建 TF-IDF 矩阵并计算所有文件对的相似切片
+        """
+        rows = [row for file_id in self.file_ids for row in self.file_chunks[file_id]]
+        if not rows:
+            return {}
+        file_offsets = np.cumsum([0] + [len(self.file_chunks[file_id]) for file_id in self.file_ids]).tolist()
+        matrix = TfidfModel().fit_transform(row[3] for row in rows)
+        results = {}
+        for (i, j), (left_rows, right_rows, scores) in cross_file_sparse_topk(
+                matrix, file_offsets, self.top_k, self.threshold).items():
+            results[(self.file_ids[i], self.file_ids[j])] = [
+                {
+                    "left_page": rows[left_row][0],
+                    "left_start_index": rows[left_row][1],
+                    "left_text": rows[left_row][2],
+                    "right_page": rows[right_row][0],
+                    "right_start_index": rows[right_row][1],
+                    "right_text": rows[right_row][2],
+                    "similarity": float(score),
+                }
+                for left_row, right_row, score in zip(left_rows.tolist(), right_rows.tolist(), scores.tolist())
+            ]
+        return results
+
+
+class WinnowingEngine:
+    """
+    文本指纹比对引擎：阶段一只解析文件并计算 winnowing 指纹（不做向量化），
+    阶段二两个文件的指纹有序数组求交，得到原文复制、近似复制的片段
+    """
+    ready_state = "parsed"
+
+    def __init__(self):
+        config = comparison_config().get("winnowing") or {}
+        self.k = int(config.get("k", 13))
+        self.window = int(config.get("window", 8))
+        self.min_length = int(config.get("min_length", 30))
+        self.file_texts: Dict[int, FileText] = {}
+        self.fingerprints: Dict[int, WinnowingFingerprint] = {}
+        # 与指纹 k 值一致的招标文件索引，首次使用时构建
+        self.template: Optional[TemplateIndex] = None
+
+    def ingest(self, file_record: FileRecordEntity, file_path: str, ocr_cache: ImageOcrCache,
+               on_parsed: Callable[[], None], chunk_filter: ChunkFilter = None,
+               on_chunk: Callable[[HDocument], None] = None) -> Optional[HChunkList]:
+        """
+        阶段一：文件解析、计算指纹
+        :param chunk_filter: 招标文件模板片段过滤，招标文件中出现的指纹不参与比对，切片只用于统计过滤比例
+        :param on_chunk: 模板过滤后保留的每个切片的回调
+        """
+        chunks = parse_file_record(file_record, ocr_cache, file_path)
+        file_text = FileText.from_chunks(file_record.id, chunks)
+        self.file_texts[file_record.id] = file_text
+        fingerprint = WinnowingFingerprint.build(file_text.text, self.k, self.window)
+        for _ in filter_chunks(chunks, chunk_filter, on_chunk):
+            pass
+        if chunk_filter is not None:
+            if self.template is None:
+                self.template = TemplateIndex.build(chunk_filter.template_text, self.k)
+            fingerprint = fingerprint.select(~self.template.contains(fingerprint.hashes))
+        self.fingerprints[file_record.id] = fingerprint
+        return chunks
+
+    def compare(self, left_file_id, right_file_id) -> List[Dict]:
+        """
+        两个文件之间的相似片段，片段起止位置换算为 (页码, 页内位置)
+        """
+        left_text = self.file_texts[left_file_id]
+        right_text = self.file_texts[right_file_id]
+        records = []
+        for span in match_spans(self.fingerprints[left_file_id], self.fingerprints[right_file_id], self.min_length):
+            left_page, left_start_index = left_text.locate(span.left_start)
+            right_page, right_start_index = right_text.locate(span.right_start)
+            records.append({
+                "left_page": left_page,
+                "left_start_index": left_start_index,
+                "left_text": left_text.text[span.left_start:span.left_end],
+                "right_page": right_page,
+                "right_start_index": right_start_index,
+                "right_text": right_text.text[span.right_start:span.right_end],
+                "similarity": span.similarity,
+            })
+        return records
+
+
+class TwoStageEngine:
+    """
+    两阶段比对引擎：阶段一只解析文件并计算切片字符片段（shingle），
+    阶段二先用切片 MinHash 签名做 LSH 分段分桶，得到不同文件之间的候选切片对（廉价的文本相似筛选），
+    只有出现在候选对中的切片调用向量化服务，且只计算候选对的余弦相似度，
+    向量化切片占比与计算切片对占比记录在 statistics 中
+    """
+    ready_state = "parsed"
+
+    def __init__(self):
+        config = comparison_config()
+        two_stage_config = config.get("two_stage") or {}
+        self.threshold = float(config.get("threshold", 0.85))
+        self.top_k = int(config.get("top_k", 3))
+        self.shingle_size = int(two_stage_config.get("shingle_size", 3))
+        self.num_perm = int(two_stage_config.get("num_perm", 32))
+        self.bands = int(two_stage_config.get("bands", 16))
+        self.max_bucket = int(two_stage_config.get("max_bucket", 100))
+        self.embed_batch_size = int((app_context.app_config.get("pipeline") or {}).get("embed_batch_size", 32))
+        self.file_ids: List[int] = []
+        # 各文件切片的 (页码, 页内起始位置, 文本, 片段哈希)
+        self.file_chunks: Dict[int, List[Tuple[int, int, str, np.ndarray]]] = {}
+        self.results: Optional[Dict[Tuple[int, int], List[Dict]]] = None
+        # 筛选效果：向量化切片数/切片总数、计算相似度的切片对数/切片对总数
+        self.statistics: Dict[str, float] = {}
+
+    def ingest(self, file_record: FileRecordEntity, file_path: str, ocr_cache: ImageOcrCache,
+               on_parsed: Callable[[], None], chunk_filter: ChunkFilter = None,
+               on_chunk: Callable[[HDocument], None] = None) -> Optional[HChunkList]:
+        """
+        阶段一：文件解析、计算切片字符片段
+        :param chunk_filter: 招标文件模板片段过滤，过滤掉的切片不参与比对
+        :param on_chunk: 参与比对的每个切片（模板过滤后）的回调
+        """
+        chunks = parse_file_record(file_record, ocr_cache, file_path)
+        self.file_chunks[file_record.id] = [
+            (chunk.page, chunk.start_index, chunk.text, shingle_hashes(chunk.text, self.shingle_size))
+            for chunk in filter_chunks(chunks, chunk_filter, on_chunk)
+            if chunk.text.strip()
+        ]
+        self.file_ids.append(file_record.id)
+        return chunks
+
+    def compare(self, left_file_id, right_file_id) -> List[Dict]:
+        if self.results is None:
+            self.results = self._compare_all()
+        return pop_pair_results(self.results, left_file_id, right_file_id)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """候选切片按微批次向量化，返回归一化矩阵"""
+        vectorizer = OllamaQwenEmbeddingVectorizer()
+        vectors = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            vectors.extend(vectorizer.encode_batch(texts[start:start + self.embed_batch_size]))
+        return normalize_rows(vectors)
+
+    def _compare_all(self) -> Dict[Tuple[int, int], List[Dict]]:
+        """
+        候选切片对筛选、候选切片向量化并计算所有文件对的相似切片
+        """
+        rows = [row for file_id in self.file_ids for row in self.file_chunks[file_id]]
+        if not rows:
+            return {}
+        sizes = np.array([len(self.file_chunks[file_id]) for file_id in self.file_ids], dtype=np.int64)
+        groups = np.repeat(np.arange(len(self.file_ids)), sizes)
+        signatures = MinHash(self.num_perm).batch_signatures([row[3] for row in rows])
+        left_rows, right_rows = banded_candidate_pairs(signatures, self.bands, groups, self.max_bucket)
+        # 只向量化候选对中出现的切片，候选行号换算为向量矩阵中的行号
+        embedded_rows = np.union1d(left_rows, right_rows)
+        total_pairs = int((sizes.sum() ** 2 - (sizes ** 2).sum()) // 2)
+        self.statistics = {
+            "embedded_chunk_ratio": len(embedded_rows) / len(rows),
+            "scored_pair_ratio": len(left_rows) / total_pairs if total_pairs else 0.0,
+        }
+        app_context.logger.info(
+            f"两阶段比对：切片 {len(rows)}，向量化 {len(embedded_rows)}；切片对 {total_pairs}，计算相似度 {len(left_rows)}")
+        if not len(embedded_rows):
+            return {}
+        matrix = self._embed([rows[row][2] for row in embedded_rows.tolist()])
+        # 每个左切片在每个右文件中各保留 top_k 个，与其他引擎一致，结果不受任务文件数影响
+        left_rows, right_rows, scores = pair_topk(
+            matrix, np.searchsorted(embedded_rows, left_rows), np.searchsorted(embedded_rows, right_rows),
+            self.top_k, self.threshold, row_groups=groups[embedded_rows])
+        left_rows, right_rows = embedded_rows[left_rows], embedded_rows[right_rows]
+        results: Dict[Tuple[int, int], List[Dict]] = {}
+        for left_row, right_row, score in zip(left_rows.tolist(), right_rows.tolist(), scores.tolist()):
+            key = (self.file_ids[groups[left_row]], self.file_ids[groups[right_row]])
+            results.setdefault(key, []).append({
+                "left_page": rows[left_row][0],
+                "left_start_index": rows[left_row][1],
+                "left_text": rows[left_row][2],
+                "right_page": rows[right_row][0],
+                "right_start_index": rows[right_row][1],
+                "right_text": rows[right_row][2],
+                "similarity": float(score),
+            })
+        return results
+
+
+class SimHashEngine:
+    """
+    SimHash 比对引擎：阶段一只解析文件并计算切片的64位 SimHash 指纹，指纹与每个文件的多索引哈希表写入本地指纹存储，
+    入库参数（内容哈希、解析器版本、切片参数、模板过滤、特征与索引参数）不变时直接复用；
+    阶段二逐个文件对用右文件的索引表查找左文件切片汉明距离不超过 max_distance 的切片，
+    相似度为汉明距离换算的余弦估计 cos(π·d/64)，不调用向量化服务、不依赖向量库
+    """
+    ready_state = "parsed"
+
+    def __init__(self):
+        config = comparison_config()
+        simhash_config = config.get("simhash") or {}
+        self.shingle_size = int(simhash_config.get("shingle_size", 2))
+        self.max_distance = int(simhash_config.get("max_distance", 6))
+        self.top_k = int(config.get("top_k", 3))
+        self.store = SimHashStore(simhash_config.get("store_dir", "./cache/simhash"))
+        self.file_ids: List[int] = []
+        # 各文件在指纹存储中的参数标识
+        self.store_keys: Dict[int, Optional[str]] = {}
+        self.results: Optional[Dict[Tuple[int, int], List[Dict]]] = None
+
+    def ingest(self, file_record: FileRecordEntity, file_path: str, ocr_cache: ImageOcrCache,
+               on_parsed: Callable[[], None], chunk_filter: ChunkFilter = None,
+               on_chunk: Callable[[HDocument], None] = None) -> Optional[HChunkList]:
+        """
+        阶段一：文件解析、计算切片指纹并写入指纹存储
+        没有特征（只有符号）的切片不参与比对，其指纹为0，会与其他所有空切片“相同”
+        :param chunk_filter: 招标文件模板片段过滤，过滤掉的切片不参与比对
+        :param on_chunk: 模板过滤后保留的每个切片的回调
+        """
+        chunks = parse_file_record(file_record, ocr_cache, file_path)
+        ingest_key = vector_ingest_key(file_record, chunk_filter.key if chunk_filter is not None else None)
+        store_key = (f"{ingest_key}_simhash{SIMHASH_FEATURE_VERSION}_{self.shingle_size}_{self.max_distance}"
+                     if ingest_key else None)
+        if self.store.contains(file_record.id, store_key):
+            if chunk_filter is not None:
+                chunk_filter.total, chunk_filter.suppressed = self.store.counts(file_record.id, store_key)
+            for _ in filter_chunks(chunks, chunk_filter, on_chunk, False):
+                pass
+        else:
+            hash_sets, index = [], []
+            for chunk in filter_chunks(chunks, chunk_filter, on_chunk):
+                hashes = token_hashes(chunk.text, self.shingle_size)
+                if len(hashes):
+                    hash_sets.append(hashes)
+                    index.append((chunk.page, chunk.start_index, chunk.start_index + len(chunk.text)))
+            counts = (chunk_filter.total, chunk_filter.suppressed) if chunk_filter is not None else (0, 0)
+            self.store.put(file_record.id, store_key, simhash_fingerprints(hash_sets), index, self.max_distance, counts)
+        self.store_keys[file_record.id] = store_key
+        self.file_ids.append(file_record.id)
+        return chunks
+
+    def compare(self, left_file_id, right_file_id) -> List[Dict]:
+        if self.results is None:
+            self.results = self._compare_all()
+        return pop_pair_results(self.results, left_file_id, right_file_id)
+
+    def _compare_all(self) -> Dict[Tuple[int, int], List[Dict]]:
+        """
+        内存映射读取各文件的指纹与索引表，每个文件对用右文件的索引表查询左文件的指纹，
+        每个左切片保留汉明距离最小的 top_k 个；相似记录只保存起止位置，不读取切片文本
+        """
+        stored = [self.store.get(file_id, self.store_keys.get(file_id), self.max_distance) for file_id in self.file_ids]
+        results: Dict[Tuple[int, int], List[Dict]] = {}
+        for j, (right_table, right_index) in enumerate(stored):
+            for i, (left_table, left_index) in enumerate(stored[:j]):
+                if not len(left_table) or not len(right_table):
+                    continue
+                left_rows, right_rows, distances = right_table.search(left_table.fingerprints)
+                # 每个左切片按汉明距离升序保留 top_k 个
+                order = np.lexsort((distances, left_rows))
+                left_rows, right_rows, distances = left_rows[order], right_rows[order], distances[order]
+                run_first = np.concatenate(([0], np.flatnonzero(left_rows[1:] != left_rows[:-1]) + 1))[:len(left_rows)]
+                ranks = np.arange(len(left_rows)) - np.repeat(run_first, np.diff(np.append(run_first, len(left_rows))))
+                top = ranks < self.top_k
+                lefts, rights = left_index[left_rows[top]].tolist(), right_index[right_rows[top]].tolist()
+                results[(self.file_ids[i], self.file_ids[j])] = [
+                    {
+                        "left_page": left[0],
+                        "left_start_index": left[1],
+                        "left_end_index": left[2],
+                        "left_text": None,
+                        "right_page": right[0],
+                        "right_start_index": right[1],
+                        "right_end_index": right[2],
+                        "right_text": None,
+                        "similarity": float(np.cos(np.pi * distance / SIMHASH_BITS)),
+                    }
+                    for left, right, distance in zip(lefts, rights, distances[top].tolist())
+                ]
+        return results
+
+
+SIMILARITY_ENGINES = {
+    ENGINE_VECTOR: VectorEngine,
+    ENGINE_LOCAL: LocalVectorEngine,
+    ENGINE_WINNOWING: WinnowingEngine,
+    ENGINE_TFIDF: TfidfEngine,
+    ENGINE_TWO_STAGE: TwoStageEngine,
+    ENGINE_SIMHASH: SimHashEngine,
+}
+
+
+def create_similarity_engine(engine: str):
+    """
+    按任务选择的比对引擎名称创建引擎
+    """
+    if engine not in SIMILARITY_ENGINES:
+        raise ValueError(f"不支持的比对引擎：{engine}")
+    return SIMILARITY_ENGINES[engine]()
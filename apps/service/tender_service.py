@@ -1,44 +1,69 @@
-import asyncio
-from io import BytesIO
 from itertools import combinations
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 
+import numpy as np
 from fastapi import BackgroundTasks
+from sqlalchemy import func, insert, update
 
 from apps import AppContext
-from apps.document_parser.base import HDocument
-from apps.document_parser.pdf_parser import PdfParser
+from apps.document_parser.base import HTable
+from apps.document_parser.ocr import ImageOcrCache
+from apps.document_parser.table_parser import match_table_rows, template_rows
 from apps.repository.entity.file_entity import FileRecordEntity
-from apps.repository.entity.tender_entity import BidPlagiarismCheckTask, SubBidPlagiarismCheckTask
-from apps.service.milnus_service import create_tender_vector_milvus_db
+from apps.repository.entity.tender_entity import BidPlagiarismCheckTask, SubBidPlagiarismCheckTask, BidCheckTaskFile, \
+    DocumentSimilarityRecord
+from apps.service.document_service import extract_file_tables, FilePrefetcher, remove_fetched_file, parse_file_record
+from apps.service.similarity_service import create_similarity_engine, comparison_config, ChunkFilter, ENGINE_VECTOR, \
+    SIMILARITY_ENGINES
+from apps.similarity.base import FileText
+from apps.similarity.merge import merge_chunk_hits
+from apps.similarity.minhash import MinHash, MinHashLSH, shingle_hashes
+from apps.similarity.suffix_array import find_common_spans
+from apps.similarity.template import TemplateIndex
 from apps.web.dto.tender_task import TenderTaskDto
 
 app_context = AppContext()
 
-def create_plagiarism_check_tasks(tender_task_dto: TenderTaskDto) -> List:
+# 任务类型：TASK_TYPE_HISTORY 为历史库比对，新文件与此前所有任务已入库的文件比对，
+# 其余类型为任务内文件两两比对
+TASK_TYPE_HISTORY = 2
+
+
+def create_plagiarism_check_tasks(tender_task_dto: TenderTaskDto) -> Dict:
     """
     创建标书查重任务
     :param tender_task_dto: 标书文件集合，标书文件id
+    :return: 任务数据，包含任务文件与两两比对的子任务
     """
 
+    if tender_task_dto.engine not in SIMILARITY_ENGINES:
+        raise ValueError(f"不支持的比对引擎：{tender_task_dto.engine}")
+    history = tender_task_dto.task_type == TASK_TYPE_HISTORY
+    if history and not hasattr(SIMILARITY_ENGINES[tender_task_dto.engine], "search_corpus"):
+        raise ValueError(f"比对引擎不支持历史库比对：{tender_task_dto.engine}")
     # 根据文件id获取文件管理表中获取对象的信息数据，如文件的类型，文件路径file_path
     with app_context.db_session_factory() as session:
         bid_task = BidPlagiarismCheckTask(
             task_name=tender_task_dto.task_name,
-            check_type=tender_task_dto.task_type
+            check_type=tender_task_dto.task_type,
+            engine=tender_task_dto.engine,
+            tender_file_id=tender_task_dto.tender_file_id
         )
         session.add(bid_task)
         file_record_list:List[FileRecordEntity] = session.query(FileRecordEntity).filter(FileRecordEntity.id.in_(tender_task_dto.file_ids)).all()
-        session.commit()
-        session.begin()
+        session.flush()
+        # 任务内每个文件只登记一次，阶段一按文件解析、向量化
+        task_file_array = [
+            BidCheckTaskFile(
+                bid_plagiarism_check_task_id = bid_task.id,
+                file_id = file_record.id
+            )
+            for file_record in file_record_list
+        ]
+        session.add_all(task_file_array)
         sub_task_array = []
-        for file_record_a, file_record_b in combinations(file_record_list, 2):
-            # id = Column(Integer, primary_key=True, index=True)
-            # process_status = Column(String(20), default="processing")  # 进度状态：completed, processing, parsed, failed
-            # bid_plagiarism_check_task_id = Column(Integer, nullable=False)
-            # left_file_id = Column(Integer, nullable=False)
-            # right_file_id = Column(Integer, nullable=False)
-            # similarity_number = Column(Integer, nullable=False)
+        # 历史库比对的子任务在比对完成后按命中的历史文件生成
+        for file_record_a, file_record_b in ([] if history else combinations(file_record_list, 2)):
             sub_task = SubBidPlagiarismCheckTask(
                 bid_plagiarism_check_task_id = bid_task.id,
                 left_file_id = file_record_a.id,
@@ -46,6 +71,7 @@ def create_plagiarism_check_tasks(tender_task_dto: TenderTaskDto) -> List:
             )
             sub_task_array.append(sub_task)
         session.add_all(sub_task_array)
+        session.flush()
         task_array = []
         for sub_task in sub_task_array:
             task_dict = {
@@ -55,32 +81,34 @@ def create_plagiarism_check_tasks(tender_task_dto: TenderTaskDto) -> List:
                 "right_file_id": sub_task.right_file_id,
             }
             task_array.append(task_dict)
+        bid_task_dict = {
+            "id": bid_task.id,
+            "engine": bid_task.engine,
+            "check_type": bid_task.check_type,
+            "tender_file_id": bid_task.tender_file_id,
+            "file_ids": [task_file.file_id for task_file in task_file_array],
+            "sub_tasks": task_array,
+        }
         session.commit()
 
-
-    return task_array
+    return bid_task_dict
 
 
-async def start_plagiarism_check(tasks:List, background_tasks: BackgroundTasks):
+async def start_plagiarism_check(task:Dict, background_tasks: BackgroundTasks):
     """
     开始异步执行查重检测
-    :param tasks: 检测任务
+    :param task: 检测任务
     :param background_tasks: 后台任务对象，用于异步执行任务，fastApi自带
     """
-    for task in tasks:
-        # 遍历每个任务，并开始执行检测任务
-
-        #background_tasks.add_task(asyncio.to_thread, plagiarism_check_tasks(task))
-        #plagiarism_check_tasks(task)
-        background_tasks.add_task(plagiarism_check_tasks(task))
+    background_tasks.add_task(plagiarism_check_tasks, task)
 
 
-def plagiarism_check_tasks(task:SubBidPlagiarismCheckTask):
+def plagiarism_check_tasks(task:Dict):
     """
     任务执行
     :param task: 任务数据，并非任务本身，实体数据
     """
-    CheckTask(task).execute()
+    BidCheckTask(task).execute()
 
 
 async def bid_plagiarism_check(tender_task_dto: TenderTaskDto, background_tasks: BackgroundTasks):
@@ -91,9 +119,9 @@ async def bid_plagiarism_check(tender_task_dto: TenderTaskDto, background_tasks:
     :return:
     """
     # 创建标书任务
-    tasks: List = create_plagiarism_check_tasks(tender_task_dto)
+    task: Dict = create_plagiarism_check_tasks(tender_task_dto)
     # 异步启动标书查重
-    await start_plagiarism_check(tasks, background_tasks)
+    await start_plagiarism_check(task, background_tasks)
 
 async def service_tender_check_list():
     with app_context.db_session_factory() as session:
@@ -103,8 +131,11 @@ async def service_tender_check_list():
         task_dict = {
             "task_name": task.task_name,
             "check_type": task.check_type,
+            "engine": task.engine,
             "file_name_list": task.file_name_list,
             "process_status": task.process_status,
+            "embedded_chunk_ratio": task.embedded_chunk_ratio,
+            "scored_pair_ratio": task.scored_pair_ratio,
         }
         task_array.append(task_dict)
     return task_array
@@ -121,51 +152,402 @@ async def service_tender_check_list_sub(task_id):
             "similarity_number": task.similarity_number,
             "left_file_name": left_file.file_name,
             "right_file_name": right_file.file_name,
+            "right_task_id": task.right_task_id,
             "process_status": task.process_status,
         }
         task_array.append(task_dict)
     return task_array
 
-class CheckTask:
+def service_tender_check_files(task_id) -> List[Dict]:
     """
-    检查标书任务
+    任务文件处理情况，含与招标文件相同而过滤掉的切片比例
+    :param task_id: 任务id
+    """
+    with app_context.db_session_factory() as session:
+        task_files = session.query(BidCheckTaskFile).filter(BidCheckTaskFile.bid_plagiarism_check_task_id == task_id).all()
+        return [
+            {
+                "file_id": task_file.file_id,
+                "process_status": task_file.process_status,
+                "chunk_number": task_file.chunk_number,
+                "suppressed_number": task_file.suppressed_number,
+                "suppressed_ratio": task_file.suppressed_number / task_file.chunk_number if task_file.chunk_number else 0.0,
+            }
+            for task_file in task_files
+        ]
+
+
+def sub_task_spans(sub_task_id: int) -> Dict:
+    """
+    子任务两个文件之间原文完全相同的全部极大片段（后缀数组），供人工复核时定位复制段落的准确边界
+    :param sub_task_id: 子任务id
+    :return: 两个文件id与片段列表，片段位置为 (页码, 页内起始位置)
+    """
+    spans_config = comparison_config().get("spans") or {}
+    with app_context.db_session_factory() as session:
+        sub_task: SubBidPlagiarismCheckTask = session.get(SubBidPlagiarismCheckTask, sub_task_id)
+        if sub_task is None:
+            raise ValueError(f"子任务不存在：{sub_task_id}")
+        left_record = session.get(FileRecordEntity, sub_task.left_file_id)
+        right_record = session.get(FileRecordEntity, sub_task.right_file_id)
+        # 优先复用解析缓存
+        left_text = FileText.from_chunks(left_record.id, parse_file_record(left_record))
+        right_text = FileText.from_chunks(right_record.id, parse_file_record(right_record))
+    spans = []
+    for span in find_common_spans(left_text.text, right_text.text, int(spans_config.get("min_length", 30)),
+                                  int(spans_config.get("max_repeat", 4))):
+        left_page, left_start_index = left_text.locate(span.left_start)
+        right_page, right_start_index = right_text.locate(span.right_start)
+        spans.append({
+            "left_page": left_page,
+            "left_start_index": left_start_index,
+            "left_text": left_text.text[span.left_start:span.left_end],
+            "right_page": right_page,
+            "right_start_index": right_start_index,
+            "right_text": right_text.text[span.right_start:span.right_end],
+        })
+    return {
+        "left_file_id": left_record.id,
+        "right_file_id": right_record.id,
+        "spans": spans,
+    }
+
+
+class BidCheckTask:
+    """
+    标书查重任务，分两个阶段执行：
+    阶段一：任务内每个文件只下载、解析一次，按任务选择的比对引擎向量化入库或计算指纹，并记录文件处理状态
+    阶段二：基于阶段一的结果执行两两比对子任务，文件数较多时先用 MinHash-LSH 筛选候选对，
+    未成为候选对的子任务不做完整比对，记为 skipped（估计相似度低于阈值）
     """
 
     def __init__(self, task):
         self.task = task
+        self.engine = create_similarity_engine(task.get("engine", ENGINE_VECTOR))
+        # 文件id -> 处理状态（embedded, parsed, failed）
+        self.file_states: Dict[int, str] = {}
+        # 文件id -> 表格，表格逐行比对，不经过向量化
+        self.file_tables: Dict[int, List[HTable]] = {}
+        # 任务内共享的图片OCR结果，不同投标人嵌入的相同图片（公章、营业执照）只识别一次
+        self.ocr_cache = ImageOcrCache()
+        # 文件数超过 min_files 时启用候选对筛选，文件较少时全部两两比对（历史库比对不做两两比对）
+        lsh_config = app_context.app_config.get("lsh") or {}
+        self.minhash = None
+        self.lsh = None
+        self.shingle_size = int(lsh_config.get("shingle_size", 5))
+        if (lsh_config.get("enabled", True) and task.get("check_type") != TASK_TYPE_HISTORY
+                and len(task["file_ids"]) > int(lsh_config.get("min_files", 10))):
+            num_perm = int(lsh_config.get("num_perm", 120))
+            self.minhash = MinHash(num_perm)
+            self.lsh = MinHashLSH(num_perm, int(lsh_config.get("bands", 40)))
+        # 招标文件（模板）索引，投标文件中与招标文件相同的切片不参与比对
+        self.template_text: str = None
+        self.template: TemplateIndex = None
+        # 招标文件表格的行，投标文件中照抄的模板行不参与表格逐行比对
+        self.template_rows: Set[Tuple[str, ...]] = set()
+
+    def execute(self):
+        """
+        执行查重任务
+        """
+        file_ids = self.task["file_ids"]
+        with app_context.db_session_factory() as session:
+            file_records = {
+                file_record.id: file_record
+                for file_record in session.query(FileRecordEntity).filter(FileRecordEntity.id.in_(file_ids)).all()
+            }
+        if self.task.get("tender_file_id"):
+            self._load_template(self.task["tender_file_id"])
+        # 解析当前文件时并行下载后续文件
+        prefetcher = FilePrefetcher(int(app_context.minio_config.get("prefetch", 2)))
+        try:
+            for index, file_id in enumerate(file_ids):
+                for next_file_id in file_ids[index:index + prefetcher.workers + 1]:
+                    if next_file_id in file_records:
+                        prefetcher.prefetch(file_records[next_file_id])
+                self.file_states[file_id] = self._ingest_file(file_id, prefetcher)
+        finally:
+            prefetcher.close()
+        if self.task.get("check_type") == TASK_TYPE_HISTORY:
+            self._check_history()
+        else:
+            for sub_task in self._candidate_sub_tasks():
+                CheckTask(sub_task, self.file_states, self.file_tables, self.engine, self.template_rows).execute()
+        with app_context.db_session_factory() as session:
+            bid_task: BidPlagiarismCheckTask = session.get(BidPlagiarismCheckTask, self.task["id"])
+            bid_task.process_status = "completed"
+            statistics = getattr(self.engine, "statistics", None)
+            if statistics:
+                bid_task.embedded_chunk_ratio = statistics["embedded_chunk_ratio"]
+                bid_task.scored_pair_ratio = statistics["scored_pair_ratio"]
+            session.commit()
+
+    def _ingest_file(self, file_id, prefetcher: FilePrefetcher) -> str:
+        """
+        阶段一：文件解析，向量化入库或计算指纹
+        :param file_id: 文件id
+        :param prefetcher: 文件预取
+        :return: 文件最终处理状态
+        """
+        # 解析、OCR、向量化耗时较长，期间不占用数据库连接：读取记录后关闭会话，状态变更各用一个短会话写入
+        with app_context.db_session_factory() as session:
+            file_record = session.get(FileRecordEntity, file_id)
+        file_path = None
+        fields = {}
+        try:
+            file_path = prefetcher.take(file_record)
+
+            def on_parsed():
+                self._update_task_file(file_id, process_status="parsed")
+
+            chunk_filter = self._chunk_filter()
+            # 文件签名取自模板过滤后参与比对的切片，流式模式下随流水线逐个切片收集字符片段，不重新解析
+            shingles: Optional[List[np.ndarray]] = [] if self.lsh is not None else None
+            on_chunk = (lambda document: shingles.append(shingle_hashes(document.text, self.shingle_size))) \
+                if shingles is not None else None
+            self.engine.ingest(file_record, file_path, self.ocr_cache, on_parsed, chunk_filter, on_chunk)
+            if chunk_filter is not None:
+                fields["chunk_number"] = chunk_filter.total
+                fields["suppressed_number"] = chunk_filter.suppressed
+                app_context.logger.info(
+                    f"文件{file_id}招标文件模板过滤：{chunk_filter.suppressed}/{chunk_filter.total}个切片"
+                )
+            if self.lsh is not None:
+                hashes = np.unique(np.concatenate(shingles)) if shingles else np.empty(0, dtype=np.uint64)
+                self.lsh.add(file_id, self.minhash.signature(hashes))
+            fields["process_status"] = self.engine.ready_state
+        except Exception as e:
+            app_context.logger.exception(f"文件处理失败：{file_id}")
+            fields = {"process_status": "failed", "error_message": str(e)}
+        self._update_task_file(file_id, **fields)
+        try:
+            if fields["process_status"] == self.engine.ready_state:
+                self.file_tables[file_id] = self._extract_tables(file_record, file_path)
+        finally:
+            remove_fetched_file(file_path)
+        return fields["process_status"]
+
+    def _update_task_file(self, file_id, **fields):
+        """
+        短会话更新任务文件记录
+        :param file_id: 文件id
+        :param fields: 要更新的字段
+        """
+        with app_context.db_session_factory() as session:
+            session.query(BidCheckTaskFile).filter(
+                BidCheckTaskFile.bid_plagiarism_check_task_id == self.task["id"],
+                BidCheckTaskFile.file_id == file_id
+            ).update(fields, synchronize_session=False)
+            session.commit()
+
+    def _check_history(self):
+        """
+        历史库比对：每个新文件检索一次整个向量库，命中结果按历史文件分组，
+        每个历史文件生成一个子任务（记录历史文件所属任务），子任务与相似记录在同一事务中写入
+        """
+        file_ids = self.task["file_ids"]
+        for file_id in file_ids:
+            if self.file_states.get(file_id) != self.engine.ready_state:
+                continue
+            try:
+                groups = self.engine.search_corpus(file_id, file_ids)
+            except Exception:
+                app_context.logger.exception(f"文件历史库比对失败：{file_id}")
+                continue
+            if not groups:
+                continue
+            with app_context.db_session_factory() as session:
+                # 历史文件所属的任务，文件属于多个任务时取最近的任务
+                history_tasks = dict(
+                    session.query(BidCheckTaskFile.file_id, func.max(BidCheckTaskFile.bid_plagiarism_check_task_id))
+                    .filter(BidCheckTaskFile.file_id.in_(list(groups)),
+                            BidCheckTaskFile.bid_plagiarism_check_task_id != self.task["id"])
+                    .group_by(BidCheckTaskFile.file_id)
+                    .all()
+                )
+                records = []
+                for history_file_id, matches in groups.items():
+                    sub_task = SubBidPlagiarismCheckTask(
+                        bid_plagiarism_check_task_id=self.task["id"],
+                        left_file_id=file_id,
+                        right_file_id=history_file_id,
+                        right_task_id=history_tasks.get(history_file_id),
+                        process_status="completed"
+                    )
+                    session.add(sub_task)
+                    session.flush()
+                    task_dict = {
+                        "id": sub_task.id,
+                        "bid_plagiarism_check_task_id": self.task["id"],
+                        "left_file_id": file_id,
+                        "right_file_id": history_file_id,
+                    }
+                    sub_records = span_records(task_dict, matches)
+                    sub_task.similarity_number = len(sub_records)
+                    records.extend(sub_records)
+                session.execute(insert(DocumentSimilarityRecord), records)
+                session.commit()
+
+    def _load_template(self, tender_file_id):
+        """
+        解析任务登记的招标文件并构建模板索引，招标文件解析失败时不做模板过滤，不影响查重
+        """
+        try:
+            with app_context.db_session_factory() as session:
+                tender_record = session.get(FileRecordEntity, tender_file_id)
+                chunks = parse_file_record(tender_record, self.ocr_cache)
+            self.template_text = FileText.from_chunks(tender_file_id, chunks).text
+            template_config = app_context.app_config.get("template") or {}
+            self.template = TemplateIndex.build(self.template_text, int(template_config.get("k", 8)))
+            self.template_rows = template_rows(self._extract_tables(tender_record))
+        except Exception:
+            app_context.logger.exception(f"招标文件解析失败：{tender_file_id}")
+
+    def _chunk_filter(self) -> Optional[ChunkFilter]:
+        """单个文件的模板片段过滤，未登记招标文件时为None"""
+        if self.template is None:
+            return None
+        template_config = app_context.app_config.get("template") or {}
+        return ChunkFilter(self.template_text, self.template, float(template_config.get("min_coverage", 0.8)))
+
+    def _candidate_sub_tasks(self) -> List[Dict]:
+        """
+        筛选需要完整比对的子任务，两个文件均已登记签名但未在任何分段中落入同一个桶的子任务直接记为 skipped，
+        并记录 MinHash 估计的相似度
+        """
+        if self.lsh is None:
+            return self.task["sub_tasks"]
+        candidates = {frozenset(pair) for pair in self.lsh.candidate_pairs()}
+        sub_tasks = []
+        skipped = []
+        for sub_task in self.task["sub_tasks"]:
+            left_file_id, right_file_id = sub_task["left_file_id"], sub_task["right_file_id"]
+            if (left_file_id in self.lsh.signatures and right_file_id in self.lsh.signatures
+                    and frozenset((left_file_id, right_file_id)) not in candidates):
+                skipped.append({
+                    "id": sub_task["id"],
+                    "process_status": "skipped",
+                    "estimated_similarity": self.lsh.estimate(left_file_id, right_file_id),
+                })
+            else:
+                sub_tasks.append(sub_task)
+        if skipped:
+            with app_context.db_session_factory() as session:
+                session.execute(update(SubBidPlagiarismCheckTask), skipped)
+                session.commit()
+        app_context.logger.info(f"任务{self.task['id']}候选对筛选：完整比对{len(sub_tasks)}个，跳过{len(skipped)}个")
+        return sub_tasks
+
+    def _extract_tables(self, file_record: FileRecordEntity, file_path: str = None) -> List[HTable]:
+        """
+        抽取文件表格，表格抽取失败不影响文本比对
+        """
+        try:
+            return extract_file_tables(file_record, file_path)
+        except Exception:
+            app_context.logger.exception(f"表格抽取失败：{file_record.id}")
+            return []
+
+
+def similarity_record(task: Dict, left_page, left_start_index, left_end_index, right_page, right_start_index,
+                      right_end_index, similarity, left_text: str = None, right_text: str = None, hit_number: int = 1,
+                      left_table: Tuple[int, int] = None, right_table: Tuple[int, int] = None) -> Dict:
+    """
+    相似记录（批量写入 DocumentSimilarityRecord 的字段）
+    :param task: 子任务数据
+    :param left_text: 记录文本，相似片段不保存文本（为None），按起止位置从解析结果截取
+    :param left_table: 表格行记录的 (表格在页面中的序号, 表格内行号)，文本片段记录为None
+    """
+    return {
+        "bid_plagiarism_check_task_id": task["bid_plagiarism_check_task_id"],
+        "sub_bid_plagiarism_check_task_id": task["id"],
+        "left_file_id": task["left_file_id"],
+        "left_file_page": left_page,
+        "left_file_page_start_index": left_start_index,
+        "left_file_page_end_index": left_end_index,
+        "left_file_page_chunk": left_text[:255] if left_text is not None else None,
+        "left_file_table_index": left_table[0] if left_table else None,
+        "left_file_table_row": left_table[1] if left_table else None,
+        "right_file_id": task["right_file_id"],
+        "right_file_page": right_page,
+        "right_file_page_start_index": right_start_index,
+        "right_file_page_end_index": right_end_index,
+        "right_file_page_chunk": right_text[:255] if right_text is not None else None,
+        "right_file_table_index": right_table[0] if right_table else None,
+        "right_file_table_row": right_table[1] if right_table else None,
+        "similarity": similarity,
+        "hit_number": hit_number,
+    }
+
+
+def span_records(task: Dict, matches: List[Dict]) -> List[Dict]:
+    """
+    比对引擎的命中合并为相似片段后生成相似记录，每个片段一条记录（只保存起止位置）
+    :param task: 子任务数据
+    :param matches: 引擎返回的命中
+    """
+    merge_config = comparison_config().get("merge") or {}
+    spans = merge_chunk_hits(matches, int(merge_config.get("max_gap", 50)), int(merge_config.get("max_shift", 10)))
+    return [similarity_record(task, **span) for span in spans]
+
+
+class CheckTask:
+    """
+    检查标书任务（两两比对子任务）
+    """
+
+    def __init__(self, task, file_states: Dict[int, str], file_tables: Dict[int, List[HTable]], engine,
+                 template_rows: Set[Tuple[str, ...]] = None):
+        self.task = task
+        self.file_states = file_states
+        self.file_tables = file_tables
+        self.engine = engine
+        self.template_rows = template_rows or set()
 
     def execute(self):
         """
-        执行比对任务
+        执行比对任务，文件已在阶段一完成向量化或指纹计算
+        两两组合只比对一个方向（左文件对右文件），命中记录与相似数量在同一事务中写入
         """
         left_file_id = self.task["left_file_id"]
         right_file_id = self.task["right_file_id"]
+        records = None
+        ready_state = self.engine.ready_state
+        if self.file_states.get(left_file_id) == ready_state and self.file_states.get(right_file_id) == ready_state:
+            try:
+                records = span_records(self.task, self.engine.compare(left_file_id, right_file_id)) + self._table_row_records()
+            except Exception:
+                app_context.logger.exception(f"子任务比对失败：{self.task['id']}")
         with app_context.db_session_factory() as session:
-            file_record_a = session.query(FileRecordEntity).get(left_file_id)
-            file_record_b = session.query(FileRecordEntity).get(right_file_id)
-            self._file_record_handle(file_record_a)
-            self._file_record_handle(file_record_b)
-            sub_task:SubBidPlagiarismCheckTask = session.query(SubBidPlagiarismCheckTask).get(self.task["id"])
-            sub_task.process_status = "completed"
-            session.add(sub_task)
-
-    def _file_record_handle(self, file_record: FileRecordEntity):
-        """
-        文件处理功能
-        :param file_record: 文件管理数据表计入
-        """
-        file_path = file_record.file_path
-        business_id = file_record.business_id
-        minio_client = app_context.minio_client
-        with minio_client.get_object(business_id, file_path) as response:
-            file_data = response.read()  # 自动 close + release_conn
-        pdf_stream = BytesIO(file_data)
-        if file_record.mime_type == "pdf":
-            pdf_parser = PdfParser()
-            file_document = pdf_parser.parse(stream=pdf_stream, file_id=file_record.id)
-            documents: list[HDocument] = pdf_parser.overlapping_splitting(file_document, 50, 5)
-            milvus_vector_db = create_tender_vector_milvus_db(1024)
-            milvus_vector_db.insert_data(documents)
-        else:
-            # 处理其他格式的
-            pass
+            sub_task:SubBidPlagiarismCheckTask = session.get(SubBidPlagiarismCheckTask, self.task["id"])
+            if records is None:
+                sub_task.process_status = "failed"
+            else:
+                if records:
+                    session.execute(insert(DocumentSimilarityRecord), records)
+                sub_task.similarity_number = len(records)
+                sub_task.process_status = "completed"
+            session.commit()
+
+    def _table_row_records(self) -> List[Dict]:
+        """
+        表格逐行比对，归一化后完全相同的行记为相似记录（相似度为1，保存行文本）
+        表格序号与行号保存在表格字段中，页内起始位置记为0、结束位置为空；重复出现的行只记录一次，出现次数记为命中数
+        """
+        table_config = app_context.app_config.get("table") or {}
+        matches = match_table_rows(
+            self.file_tables.get(self.task["left_file_id"], []),
+            self.file_tables.get(self.task["right_file_id"], []),
+            int(table_config.get("min_filled_cells", 2)),
+            self.template_rows
+        )
+        return [
+            similarity_record(
+                self.task,
+                left_page=left_table.page, left_start_index=0, left_end_index=None,
+                right_page=right_table.page, right_start_index=0, right_end_index=None, similarity=1.0,
+                left_text=" | ".join(left_table.rows[left_row]), right_text=" | ".join(right_table.rows[right_row]),
+                hit_number=count, left_table=(left_table.index, left_row), right_table=(right_table.index, right_row)
+            )
+            for left_table, left_row, right_table, right_row, count in matches
+        ]
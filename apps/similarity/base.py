@@ -0,0 +1,63 @@
+from array import array
+from bisect import bisect_right
+from typing import Tuple
+
+from apps.document_parser.base import HChunkList
+from apps.document_parser.base_parser import PAGE_SEPARATOR
+
+
+class FileText:
+    """
+    文件全文（各页空白归一化后拼接），比对引擎基于全文偏移量工作，结果再按页面起始位置换算为 (页码, 页内位置)
+    """
+
+    def __init__(self, file_id, text: str, page_starts: array, page_numbers: array):
+        self.file_id = file_id
+        self.text = text
+        self.page_starts = page_starts
+        self.page_numbers = page_numbers
+
+    @classmethod
+    def from_chunks(cls, file_id, chunks: HChunkList) -> "FileText":
+        """
+        由切片列表的文本缓冲区还原全文，按页切片时各页缓冲区按顺序拼接，文档级切片时缓冲区即全文
+        """
+        texts = []
+        page_starts = array("l")
+        page_numbers = array("l")
+        length = 0
+        for text, starts, numbers in zip(chunks.texts, chunks.page_starts, chunks.page_numbers):
+            if texts:
+                length += len(PAGE_SEPARATOR)
+            page_starts.extend(length + start for start in starts)
+            page_numbers.extend(numbers)
+            texts.append(text)
+            length += len(text)
+        return cls(file_id, PAGE_SEPARATOR.join(texts), page_starts, page_numbers)
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        """
+        全文偏移量换算为 (页码, 页内位置)
+        """
+        index = bisect_right(self.page_starts, offset) - 1
+        if index < 0:
+            return (self.page_numbers[0], offset) if self.page_numbers else (0, offset)
+        return self.page_numbers[index], offset - self.page_starts[index]
+
+
+class MatchSpan:
+    """
+    两个文件之间的相似片段，位置为全文偏移量，左闭右开
+    """
+    __slots__ = ("left_start", "left_end", "right_start", "right_end", "similarity")
+
+    def __init__(self, left_start: int, left_end: int, right_start: int, right_end: int, similarity: float):
+        self.left_start = left_start
+        self.left_end = left_end
+        self.right_start = right_start
+        self.right_end = right_end
+        self.similarity = similarity
+
+    def __repr__(self):
+        return (f"MatchSpan(left=[{self.left_start}, {self.left_end}), right=[{self.right_start}, {self.right_end}), "
+                f"similarity={self.similarity:.3f})")
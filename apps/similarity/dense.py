@@ -0,0 +1,166 @@
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+# 单个分块相似度矩阵的默认内存上限（字节）
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+def normalize_rows(vectors, dtype=np.float32) -> np.ndarray:
+    """
+    向量按行 L2 归一化，归一化后矩阵乘积即余弦相似度
+    :param vectors: 向量矩阵（或向量列表）
+    :param dtype: 存储精度，float16 内存减半，计算时按块转换为 float32
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix.astype(dtype, copy=False)
+
+
+class QuantizedVectors:
+    """
+    int8 量化向量：每个向量按自身最大绝对值缩放到 [-127, 127]，保存 int8 编码与每个向量的缩放系数，
+    内存为 float32 的1/4；切片仍为量化向量，计算时按块反量化为 float32
+    """
+    __slots__ = ("codes", "scales")
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes  # int8 编码（向量数 × 维度），可为内存映射数组
+        self.scales = scales  # 每个向量的缩放系数（float32）
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index) -> "QuantizedVectors":
+        return QuantizedVectors(self.codes[index], self.scales[index])
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def dequantize(self) -> np.ndarray:
+        return np.asarray(self.codes, dtype=np.float32) * np.asarray(self.scales, dtype=np.float32)[:, None]
+
+
+def quantize_int8(matrix: np.ndarray) -> QuantizedVectors:
+    """
+    向量按行量化为 int8（输入应已归一化），缩放系数为每行最大绝对值/127
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0 if len(matrix) else np.empty(0, dtype=np.float32)
+    scales[scales == 0] = 1.0
+    codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return QuantizedVectors(codes, scales.astype(np.float32))
+
+
+def _as_float32(matrix) -> np.ndarray:
+    if isinstance(matrix, QuantizedVectors):
+        return matrix.dequantize()
+    return matrix if matrix.dtype == np.float32 else matrix.astype(np.float32)
+
+
+def block_topk(left, right, top_k: int, threshold: float,
+               memory_budget: int = DEFAULT_MEMORY_BUDGET) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    左矩阵每一行在右矩阵中相似度最高的 top_k 行（且不低于阈值）
+    左右矩阵都按行分块，每次只将一个左块、一个右块转换（反量化）为 float32 做矩阵乘法，
+    转换后的块与相似度块都不超过 memory_budget，内存映射的矩阵不会整体读入内存；
+    每行的候选 top_k 由 argpartition 跨右块滚动合并，不对整行排序
+
+    :param left: 左矩阵（已归一化，可为 float16、内存映射数组或 int8 量化向量）
+    :param right: 右矩阵（已归一化，可为 float16、内存映射数组或 int8 量化向量）
+    :return: (左行号, 右行号, 相似度)，按左行号、相似度降序排列
+    """
+    left_rows, right_rows, scores = [], [], []
+    k = min(top_k, len(right))
+    if k <= 0 or len(left) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    # 转换后的左块、右块各占预算的一半以内，相似度块 (左块行数 × 右块行数) 不超过预算
+    row_bytes = 4 * max(1, left.shape[1])
+    right_block = min(len(right), max(k, memory_budget // (2 * row_bytes)))
+    left_block = max(1, min(memory_budget // (4 * right_block), memory_budget // (2 * row_bytes)))
+    # 右矩阵只有一块时只转换一次
+    whole_right = _as_float32(right) if right_block >= len(right) else None
+    for start in range(0, len(left), left_block):
+        left_part = _as_float32(left[start:start + left_block])
+        best_scores = np.empty((len(left_part), 0), dtype=np.float32)
+        best_columns = np.empty((len(left_part), 0), dtype=np.int64)
+        for right_start in range(0, len(right), right_block):
+            right_part = whole_right if whole_right is not None else _as_float32(right[right_start:right_start + right_block])
+            similarity = left_part @ right_part.T
+            candidate_scores = np.concatenate((best_scores, similarity), axis=1)
+            candidate_columns = np.concatenate(
+                (best_columns, np.broadcast_to(np.arange(right_start, right_start + similarity.shape[1]), similarity.shape)),
+                axis=1)
+            if candidate_scores.shape[1] > k:
+                top = np.argpartition(candidate_scores, -k, axis=1)[:, -k:]
+                candidate_scores = np.take_along_axis(candidate_scores, top, axis=1)
+                candidate_columns = np.take_along_axis(candidate_columns, top, axis=1)
+            best_scores, best_columns = candidate_scores, candidate_columns
+        # 每行按相似度降序
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        best_columns = np.take_along_axis(best_columns, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        rows, columns = np.nonzero(best_scores >= threshold)
+        left_rows.append(rows + start)
+        right_rows.append(best_columns[rows, columns])
+        scores.append(best_scores[rows, columns])
+    return np.concatenate(left_rows), np.concatenate(right_rows), np.concatenate(scores)
+
+
+def cross_file_topk(files: Sequence, top_k: int, threshold: float,
+                    memory_budget: int = DEFAULT_MEMORY_BUDGET) -> Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    任务内全部文件两两之间的切片相似度，一次遍历得到所有文件对的结果
+    各文件的矩阵分别传入（可为内存映射数组），不拼接为一个矩阵；
+    每个文件对只计算一个方向（前面的文件对后面的文件）
+
+    :param files: 各文件的切片向量（已归一化）
+    :return: {(左文件序号, 右文件序号): (左行号, 右行号, 相似度)}，行号为各自文件内的行号
+    """
+    results = {}
+    for i in range(len(files)):
+        for j in range(i + 1, len(files)):
+            results[(i, j)] = block_topk(files[i], files[j], top_k, threshold, memory_budget)
+    return results
+
+
+def pair_topk(matrix: np.ndarray, left_rows: np.ndarray, right_rows: np.ndarray, top_k: int, threshold: float,
+              block_size: int = 65536, row_groups: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    只计算给定行对（如候选对）的余弦相似度，按块取出两侧行做逐行点积，不计算完整的相似度矩阵；
+    再按阈值过滤，每个左行保留相似度最高的 top_k 对
+
+    :param matrix: 向量矩阵（已归一化）
+    :param left_rows: 左行号
+    :param right_rows: 右行号
+    :param row_groups: 矩阵各行所属的文件序号，给定时每个左行在每个右文件中各保留 top_k 对
+    :return: (左行号, 右行号, 相似度)，按左行号（、右文件）、相似度降序排列
+    """
+    scores = np.empty(len(left_rows), dtype=np.float32)
+    for start in range(0, len(left_rows), block_size):
+        end = start + block_size
+        scores[start:end] = np.einsum(
+            "ij,ij->i", _as_float32(matrix[left_rows[start:end]]), _as_float32(matrix[right_rows[start:end]]))
+    keep = scores >= threshold
+    left_rows, right_rows, scores = left_rows[keep], right_rows[keep], scores[keep]
+    # 排名单位：左行，或 (左行, 右文件)
+    run_keys = left_rows.astype(np.int64)
+    if row_groups is not None:
+        group_count = np.int64(int(row_groups.max()) + 1 if len(row_groups) else 1)
+        run_keys = run_keys * group_count + row_groups[right_rows]
+    order = np.lexsort((-scores, run_keys))
+    left_rows, right_rows, scores, run_keys = left_rows[order], right_rows[order], scores[order], run_keys[order]
+    # 组内名次 = 位置 - 该组第一个元素的位置
+    row_first = np.concatenate(([0], np.flatnonzero(run_keys[1:] != run_keys[:-1]) + 1))
+    ranks = np.arange(len(left_rows)) - np.repeat(row_first, np.diff(np.concatenate((row_first, [len(left_rows)]))))
+    top = ranks < top_k
+    return left_rows[top], right_rows[top], scores[top]
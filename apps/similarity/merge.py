@@ -0,0 +1,64 @@
+from typing import Dict, List
+
+
+def merge_chunk_hits(hits: List[Dict], max_gap: int = 50, max_shift: int = 10) -> List[Dict]:
+    """
+    切片级命中合并为连续的相似片段
+    重叠切片下一段被复制的文本会产生数十个相邻命中，命中按 (左页码, 左起始位置, 右起始位置) 排序后做区间扫描：
+    与某个未结束片段页码相同、左右两侧都与片段相接（间隔不超过 max_gap）、
+    且对角线（右起始位置 - 左起始位置）与片段最后一个命中相差不超过 max_shift 的命中并入该片段，否则开始新片段
+
+    :param hits: 命中（left_page, left_start_index, left_text, right_page, right_start_index, right_text, similarity），
+                 可含 left_end_index / right_end_index，缺省时为起始位置加文本长度
+    :param max_gap: 同一片段内相邻命中的最大间隔（字符数），允许中间少量切片未命中
+    :param max_shift: 对角线最大偏移，允许少量增删字符造成的错位
+    :return: 片段（left_page, left_start_index, left_end_index, right_page, right_start_index, right_end_index,
+             similarity 为所含命中相似度的平均值, hit_number 为所含命中数），按左页码、左起始位置排列
+    """
+    rows = sorted(
+        (
+            hit["left_page"], hit["left_start_index"],
+            hit.get("left_end_index") or hit["left_start_index"] + len(hit["left_text"] or ""),
+            hit["right_page"], hit["right_start_index"],
+            hit.get("right_end_index") or hit["right_start_index"] + len(hit["right_text"] or ""),
+            hit["similarity"],
+        )
+        for hit in hits
+    )
+    spans: List[List] = []
+    # 各 (左页码, 右页码) 上未结束的片段在 spans 中的序号
+    open_spans: Dict[tuple, List[int]] = {}
+    current_left_page = None
+    for left_page, left_start, left_end, right_page, right_start, right_end, similarity in rows:
+        if left_page != current_left_page:
+            open_spans.clear()
+            current_left_page = left_page
+        candidates = open_spans.setdefault((left_page, right_page), [])
+        # 左侧已不可能相接的片段结束
+        candidates[:] = [index for index in candidates if spans[index][2] + max_gap >= left_start]
+        diagonal = right_start - left_start
+        for index in reversed(candidates):
+            span = spans[index]
+            if span[4] <= right_start <= span[5] + max_gap and abs(diagonal - span[8]) <= max_shift:
+                span[2] = max(span[2], left_end)
+                span[5] = max(span[5], right_end)
+                span[6] += similarity
+                span[7] += 1
+                span[8] = diagonal
+                break
+        else:
+            candidates.append(len(spans))
+            spans.append([left_page, left_start, left_end, right_page, right_start, right_end, similarity, 1, diagonal])
+    return [
+        {
+            "left_page": span[0],
+            "left_start_index": span[1],
+            "left_end_index": span[2],
+            "right_page": span[3],
+            "right_start_index": span[4],
+            "right_end_index": span[5],
+            "similarity": span[6] / span[7],
+            "hit_number": span[7],
+        }
+        for span in spans
+    ]
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from typing import Dict, Hashable, List, Set, Tuple
+
+import numpy as np
+
+from apps.similarity.winnowing import kgram_hashes, normalize_codes
+
+# 哈希排列使用的大素数（2^61-1），排列为 (a*x + b) mod p
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# 计算签名时每批处理的片段数，控制 (排列数 × 片段数) 临时矩阵的内存
+_SIGNATURE_BLOCK = 8192
+
+
+def shingle_hashes(text: str, k: int = 5) -> np.ndarray:
+    """
+    文本的字符片段（shingle）集合，归一化规则与 winnowing 指纹一致
+    :return: 去重后的片段哈希（取低32位，uint64）
+    """
+    codes, _ = normalize_codes(text)
+    return np.unique(kgram_hashes(codes, k) & _MAX_HASH)
+
+
+class MinHash:
+    """
+    MinHash 签名：num_perm 个哈希排列下片段集合的最小值，两个签名相等位置的比例估计 Jaccard 相似度
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = generator.randint(1, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+        self.b = generator.randint(0, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        片段哈希集合的签名，按批计算 (排列数 × 片段数) 的排列结果再逐列取最小
+        :param hashes: 片段哈希（低32位）
+        :return: 签名（uint32，长度 num_perm），空集合的签名全为最大值
+        """
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), _SIGNATURE_BLOCK):
+            block = hashes[start:start + _SIGNATURE_BLOCK]
+            # a、x 均小于 2^32，乘积不会溢出 uint64
+            permuted = (self.a[:, None] * block[None, :] + self.b[:, None]) % _PRIME & _MAX_HASH
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def text_signature(self, text: str, k: int = 5) -> np.ndarray:
+        return self.signature(shingle_hashes(text, k))
+
+    def batch_signatures(self, hash_sets: List[np.ndarray]) -> np.ndarray:
+        """
+        批量计算多个片段集合（如全部切片）的签名，片段拼接后按批做排列，再按集合边界分段取最小
+        :param hash_sets: 各集合的片段哈希（低32位）
+        :return: 签名矩阵（uint32，集合数 × num_perm），空集合的签名全为最大值
+        """
+        signatures = np.full((len(hash_sets), self.num_perm), _MAX_HASH, dtype=np.uint64)
+        sizes = np.array([len(hashes) for hashes in hash_sets], dtype=np.int64)
+        start = 0
+        while start < len(hash_sets):
+            # 每批集合的片段总数约为 _SIGNATURE_BLOCK 的8倍
+            end = start + 1
+            total = sizes[start]
+            while end < len(hash_sets) and total + sizes[end] <= _SIGNATURE_BLOCK * 8:
+                total += sizes[end]
+                end += 1
+            members = [index for index in range(start, end) if sizes[index]]
+            if members:
+                block = np.concatenate([hash_sets[index] for index in members])
+                permuted = (self.a[:, None] * block[None, :] + self.b[:, None]) % _PRIME & _MAX_HASH
+                boundaries = np.concatenate(([0], np.cumsum(sizes[members])[:-1]))
+                signatures[members] = np.minimum.reduceat(permuted, boundaries, axis=1).T
+            start = end
+        return signatures.astype(np.uint32)
+
+
+def estimate_jaccard(left: np.ndarray, right: np.ndarray) -> float:
+    """由两个签名估计 Jaccard 相似度"""
+    return float(np.count_nonzero(left == right)) / len(left)
+
+
+def banded_candidate_pairs(signatures: np.ndarray, bands: int, groups: np.ndarray,
+                           max_bucket: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    签名矩阵的 LSH 候选对（如切片级候选），每段签名合并为一个64位桶键，排序后相同键的连续行为同一个桶，
+    桶内分属不同组（文件）的行两两组合；超过 max_bucket 的桶（大量重复的套话）不产生候选
+
+    :param signatures: 签名矩阵（行数 × num_perm）
+    :param bands: 分段数
+    :param groups: 每行所属的组，只产生组号不同的候选对
+    :return: (左行号, 右行号)，左行组号小于右行组号，去重后按左行号排序
+    """
+    rows_per_band = signatures.shape[1] // bands
+    pair_keys = []
+    row_count = np.int64(len(signatures))
+    for band in range(bands):
+        band_values = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+        keys = np.zeros(len(signatures), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for column in range(rows_per_band):
+                keys = keys * np.uint64(0x100000001b3) ^ band_values[:, column]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        run_starts = np.concatenate(([0], np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1))
+        run_sizes = np.diff(np.concatenate((run_starts, [len(order)])))
+        valid = (run_sizes >= 2) & (run_sizes <= max_bucket)
+        run_starts, run_sizes = run_starts[valid], run_sizes[valid]
+        if not len(run_starts):
+            continue
+        # 桶内两两组合：每个桶产生 size² 个有序对，再保留组号不同且左组号较小的对
+        pair_counts = run_sizes * run_sizes
+        owners = np.repeat(np.arange(len(run_starts)), pair_counts)
+        within = np.arange(int(pair_counts.sum())) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+        left = order[run_starts[owners] + within // run_sizes[owners]]
+        right = order[run_starts[owners] + within % run_sizes[owners]]
+        keep = groups[left] < groups[right]
+        pair_keys.append(left[keep].astype(np.int64) * row_count + right[keep])
+    if not pair_keys:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    unique_keys = np.unique(np.concatenate(pair_keys))
+    return unique_keys // row_count, unique_keys % row_count
+
+
+class MinHashLSH:
+    """
+    MinHash 局部敏感哈希：签名分为 bands 段，每段 rows 个值整体作为桶键，
+    至少在一段中落入同一个桶的两个文件为候选对。
+    Jaccard 相似度为 s 的两个文件成为候选对的概率为 1-(1-s^rows)^bands，阈值约为 (1/bands)^(1/rows)
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32):
+        if num_perm % bands:
+            raise ValueError("签名长度必须能被分段数整除")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: List[Dict[bytes, List[Hashable]]] = [defaultdict(list) for _ in range(bands)]
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+
+    @property
+    def threshold(self) -> float:
+        """候选对的近似 Jaccard 相似度阈值"""
+        return (1.0 / self.bands) ** (1.0 / self.rows)
+
+    def add(self, key: Hashable, signature: np.ndarray):
+        self.signatures[key] = signature
+        for band, bucket in enumerate(self.buckets):
+            bucket[signature[band * self.rows:(band + 1) * self.rows].tobytes()].append(key)
+
+    def candidate_pairs(self) -> Set[Tuple]:
+        """
+        候选对集合，对中两个键按登记顺序排列
+        """
+        order = {key: index for index, key in enumerate(self.signatures)}
+        pairs = set()
+        for bucket in self.buckets:
+            for keys in bucket.values():
+                if len(keys) < 2:
+                    continue
+                keys = sorted(set(keys), key=order.get)
+                for i in range(len(keys)):
+                    for j in range(i + 1, len(keys)):
+                        pairs.add((keys[i], keys[j]))
+        return pairs
+
+    def estimate(self, left: Hashable, right: Hashable) -> float:
+        return estimate_jaccard(self.signatures[left], self.signatures[right])
@@ -0,0 +1,180 @@
+import re
+import unicodedata
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from apps.document_parser.base_parser import preprocess_text
+from apps.similarity.vector_store import FileArrayStore
+from apps.similarity.winnowing import kgram_hashes
+
+# 特征提取逻辑版本，变更时递增使已保存的指纹失效
+SIMHASH_FEATURE_VERSION = "2"
+# SimHash 指纹位数
+SIMHASH_BITS = 64
+# 计算指纹时每批处理的特征数，控制 (特征数 × 64) 临时矩阵的内存
+_FEATURE_BLOCK = 1 << 16
+# 查询时每批处理的查询数
+_QUERY_BLOCK = 4096
+# 单字节的 1 比特数，uint64 按字节查表求汉明重量
+_POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+_BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+# preprocess_text 结果中的词：连续汉字，或连续字母数字
+_token_pattern = re.compile(r'[\u4e00-\u9fa5]+|[a-z0-9]+')
+
+
+def token_hashes(text: str, k: int = 2) -> np.ndarray:
+    """
+    文本的特征哈希：NFKC 归一化（全角转半角）后经 preprocess_text 去除符号，按空格及汉字、字母数字的边界切分为词；
+    中文没有空格分词，汉字词取词内连续 k 个字（默认二元组）作为特征，字母数字词整体作为一个特征，特征不跨越标点
+    :return: 特征哈希（uint64，可重复，重复即权重），没有特征时为空数组
+    """
+    features = []
+    for token in _token_pattern.findall(preprocess_text(unicodedata.normalize("NFKC", text)).lower()):
+        codes = np.frombuffer(token.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        features.append(kgram_hashes(codes, min(k, len(codes)) if token[0] >= "\u4e00" else len(codes)))
+    return np.concatenate(features) if features else np.empty(0, dtype=np.uint64)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    """uint64 数组逐元素的 1 比特数"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+def simhash_fingerprints(hash_sets: List[np.ndarray]) -> np.ndarray:
+    """
+    批量计算 SimHash 指纹：全部特征哈希拼接后展开为 (特征数 × 64) 的 ±1 矩阵，
+    按集合边界分段求和，每一位的和大于0时指纹该位为1
+    :param hash_sets: 各切片的特征哈希
+    :return: 指纹（uint64，与切片一一对应），没有特征的切片指纹为0
+    """
+    fingerprints = np.zeros(len(hash_sets), dtype=np.uint64)
+    sizes = np.array([len(hashes) for hashes in hash_sets], dtype=np.int64)
+    weights = (np.uint64(1) << _BIT_SHIFTS)
+    start = 0
+    while start < len(hash_sets):
+        end = start + 1
+        total = sizes[start]
+        while end < len(hash_sets) and total + sizes[end] <= _FEATURE_BLOCK:
+            total += sizes[end]
+            end += 1
+        members = [index for index in range(start, end) if sizes[index]]
+        if members:
+            block = np.concatenate([hash_sets[index] for index in members])
+            bits = ((block[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int32) * 2 - 1
+            boundaries = np.concatenate(([0], np.cumsum(sizes[members])[:-1]))
+            positive = np.add.reduceat(bits, boundaries, axis=0) > 0
+            fingerprints[members] = (positive.astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+        start = end
+    return fingerprints
+
+
+class MultiIndexHashTable:
+    """
+    多索引哈希（multi-index hashing）：64位指纹按位均分为 max_distance+1 段，
+    汉明距离不超过 max_distance 的两个指纹至少有一段完全相同（抽屉原理）。
+    每段的取值升序保存为数组，查询时每段二分查找得到精确相同的候选，再计算完整汉明距离过滤，不做全量扫描
+    """
+
+    def __init__(self, fingerprints: np.ndarray, max_distance: int = 3,
+                 sorted_blocks: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        """
+        :param sorted_blocks: 已保存的各段 (升序取值, 行号)（见 sorted_blocks 属性），为None时重新排序建立
+        """
+        self.fingerprints = np.ascontiguousarray(fingerprints, dtype=np.uint64)
+        self.max_distance = max_distance
+        block_count = max_distance + 1
+        widths = [SIMHASH_BITS // block_count + (1 if index < SIMHASH_BITS % block_count else 0)
+                  for index in range(block_count)]
+        shifts = np.cumsum([0] + widths[:-1])
+        # 每段 (右移位数, 掩码, 升序取值, 取值对应的行号)
+        self.blocks: List[Tuple[np.uint64, np.uint64, np.ndarray, np.ndarray]] = []
+        for index, (shift, width) in enumerate(zip(shifts.tolist(), widths)):
+            shift, mask = np.uint64(shift), np.uint64((1 << width) - 1)
+            if sorted_blocks is not None:
+                self.blocks.append((shift, mask, sorted_blocks[0][index], sorted_blocks[1][index]))
+                continue
+            values = (self.fingerprints >> shift) & mask
+            order = np.argsort(values, kind="stable")
+            self.blocks.append((shift, mask, values[order], order))
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    @property
+    def sorted_blocks(self) -> Tuple[np.ndarray, np.ndarray]:
+        """各段的升序取值与行号，(段数 × 指纹数) 的两个数组，用于保存后直接恢复，不再排序"""
+        return (np.stack([values for _, _, values, _ in self.blocks]).reshape(len(self.blocks), -1),
+                np.stack([order for _, _, _, order in self.blocks]).reshape(len(self.blocks), -1))
+
+    def search(self, queries: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        查找与每个查询指纹汉明距离不超过 max_distance 的全部指纹
+        :param queries: 查询指纹（uint64）
+        :return: (查询序号, 行号, 汉明距离)，按查询序号、行号排列
+        """
+        queries = np.asarray(queries, dtype=np.uint64)
+        query_rows, rows, distances = [], [], []
+        row_count = np.int64(max(len(self.fingerprints), 1))
+        for start in range(0, len(queries), _QUERY_BLOCK):
+            block_queries = queries[start:start + _QUERY_BLOCK]
+            pair_keys = []
+            for shift, mask, values, order in self.blocks:
+                query_values = (block_queries >> shift) & mask
+                lows = np.searchsorted(values, query_values, side="left")
+                counts = np.searchsorted(values, query_values, side="right") - lows
+                owners = np.repeat(np.arange(len(block_queries)), counts)
+                within = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+                pair_keys.append(owners.astype(np.int64) * row_count + order[lows[owners] + within])
+            # 多段同时命中的候选只保留一次
+            keys = np.unique(np.concatenate(pair_keys))
+            owners, candidates = keys // row_count, keys % row_count
+            candidate_distances = popcount(block_queries[owners] ^ self.fingerprints[candidates])
+            keep = candidate_distances <= self.max_distance
+            query_rows.append(owners[keep] + start)
+            rows.append(candidates[keep])
+            distances.append(candidate_distances[keep])
+        if not query_rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(query_rows), np.concatenate(rows), np.concatenate(distances)
+
+
+class SimHashStore(FileArrayStore):
+    """
+    SimHash 指纹存储：每个文件参与比对的切片指纹、切片索引 (页码, 页内起始位置, 结束位置)、
+    多索引哈希表各段的排序结果与模板过滤统计保存为 .npy，比对时内存映射读取，不再解析文件、计算指纹或排序建表
+    """
+
+    def __init__(self, store_dir: str):
+        super().__init__(store_dir, "simhash")
+
+    def put(self, file_id, key: Optional[str], fingerprints: np.ndarray, index: Sequence[Tuple[int, int, int]],
+            max_distance: int, counts: Tuple[int, int] = (0, 0)):
+        """
+        写入文件的指纹与索引表，同一文件其他参数下的数据一并删除
+        :param counts: 模板过滤的 (切片总数, 过滤数)
+        """
+        self.remove(file_id)
+        key = key or ""
+        table = MultiIndexHashTable(fingerprints, max_distance)
+        values, orders = table.sorted_blocks
+        self._save(file_id, key, "fingerprints", table.fingerprints)
+        self._save(file_id, key, "values", values)
+        self._save(file_id, key, "orders", orders)
+        self._save(file_id, key, "counts", np.array(counts, dtype=np.int64))
+        self._save(file_id, key, "index", np.array(index, dtype=np.int64).reshape(-1, 3))
+
+    def get(self, file_id, key: Optional[str], max_distance: int) -> Tuple[MultiIndexHashTable, np.ndarray]:
+        """
+        内存映射读取文件的指纹索引表
+        :return: (多索引哈希表, 切片索引 (页码, 页内起始位置, 结束位置))
+        """
+        table = MultiIndexHashTable(self._load(file_id, key, "fingerprints"), max_distance,
+                                    (self._load(file_id, key, "values"), self._load(file_id, key, "orders")))
+        return table, self._load(file_id, key, "index")
+
+    def counts(self, file_id, key: Optional[str]) -> Tuple[int, int]:
+        """模板过滤的 (切片总数, 过滤数)"""
+        total, suppressed = self._load(file_id, key, "counts").tolist()
+        return total, suppressed
@@ -0,0 +1,166 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from apps.similarity.base import MatchSpan
+from apps.similarity.winnowing import normalize_codes
+
+
+def suffix_array(codes: np.ndarray) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    倍增法构造后缀数组，每轮按 (前 k 个字符的排名, 后 k 个字符的排名) 重新排序，
+    排序在上一轮的后缀顺序上做稳定排序，数据基本有序时接近线性；所有排名互不相同时结束
+
+    :param codes: 整数数组（字符码点）
+    :return: (后缀数组, 各轮排名)，第 t 轮排名相等当且仅当两个后缀的前 2^t 个字符相同
+    """
+    n = len(codes)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), []
+    _, rank = np.unique(codes, return_inverse=True)
+    rank = rank.astype(np.int32).ravel()
+    order = np.argsort(rank, kind="stable")
+    ranks = [rank]
+    k = 1
+    while int(rank[order[-1]]) < n - 1:
+        second = np.zeros(n, dtype=np.int64)
+        second[:n - k] = rank[k:].astype(np.int64) + 1
+        keys = rank.astype(np.int64) * (n + 1) + second
+        sorted_keys = keys[order]
+        resort = np.argsort(sorted_keys, kind="stable")
+        order = order[resort]
+        sorted_keys = sorted_keys[resort]
+        sorted_rank = np.concatenate(([0], np.cumsum(sorted_keys[1:] != sorted_keys[:-1]))).astype(np.int32)
+        rank = np.empty(n, dtype=np.int32)
+        rank[order] = sorted_rank
+        ranks.append(rank)
+        k *= 2
+    return order, ranks
+
+
+def adjacent_lcp(order: np.ndarray, ranks: List[np.ndarray], left: np.ndarray = None,
+                 right: np.ndarray = None) -> np.ndarray:
+    """
+    后缀数组中相邻后缀（或指定的后缀对）的最长公共前缀长度
+    按各轮排名从长到短二分逼近：前 2^t 个字符相同（排名相等）时长度增加 2^t，全部为向量运算
+
+    :param order: 后缀数组
+    :param ranks: 各轮排名
+    :param left: 后缀对的左侧起始位置，默认为 order[:-1]
+    :param right: 后缀对的右侧起始位置，默认为 order[1:]
+    :return: 各后缀对的公共前缀长度
+    """
+    left = order[:-1] if left is None else left
+    right = order[1:] if right is None else right
+    n = len(order)
+    lcp = np.zeros(len(left), dtype=np.int64)
+    for t in range(len(ranks) - 1, -1, -1):
+        step = 1 << t
+        a = left + lcp
+        b = right + lcp
+        valid = (a + step <= n) & (b + step <= n)
+        rank = ranks[t]
+        equal = np.zeros(len(left), dtype=bool)
+        equal[valid] = rank[a[valid]] == rank[b[valid]]
+        lcp[equal] += step
+    return lcp
+
+
+def _run_pairs(in_left: np.ndarray, lcp: np.ndarray, min_length: int,
+               max_repeat: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    后缀数组中相邻 LCP 连续不小于 min_length 的每一段后缀（共享同一个长度为 min_length 的前缀），
+    列出段内全部 (左序列后缀, 右序列后缀) 组合，不只是上下最近的另一序列后缀，
+    同一片段在一侧出现多次时每一处都能配对；组合由 repeat 展开，不逐段循环。
+    前缀在任一序列中出现超过 max_repeat 次（如报价表中反复出现的 0.00、套话）的段忽略，组合数不超过 max_repeat² × 段数
+
+    :param in_left: 后缀数组中各后缀是否属于左序列
+    :param lcp: 相邻后缀的公共前缀长度
+    :param max_repeat: 段内单个序列的最大后缀数
+    :return: (左序列后缀在后缀数组中的下标, 右序列后缀在后缀数组中的下标)
+    """
+    linked = lcp >= min_length
+    # 后缀 i 与上一个后缀相连（linked[i-1]）或与下一个后缀相连（linked[i]）即属于某一段
+    linked_above = np.concatenate(([False], linked))
+    members = np.flatnonzero(linked_above | np.concatenate((linked, [False])))
+    run_ids = np.cumsum(~linked_above[members]) - 1
+    member_left = in_left[members]
+    lefts, left_runs = members[member_left], run_ids[member_left]
+    rights, right_runs = members[~member_left], run_ids[~member_left]
+    run_count = int(run_ids[-1]) + 1 if len(run_ids) else 0
+    left_counts = np.bincount(left_runs, minlength=run_count)
+    right_counts = np.bincount(right_runs, minlength=run_count)
+    right_offsets = np.cumsum(right_counts) - right_counts
+    # 先按段大小过滤再展开，重复文本不会产生平方级的组合
+    valid = (left_counts <= max_repeat) & (right_counts <= max_repeat)
+    repeats = np.where(valid[left_runs], right_counts[left_runs], 0)
+    total = int(repeats.sum())
+    within = np.arange(total) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    return np.repeat(lefts, repeats), rights[np.repeat(right_offsets[left_runs], repeats) + within]
+
+
+def common_substrings(left_codes: np.ndarray, right_codes: np.ndarray, min_length: int,
+                      max_repeat: int = 4) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    两个序列之间长度不小于 min_length 的极大公共子串
+    两个序列以唯一分隔符拼接后构造后缀数组与 LCP，相邻 LCP 不小于 min_length 的每一段内的左、右后缀两两配对，
+    同一片段在任一侧重复出现（不超过 max_repeat 次）时每一处都会报告；同一对角线（右位置 - 左位置）上被此前片段包含的匹配去除
+
+    :param max_repeat: 起始 min_length 个字符在单个序列中的最大出现次数，出现更多次的重复文本不作为匹配起点
+
+    :return: (左序列起始位置, 右序列起始位置, 长度)，按左序列位置排序
+    """
+    left_length = len(left_codes)
+    empty = np.empty(0, dtype=np.int64)
+    if left_length < min_length or len(right_codes) < min_length:
+        return empty, empty, empty
+    # 分隔符与结尾符大于所有字符且互不相同，公共前缀不会跨越分隔符
+    top = int(max(left_codes.max(), right_codes.max()))
+    codes = np.concatenate((left_codes.astype(np.int64), [top + 1], right_codes.astype(np.int64), [top + 2]))
+    order, ranks = suffix_array(codes)
+    lcp = adjacent_lcp(order, ranks)
+    left_members, right_members = _run_pairs(order < left_length, lcp, min_length, max_repeat)
+    if len(left_members) == 0:
+        return empty, empty, empty
+    left_starts, right_starts = order[left_members], order[right_members]
+    # 段内任意两个后缀的公共前缀不小于 min_length，逐对计算实际长度
+    lengths = adjacent_lcp(order, ranks, left_starts, right_starts)
+    right_starts = right_starts - left_length - 1
+    # 同一对角线按左位置排序，结束位置不超过此前最大结束位置的匹配被包含，去除
+    diagonals = right_starts - left_starts
+    sort_order = np.lexsort((-lengths, left_starts, diagonals))
+    left_starts, right_starts, lengths, diagonals = (
+        left_starts[sort_order], right_starts[sort_order], lengths[sort_order], diagonals[sort_order])
+    ends = left_starts + lengths
+    _, diagonal_index = np.unique(diagonals, return_inverse=True)
+    scale = np.int64(len(codes) + 1)
+    keys = diagonal_index.astype(np.int64).ravel() * scale + ends
+    previous_max = np.concatenate(([-1], np.maximum.accumulate(keys)[:-1]))
+    keep = previous_max < keys
+    left_starts, right_starts, lengths = left_starts[keep], right_starts[keep], lengths[keep]
+    sort_order = np.lexsort((right_starts, left_starts))
+    return left_starts[sort_order], right_starts[sort_order], lengths[sort_order]
+
+
+def find_common_spans(left_text: str, right_text: str, min_length: int = 30, max_repeat: int = 4) -> List[MatchSpan]:
+    """
+    两份文本之间的全部极大公共片段（原文完全复制的段落），归一化规则与 winnowing 指纹一致，
+    空白、标点差异不影响匹配，片段位置换算回原文偏移量
+
+    :param left_text: 左文件全文
+    :param right_text: 右文件全文
+    :param min_length: 片段最小长度（归一化后的字符数）
+    :param max_repeat: 片段起始 min_length 个字符在单个文件中的最大出现次数
+    :return: 公共片段，按左文件位置排序
+    """
+    left_codes, left_offsets = normalize_codes(left_text)
+    right_codes, right_offsets = normalize_codes(right_text)
+    left_starts, right_starts, lengths = common_substrings(left_codes, right_codes, min_length, max_repeat)
+    return [
+        MatchSpan(
+            int(left_offsets[left_start]), int(left_offsets[left_start + length - 1]) + 1,
+            int(right_offsets[right_start]), int(right_offsets[right_start + length - 1]) + 1,
+            1.0
+        )
+        for left_start, right_start, length in zip(left_starts.tolist(), right_starts.tolist(), lengths.tolist())
+    ]
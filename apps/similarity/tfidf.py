@@ -0,0 +1,116 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import jieba
+import numpy as np
+from scipy import sparse
+
+from apps.document_parser.base_parser import STOP_WORDS
+
+# 只保留中文、英文、数字，其余字符作为分隔
+_token_pattern = re.compile(r'[^一-龥a-zA-Z0-9]+')
+# 稀疏相似度矩阵每块的左矩阵行数
+DEFAULT_BLOCK_ROWS = 2048
+
+
+def tokenize(text: str, stop_words: frozenset = frozenset(STOP_WORDS)) -> List[str]:
+    """
+    jieba 分词，去除标点、空白与停用词，英文统一小写
+    分词前做 NFKC 归一化，PDF 文本中常见的康熙部首、兼容汉字（如“⽬”）统一为标准汉字，全角字母数字转半角
+    """
+    tokens = []
+    for segment in _token_pattern.split(unicodedata.normalize("NFKC", text)):
+        if segment:
+            tokens.extend(token.lower() for token in jieba.lcut(segment) if token not in stop_words)
+    return tokens
+
+
+class TfidfModel:
+    """
+    TF-IDF 模型，词表与文档频率在给定的全部切片（任务或语料）上统计，
+    词频取对数（1+log tf），逆文档频率平滑 log((1+N)/(1+df))+1，行向量 L2 归一化后点积即余弦相似度
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self.idf: np.ndarray = None
+
+    def fit_transform(self, documents: Iterable[Sequence[str]]) -> sparse.csr_matrix:
+        """
+        统计词表与文档频率，返回切片的 TF-IDF 矩阵（CSR，每行一个切片）
+        :param documents: 分词后的切片
+        """
+        indptr = [0]
+        indices = []
+        for tokens in documents:
+            for token in tokens:
+                indices.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+            indptr.append(len(indices))
+        counts = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(self.vocabulary))
+        )
+        # 合并同一切片中的重复词
+        counts.sum_duplicates()
+        document_count = counts.shape[0]
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf = (np.log((1.0 + document_count) / (1.0 + document_frequency)) + 1.0).astype(np.float32)
+        counts.data = (1.0 + np.log(counts.data)) * self.idf[counts.indices]
+        return normalize_sparse_rows(counts)
+
+
+def normalize_sparse_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    """稀疏矩阵按行 L2 归一化"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(matrix.data.dtype)
+    return matrix
+
+
+def sparse_topk(left: sparse.csr_matrix, right: sparse.csr_matrix, top_k: int, threshold: float,
+                block_rows: int = DEFAULT_BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    左矩阵每一行在右矩阵中相似度最高的 top_k 行（且不低于阈值）
+    左矩阵按行分块做稀疏矩阵乘法，只有共享词的切片对才产生非零值；每块先按阈值剪枝，
+    再按 (行, 相似度降序) 排序取每行前 top_k 个
+
+    :return: (左行号, 右行号, 相似度)，按左行号、相似度降序排列
+    """
+    left_rows, right_rows, scores = [], [], []
+    right_t = right.T.tocsc()
+    for start in range(0, left.shape[0], block_rows):
+        product = (left[start:start + block_rows] @ right_t).tocoo()
+        keep = product.data >= threshold
+        rows, columns, data = product.row[keep], product.col[keep], product.data[keep]
+        if not len(data):
+            continue
+        order = np.lexsort((-data, rows))
+        rows, columns, data = rows[order], columns[order], data[order]
+        # 行内名次 = 位置 - 该行第一个元素的位置
+        row_first = np.concatenate(([0], np.flatnonzero(rows[1:] != rows[:-1]) + 1))
+        ranks = np.arange(len(rows)) - np.repeat(row_first, np.diff(np.concatenate((row_first, [len(rows)]))))
+        top = ranks < top_k
+        left_rows.append(rows[top].astype(np.int64) + start)
+        right_rows.append(columns[top].astype(np.int64))
+        scores.append(data[top])
+    if not left_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(left_rows), np.concatenate(right_rows), np.concatenate(scores)
+
+
+def cross_file_sparse_topk(matrix: sparse.csr_matrix, file_offsets: Sequence[int], top_k: int, threshold: float,
+                           block_rows: int = DEFAULT_BLOCK_ROWS) -> Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    任务内全部文件两两之间的切片相似度，矩阵按文件顺序拼接，每个文件对只计算一个方向
+    :return: {(左文件序号, 右文件序号): (左行号, 右行号, 相似度)}，行号为矩阵中的全局行号
+    """
+    results = {}
+    file_count = len(file_offsets) - 1
+    for i in range(file_count):
+        left = matrix[file_offsets[i]:file_offsets[i + 1]]
+        for j in range(i + 1, file_count):
+            right = matrix[file_offsets[j]:file_offsets[j + 1]]
+            left_rows, right_rows, scores = sparse_topk(left, right, top_k, threshold, block_rows)
+            results[(i, j)] = (left_rows + file_offsets[i], right_rows + file_offsets[j], scores)
+    return results
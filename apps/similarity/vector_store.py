@@ -0,0 +1,98 @@
+import glob
+import hashlib
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from apps.similarity.dense import QuantizedVectors, normalize_rows, quantize_int8
+
+# 存储精度：float16 半精度，int8 按向量缩放量化（另存每个向量的缩放系数）
+STORE_FLOAT16 = "float16"
+STORE_INT8 = "int8"
+
+
+class FileArrayStore:
+    """
+    按文件保存若干 .npy 数组的本地存储，读取时内存映射，不复制到内存。
+    存储按 (文件id, 入库参数标识) 区分，标识包含文件内容哈希、解析器版本、切片参数与模板过滤，参数变化后不会读到过期数据，
+    同一文件只保留最新一份；切片索引 (页码, 页内起始位置, 结束位置) 最后写入，存在即表示其他数组已完整写入
+    """
+
+    def __init__(self, store_dir: str, name: str):
+        """
+        :param name: 存储内容名称，同一目录下不同内容的文件互不影响
+        """
+        self.store_dir = store_dir
+        self.name = name
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, file_id, key: str, part: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.store_dir, f"{int(file_id)}_{digest}_{self.name}.{part}.npy")
+
+    def contains(self, file_id, key: Optional[str]) -> bool:
+        """
+        :param key: 入库参数标识，为None（文件未记录内容哈希）时不复用
+        """
+        return key is not None and os.path.exists(self._path(file_id, key, "index"))
+
+    def _save(self, file_id, key: str, part: str, array: np.ndarray):
+        path = self._path(file_id, key, part)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    def _load(self, file_id, key: Optional[str], part: str) -> np.ndarray:
+        return np.load(self._path(file_id, key or "", part), mmap_mode="r")
+
+    def remove(self, file_id):
+        """删除文件的全部数组（所有参数）"""
+        for path in glob.glob(os.path.join(self.store_dir, f"{int(file_id)}_*_{self.name}.*.npy")):
+            os.remove(path)
+
+
+class CompactVectorStore(FileArrayStore):
+    """
+    本地紧凑向量存储：每个文件的切片向量归一化后以 float16 或 int8 量化的连续数组保存为 .npy，
+    切片索引 (页码, 页内起始位置, 结束位置) 保存为 int64 数组，比对时内存映射读取，不查询Milvus。
+    1024维向量 float16 每条2KB、int8 每条约1KB，分别为 float32 的1/2、1/4
+    """
+
+    def __init__(self, store_dir: str, dtype: str = STORE_INT8):
+        if dtype not in (STORE_FLOAT16, STORE_INT8):
+            raise ValueError(f"不支持的向量存储精度：{dtype}")
+        super().__init__(store_dir, dtype)
+        self.dtype = dtype
+
+    def put(self, file_id, key: Optional[str], rows: List[dict]):
+        """
+        写入文件的切片向量，同一文件其他参数下的向量一并删除
+        :param key: 入库参数标识
+        :param rows: Milvus读取的切片（page, start_index, text_content, vector）
+        """
+        self.remove(file_id)
+        key = key or ""
+        vectors = normalize_rows([row["vector"] for row in rows]) if rows else np.empty((0, 0), dtype=np.float32)
+        index = np.array(
+            [(row["page"], row["start_index"], row["start_index"] + len(row["text_content"])) for row in rows],
+            dtype=np.int64
+        ).reshape(-1, 3)
+        if self.dtype == STORE_INT8:
+            quantized = quantize_int8(vectors)
+            self._save(file_id, key, "vectors", quantized.codes)
+            self._save(file_id, key, "scales", quantized.scales)
+        else:
+            self._save(file_id, key, "vectors", vectors.astype(np.float16))
+        self._save(file_id, key, "index", index)
+
+    def get(self, file_id, key: Optional[str]) -> Tuple[object, np.ndarray]:
+        """
+        内存映射读取文件的切片向量
+        :return: (向量：float16 数组或 int8 量化向量, 切片索引 (页码, 页内起始位置, 结束位置))
+        """
+        vectors = self._load(file_id, key, "vectors")
+        if self.dtype == STORE_INT8:
+            vectors = QuantizedVectors(vectors, self._load(file_id, key, "scales"))
+        return vectors, self._load(file_id, key, "index")
@@ -0,0 +1,192 @@
+from typing import List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from apps.similarity.base import MatchSpan
+
+# 指纹算法版本，归一化规则、哈希函数变化时递增
+WINNOWING_VERSION = "1"
+
+# 多项式滚动哈希的基数，乘法按 uint64 自然溢出（即对 2^64 取模）
+_HASH_BASE = np.uint64(1000003)
+# 哈希结果的比特混合常数（splitmix64 终结函数），使低位分布均匀
+_MIX_1 = np.uint64(0xbf58476d1ce4e5b9)
+_MIX_2 = np.uint64(0x94d049bb133111eb)
+
+
+def normalize_codes(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    文本归一化为码点数组：只保留汉字、字母、数字，全角字母数字转半角，大写转小写，
+    空白、标点、符号全部去除，使排版、标点上的改动不影响指纹
+
+    :param text: 原始文本
+    :return: (归一化后的码点数组 uint64, 每个码点在原文中的位置 int64)
+    """
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    # 全角字母数字（０-９、Ａ-Ｚ、ａ-ｚ）转半角
+    fullwidth = ((codes >= 0xFF10) & (codes <= 0xFF19)) | ((codes >= 0xFF21) & (codes <= 0xFF3A)) \
+        | ((codes >= 0xFF41) & (codes <= 0xFF5A))
+    codes = np.where(fullwidth, codes - 0xFEE0, codes)
+    upper = (codes >= 0x41) & (codes <= 0x5A)
+    codes = np.where(upper, codes + 0x20, codes)
+    keep = ((codes >= 0x30) & (codes <= 0x39)) | ((codes >= 0x61) & (codes <= 0x7A)) \
+        | ((codes >= 0x4E00) & (codes <= 0x9FFF)) | ((codes >= 0x3400) & (codes <= 0x4DBF))
+    offsets = np.flatnonzero(keep)
+    return codes[offsets].astype(np.uint64), offsets
+
+
+def kgram_hashes(codes: np.ndarray, k: int) -> np.ndarray:
+    """
+    计算所有长度为 k 的连续片段（k-gram）的哈希
+    多项式滚动哈希按片段内位置展开，每一步对整个数组做一次乘加，共 k 次向量运算
+
+    :param codes: 归一化后的码点数组
+    :param k: 片段长度
+    :return: 第 i 个元素为 codes[i:i+k] 的哈希，长度 len(codes)-k+1
+    """
+    count = len(codes) - k + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(k):
+            hashes = hashes * _HASH_BASE + codes[j:j + count]
+        hashes ^= hashes >> np.uint64(30)
+        hashes *= _MIX_1
+        hashes ^= hashes >> np.uint64(27)
+        hashes *= _MIX_2
+        hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+def winnow(hashes: np.ndarray, window: int) -> np.ndarray:
+    """
+    winnowing 选取指纹：每个长度为 window 的窗口选取最小哈希（相同时取最右侧），相邻窗口选中同一位置时只保留一次。
+    任意长度不小于 window+k-1 的相同片段至少共享一个指纹
+
+    :param hashes: k-gram 哈希数组
+    :param window: 窗口大小
+    :return: 选中的 k-gram 位置（升序）
+    """
+    if len(hashes) == 0:
+        return np.empty(0, dtype=np.int64)
+    if len(hashes) <= window:
+        return np.array([len(hashes) - 1 - int(np.argmin(hashes[::-1]))], dtype=np.int64)
+    windows = sliding_window_view(hashes, window)
+    positions = np.arange(len(windows)) + (window - 1 - np.argmin(windows[:, ::-1], axis=1))
+    return positions[np.concatenate(([True], positions[1:] != positions[:-1]))]
+
+
+class WinnowingFingerprint:
+    """
+    文件指纹，哈希按升序保存为 uint64 数组，位置与哈希一一对应，两个文件的公共指纹由有序数组求交得到
+    """
+    __slots__ = ("hashes", "positions", "offsets", "k", "window")
+
+    def __init__(self, hashes: np.ndarray, positions: np.ndarray, offsets: np.ndarray, k: int, window: int):
+        self.hashes = hashes  # 指纹哈希（升序，uint64）
+        self.positions = positions  # 指纹在归一化文本中的位置（与 hashes 对应，uint32）
+        self.offsets = offsets  # 归一化文本中每个字符在原文中的位置（uint32）
+        self.k = k
+        self.window = window
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def select(self, keep: np.ndarray) -> "WinnowingFingerprint":
+        """按掩码保留部分指纹（如去除招标文件中出现的指纹）"""
+        return WinnowingFingerprint(self.hashes[keep], self.positions[keep], self.offsets, self.k, self.window)
+
+    @classmethod
+    def build(cls, text: str, k: int = 13, window: int = 8) -> "WinnowingFingerprint":
+        """
+        计算文本指纹
+        :param text: 原文
+        :param k: k-gram 长度（归一化后的字符数）
+        :param window: winnowing 窗口大小，相同片段长度达到 k+window-1 时保证能被检出
+        """
+        codes, offsets = normalize_codes(text)
+        hashes = kgram_hashes(codes, k)
+        positions = winnow(hashes, window)
+        selected = hashes[positions]
+        order = np.argsort(selected, kind="stable")
+        return cls(selected[order], positions[order].astype(np.uint32), offsets.astype(np.uint32), k, window)
+
+
+def _common_pairs(left: WinnowingFingerprint, right: WinnowingFingerprint, max_repeat: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    公共指纹在两个文件中的位置对，同一哈希在任一文件中出现超过 max_repeat 次（如反复出现的表头、套话）时忽略
+    :return: (左文件位置数组, 右文件位置数组)
+    """
+    common = np.intersect1d(left.hashes, right.hashes, assume_unique=False)
+    if not common.size:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    left_starts = np.searchsorted(left.hashes, common, side="left")
+    left_counts = np.searchsorted(left.hashes, common, side="right") - left_starts
+    right_starts = np.searchsorted(right.hashes, common, side="left")
+    right_counts = np.searchsorted(right.hashes, common, side="right") - right_starts
+    keep = (left_counts <= max_repeat) & (right_counts <= max_repeat)
+    left_starts, left_counts = left_starts[keep], left_counts[keep]
+    right_starts, right_counts = right_starts[keep], right_counts[keep]
+    # 同一哈希在两侧的出现位置两两组合
+    pair_counts = left_counts * right_counts
+    total = int(pair_counts.sum())
+    owners = np.repeat(np.arange(len(pair_counts)), pair_counts)
+    within = np.arange(total) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+    left_index = left_starts[owners] + within // right_counts[owners]
+    right_index = right_starts[owners] + within % right_counts[owners]
+    return left.positions[left_index].astype(np.int64), right.positions[right_index].astype(np.int64)
+
+
+def match_spans(left: WinnowingFingerprint, right: WinnowingFingerprint, min_length: int = 30,
+                max_gap: int = None, max_repeat: int = 4) -> List[MatchSpan]:
+    """
+    两个文件之间的相似片段
+    公共指纹按 (对角线 = 右位置 - 左位置, 左位置) 排序，同一对角线上间隔不超过 max_gap 的指纹合并为片段，
+    再将前后相接、仅因少量增删字符错开对角线的片段合并，得到近似复制的完整片段
+
+    :param left: 左文件指纹
+    :param right: 右文件指纹
+    :param min_length: 片段最小长度（归一化后的字符数），更短的片段不计入结果
+    :param max_gap: 同一片段内相邻指纹的最大间隔，默认为 k+window
+    :param max_repeat: 指纹在单个文件中的最大出现次数
+    :return: 相似片段，位置为原文偏移量，按左文件位置排序
+    """
+    k = left.k
+    max_gap = max_gap if max_gap is not None else left.k + left.window
+    left_positions, right_positions = _common_pairs(left, right, max_repeat)
+    if not left_positions.size:
+        return []
+    diagonals = right_positions - left_positions
+    order = np.lexsort((left_positions, diagonals))
+    left_positions, right_positions, diagonals = left_positions[order], right_positions[order], diagonals[order]
+    breaks = np.flatnonzero((diagonals[1:] != diagonals[:-1]) | (left_positions[1:] - left_positions[:-1] > max_gap)) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(left_positions)]))
+    runs = sorted(
+        (int(left_positions[s]), int(left_positions[e - 1]) + k, int(right_positions[s]), int(right_positions[e - 1]) + k, e - s)
+        for s, e in zip(starts, ends)
+    )
+    # 前后相接的片段合并（左右两侧都向后延伸）
+    merged = []
+    for run in runs:
+        if merged:
+            last = merged[-1]
+            if run[0] <= last[1] + max_gap and last[2] <= run[2] <= last[3] + max_gap:
+                merged[-1] = (last[0], max(last[1], run[1]), last[2], max(last[3], run[3]), last[4] + run[4])
+                continue
+        merged.append(run)
+    # 左文件指纹位置升序，用于统计片段范围内的指纹总数
+    left_sorted = np.sort(left.positions)
+    spans = []
+    for left_start, left_end, right_start, right_end, matched in merged:
+        if left_end - left_start < min_length:
+            continue
+        expected = int(np.searchsorted(left_sorted, left_end - k, side="right") - np.searchsorted(left_sorted, left_start))
+        spans.append(MatchSpan(
+            int(left.offsets[left_start]), int(left.offsets[left_end - 1]) + 1,
+            int(right.offsets[right_start]), int(right.offsets[right_end - 1]) + 1,
+            min(1.0, matched / expected) if expected else 1.0
+        ))
+    return spans
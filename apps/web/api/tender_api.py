@@ -1,8 +1,9 @@
 from typing import List
 
-from fastapi import APIRouter, BackgroundTasks
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 
-from apps.service.tender_service import bid_plagiarism_check, service_tender_check_list
+from apps.service.tender_service import bid_plagiarism_check, service_tender_check_list, sub_task_spans, \
+    service_tender_check_files
 from apps.web.dto.tender_task import TenderTaskDto
 from apps.web.vo.similarity_respose import BaseResponse
 
@@ -13,7 +14,11 @@ async def tender_check(tender_task_dto: TenderTaskDto, background_tasks: Backgro
     """
     标书检测
     """
-    await bid_plagiarism_check(tender_task_dto, background_tasks)
+    try:
+        await bid_plagiarism_check(tender_task_dto, background_tasks)
+    except ValueError as e:
+        # 请求参数不合法（如比对引擎不支持历史库比对）
+        raise HTTPException(status_code=400, detail=str(e))
     return BaseResponse.success()
 
 @tender_router.get("/tender_check_list", response_model=BaseResponse)
@@ -22,4 +27,21 @@ async def tender_check_list():
 
 @tender_router.get("/tender_check_list_sub/[task_id]", response_model=BaseResponse)
 async def tender_check_list_sub(task_id):
-    return BaseResponse.success(data = service_tender_check_list(task_id))
\ No newline at end of file
+    return BaseResponse.success(data = service_tender_check_list(task_id))
+
+@tender_router.get("/tender_check_files/{task_id}", response_model=BaseResponse)
+def tender_check_files(task_id: int):
+    """
+    任务文件处理情况（招标文件模板过滤比例）
+    """
+    return BaseResponse.success(data = service_tender_check_files(task_id))
+
+@tender_router.get("/sub_task_spans/{sub_task_id}", response_model=BaseResponse)
+def tender_sub_task_spans(sub_task_id: int):
+    """
+    子任务两个文件之间原文完全相同的片段
+    """
+    try:
+        return BaseResponse.success(data = sub_task_spans(sub_task_id))
+    except ValueError as e:
+        return BaseResponse.error(message = str(e))
@@ -1,9 +1,19 @@
-from typing import List
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel
 
+from apps.service.similarity_service import SIMILARITY_ENGINES
+
+# 可选的比对引擎，取自已注册的引擎，其他取值在请求校验阶段被拒绝
+EngineName = Literal[tuple(SIMILARITY_ENGINES)]
+
 
 class TenderTaskDto(BaseModel):
     task_name: str
-    task_type: int
-    file_ids: List[int]
\ No newline at end of file
+    task_type: int  # 2 为历史库比对（与此前所有任务的文件比对），其余为任务内文件两两比对
+    file_ids: List[int]
+    # 比对引擎：vector Milvus向量检索，local 本地矩阵向量比对，winnowing 文本指纹，tfidf 词汇相似，
+    # two_stage MinHash候选+向量精排，simhash 局部敏感指纹
+    engine: EngineName = "vector"
+    # 招标文件id（可选），投标文件中与招标文件相同的内容不参与比对
+    tender_file_id: Optional[int] = None
@@ -0,0 +1,75 @@
+-- 标书查重：解析缓存、任务文件、比对引擎、片段合并、表格比对、向量入库标记等改动对应的表结构变更（MySQL）
+--
+-- 启动时的 Base.metadata.create_all 只创建不存在的表，不会给已有表加列、改列，
+-- 已部署的库需要在升级代码前执行本脚本一次（新建的库由 create_all 建表，不需要执行）。
+--
+-- Milvus：tender_vector_collection 新增 ingest_key 字段（VARCHAR(255)，切片的入库参数标识），
+-- 已有集合不会自动加字段。向量可由解析缓存重新生成，升级时删除集合，服务启动时按新结构重建：
+--     from pymilvus import utility; utility.drop_collection("tender_vector_collection")
+-- 删除集合的同时需要清空 file_vector_ingest（本脚本重建该表），否则入库标记指向已不存在的向量。
+
+-- 文件内容哈希（SHA256），上传时计算，解析缓存与向量入库标识使用；历史记录为空
+ALTER TABLE file_record
+    ADD COLUMN hash VARCHAR(64) NULL;
+CREATE INDEX ix_file_record_hash ON file_record (hash);
+
+-- 文件向量入库完成标记，每个 (文件, 入库参数) 一条
+DROP TABLE IF EXISTS file_vector_ingest;
+CREATE TABLE file_vector_ingest (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    file_id INTEGER NOT NULL,
+    ingest_key VARCHAR(255) NOT NULL,
+    vector_number INTEGER NOT NULL,
+    chunk_number INTEGER NOT NULL,
+    suppressed_number INTEGER NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    create_by INTEGER,
+    status INTEGER,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_file_vector_ingest_file_key UNIQUE (file_id, ingest_key)
+);
+CREATE INDEX ix_file_vector_ingest_id ON file_vector_ingest (id);
+CREATE INDEX ix_file_vector_ingest_file_id ON file_vector_ingest (file_id);
+
+-- 查重任务：比对引擎、招标文件、两阶段比对统计
+ALTER TABLE bid_plagiarism_check_task
+    ADD COLUMN engine VARCHAR(20) NOT NULL DEFAULT 'vector',
+    ADD COLUMN tender_file_id INTEGER NULL,
+    ADD COLUMN embedded_chunk_ratio FLOAT NULL,
+    ADD COLUMN scored_pair_ratio FLOAT NULL;
+
+-- 子任务：历史库比对的右侧任务、MinHash 估计相似度（process_status 新增取值 skipped，列类型不变）
+ALTER TABLE sub_bid_plagiarism_check_task
+    ADD COLUMN right_task_id INTEGER NULL,
+    ADD COLUMN estimated_similarity FLOAT NULL;
+
+-- 任务文件：任务内每个文件只解析、向量化一次
+CREATE TABLE IF NOT EXISTS bid_check_task_file (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    bid_plagiarism_check_task_id INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    process_status VARCHAR(20),
+    error_message TEXT,
+    chunk_number INTEGER NOT NULL,
+    suppressed_number INTEGER NOT NULL,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    create_by INTEGER,
+    status INTEGER,
+    PRIMARY KEY (id),
+    INDEX ix_bid_check_task_file_id (id),
+    INDEX ix_bid_check_task_file_bid_plagiarism_check_task_id (bid_plagiarism_check_task_id)
+);
+
+-- 相似记录：片段结束位置、合并的切片命中数、表格行位置；片段文本改为可空（按起止位置从解析结果截取）
+ALTER TABLE document_similarity_record
+    ADD COLUMN left_file_page_end_index INTEGER NULL AFTER left_file_page_start_index,
+    MODIFY COLUMN left_file_page_chunk VARCHAR(255) NULL,
+    ADD COLUMN left_file_table_index INTEGER NULL AFTER left_file_page_chunk,
+    ADD COLUMN left_file_table_row INTEGER NULL AFTER left_file_table_index,
+    ADD COLUMN right_file_page_end_index INTEGER NULL AFTER right_file_page_start_index,
+    MODIFY COLUMN right_file_page_chunk VARCHAR(255) NULL,
+    ADD COLUMN right_file_table_index INTEGER NULL AFTER right_file_page_chunk,
+    ADD COLUMN right_file_table_row INTEGER NULL AFTER right_file_table_index,
+    ADD COLUMN hit_number INTEGER NOT NULL DEFAULT 1;
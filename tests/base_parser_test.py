@@ -0,0 +1,46 @@
+from apps.document_parser.base import HFiledocument
+from apps.document_parser.base_parser import split_offsets
+from apps.document_parser.pdf_parser import PdfParser
+
+
+def test_split_offsets_on_punctuation():
+    text = "投标人应当按照要求。提交投标文件，逾期送达的投标文件不予受理。"
+    offsets = list(split_offsets(text, 8, 2))
+    assert offsets[0] == (0, 10)
+    assert [text[start:end][-1] for start, end in offsets[:-1]] == ["。", "，", "。"]
+    assert offsets[-1][1] == len(text)
+
+
+def test_split_offsets_overlap_not_less_than_chunk_size():
+    # 重叠长度不小于切片大小时不回退，保证循环结束
+    offsets = list(split_offsets("a" * 30, 5, 10))
+    assert offsets[0] == (0, 5)
+    assert offsets[-1] == (25, 30)
+
+
+def test_overlapping_splitting_views():
+    top = HFiledocument(3, 0, "短页")
+    top.next = HFiledocument(3, 1, "第一段内容，\n第二段  内容。第三段内容")
+    chunks = PdfParser().overlapping_splitting(top, 6, 1)
+    assert [(chunk.file_id, chunk.page, chunk.start_index, chunk.text) for chunk in chunks] == [
+        (3, 0, 0, "短页"),
+        (3, 1, 0, "第一段内容， "),
+        (3, 1, 6, " 第二段 内容。"),
+        (3, 1, 13, "。第三段内容"),
+    ]
+
+
+def test_document_splitting_across_pages():
+    top = HFiledocument(3, 0, "第一页内容，跨页的段落")
+    top.next = HFiledocument(3, 1, "")
+    top.next.next = HFiledocument(3, 2, "在下一页继续。第三页内容")
+    parser = PdfParser()
+    chunks = parser.document_splitting(top, 12, 2)
+    assert [(chunk.page, chunk.start_index, chunk.text) for chunk in chunks] == [
+        (0, 0, "第一页内容，跨页的段落 在下一页继续。"),
+        (2, 5, "续。第三页内容"),
+    ]
+    streamed = parser.iter_document_splitting(iter(top), 12, 2)
+    assert [(chunk.page, chunk.start_index, chunk.text) for chunk in streamed] == [
+        (chunk.page, chunk.start_index, chunk.text) for chunk in chunks
+    ]
@@ -0,0 +1,50 @@
+import numpy as np
+
+from apps.similarity.dense import block_topk, cross_file_topk, normalize_rows, pair_topk
+
+
+def test_block_topk_matches_full_product():
+    rng = np.random.default_rng(0)
+    left = normalize_rows(rng.standard_normal((37, 16)))
+    right = normalize_rows(rng.standard_normal((23, 16)))
+    # 内存上限很小，强制分成多个块
+    left_rows, right_rows, scores = block_topk(left, right, 2, -1.0, memory_budget=4 * 23 * 5)
+    similarity = left @ right.T
+    expected = np.argsort(-similarity, axis=1)[:, :2]
+    assert left_rows.tolist() == np.repeat(np.arange(37), 2).tolist()
+    assert right_rows.tolist() == expected.ravel().tolist()
+    assert np.allclose(scores, np.take_along_axis(similarity, expected, axis=1).ravel())
+
+
+def test_cross_file_topk_threshold():
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((30, 64))
+    vectors[25] = vectors[4] + 0.01 * rng.standard_normal(64)
+    matrix = normalize_rows(vectors, np.float16)
+    results = cross_file_topk([matrix[0:10], matrix[10:20], matrix[20:30]], 3, 0.9)
+    assert sorted(results) == [(0, 1), (0, 2), (1, 2)]
+    left_rows, right_rows, scores = results[(0, 2)]
+    assert left_rows.tolist() == [4] and right_rows.tolist() == [5] and scores[0] > 0.99
+    assert len(results[(0, 1)][0]) == 0
+
+
+def test_pair_topk_scores_only_given_pairs():
+    rng = np.random.default_rng(2)
+    matrix = normalize_rows(rng.standard_normal((6, 8)))
+    left = np.array([0, 0, 0, 1], dtype=np.int64)
+    right = np.array([3, 4, 5, 5], dtype=np.int64)
+    left_rows, right_rows, scores = pair_topk(matrix, left, right, 2, -1.0, block_size=3)
+    similarity = matrix @ matrix.T
+    assert left_rows.tolist() == [0, 0, 1]
+    assert set(right_rows[:2].tolist()) == set(right[:3][np.argsort(-similarity[0, 3:])[:2]].tolist())
+    assert np.allclose(scores, similarity[left_rows, right_rows], atol=1e-6)
+
+
+def test_pair_topk_ranks_per_right_file():
+    matrix = normalize_rows(np.eye(4) + 0.1)
+    left_rows = np.array([0, 0, 0])
+    right_rows = np.array([1, 2, 3])
+    # 不分组时左行只保留1对，按右文件分组时每个右文件各保留1对
+    assert len(pair_topk(matrix, left_rows, right_rows, 1, 0.0)[0]) == 1
+    _, rights, _ = pair_topk(matrix, left_rows, right_rows, 1, 0.0, row_groups=np.array([0, 1, 1, 2]))
+    assert sorted(rights.tolist()) in ([1, 3], [2, 3])
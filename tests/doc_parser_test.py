@@ -0,0 +1,51 @@
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from apps.document_parser.doc_parser import DocxParser
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def build_docx(body: str) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as docx:
+        docx.writestr("word/document.xml", f'<?xml version="1.0"?><w:document xmlns:w="{W_NS}"><w:body>{body}<w:sectPr/></w:body></w:document>')
+    return buffer.getvalue()
+
+
+def paragraph(*runs: str) -> str:
+    return "<w:p>" + "".join(runs) + "</w:p>"
+
+
+def run(text: str) -> str:
+    return f"<w:r><w:t>{text}</w:t></w:r>"
+
+
+def test_split_pages_on_breaks():
+    body = (
+        paragraph(run("第一页"), "<w:r><w:tab/></w:r>", run("正文"))
+        + paragraph(run("分页前"), '<w:r><w:br w:type="page"/></w:r>', run("分页后"))
+        + '<w:tbl><w:tr><w:tc>' + paragraph(run("单价")) + '</w:tc><w:tc>' + paragraph(run("350")) + '</w:tc></w:tr></w:tbl>'
+        + '<w:p><w:pPr><w:sectPr/></w:pPr>' + run("本节结束") + '</w:p>'
+        + paragraph(run("第三页"))
+    )
+    pages = list(DocxParser().iter_pages(stream=build_docx(body), file_id=3))
+    assert [(page.file_id, page.page) for page in pages] == [(3, 0), (3, 1), (3, 2)]
+    assert pages[0].page_content == "第一页 正文\n分页前"
+    assert pages[1].page_content == "分页后\n单价\n350\n本节结束"
+    assert pages[2].page_content == "第三页"
+
+
+def test_split_long_document_by_size():
+    body = "".join(paragraph(run("段落" * 10)) for _ in range(10))
+    file_document = DocxParser(max_page_chars=50).parse(stream=build_docx(body), file_id=1)
+    pages = list(file_document)
+    assert len(pages) == 4
+    assert all(len(page.page_content.split("\n")) <= 3 for page in pages)
+
+
+def test_invalid_docx():
+    with pytest.raises(ValueError):
+        list(DocxParser().iter_pages(stream=b"not a zip"))
@@ -0,0 +1,51 @@
+from apps.document_parser.header_footer import RepeatedBlockFilter, edge_block_hash
+
+
+def _page(page_num, body):
+    """构造带页眉、页脚（页码）的页面文本块"""
+    return page_num, [
+        ("某某市政道路绿化养护项目 投标文件", edge_block_hash("某某市政道路绿化养护项目 投标文件")),
+        (body, None),
+        (f"-第{page_num + 1}页-", edge_block_hash(f"-第{page_num + 1}页-")),
+    ]
+
+
+def test_edge_block_hash_masks_digits():
+    """
+    测试页码数字不同的页脚哈希相同
+    """
+    assert edge_block_hash("- 第 9 页 -") == edge_block_hash("-第10页-")
+    assert edge_block_hash("第9页") != edge_block_hash("见第9页")
+
+
+def test_repeated_header_footer_dropped():
+    """
+    测试跨页重复的页眉页脚被删除，只出现一次的边缘短文本保留
+    """
+    pages = [_page(page_num, f"正文{page_num}") for page_num in range(10)]
+    pages[4][1].append(("详见第9页", edge_block_hash("详见第9页")))
+    pages.insert(5, (10, None))  # 扫描页原样保留
+    result = list(RepeatedBlockFilter(window=None).filter(pages))
+    assert result[5] == (10, None)
+    texts = [[block[0] for block in blocks] for _, blocks in result if blocks is not None]
+    assert texts[0] == ["正文0"]
+    assert texts[4] == ["正文4", "详见第9页"]
+
+
+def test_streaming_window_matches_full_document():
+    """
+    测试流式窗口统计与整本文档统计结果一致
+    """
+    pages = [_page(page_num, f"正文{page_num}") for page_num in range(40)]
+    full = list(RepeatedBlockFilter(window=None).filter(pages))
+    streaming = list(RepeatedBlockFilter(window=5).filter(pages))
+    assert full == streaming
+
+
+def test_short_document_uses_fallback():
+    """
+    测试页数不足时使用文本特征判断
+    """
+    pages = [_page(0, "正文")]
+    result = list(RepeatedBlockFilter(fallback=lambda text: "页" in text).filter(pages))
+    assert [block[0] for block in result[0][1]] == ["某某市政道路绿化养护项目 投标文件", "正文"]
@@ -0,0 +1,29 @@
+from apps.similarity.merge import merge_chunk_hits
+
+
+def _hit(left_page, left_start, right_page, right_start, similarity=0.9, length=50):
+    return {
+        "left_page": left_page, "left_start_index": left_start, "left_text": "x" * length,
+        "right_page": right_page, "right_start_index": right_start, "right_text": "x" * length,
+        "similarity": similarity,
+    }
+
+
+def test_overlapping_chunk_hits_merge_into_one_span():
+    # 重叠切片（步长45）复制的一整段，右侧偏移300，中间一个切片未命中、一处插入2个字符
+    hits = [_hit(1, start, 3, start + 300) for start in (0, 45, 90, 180, 225)]
+    hits.append(_hit(1, 270, 3, 572))
+    # 同一左切片在右文件另一处的命中单独成为片段
+    hits.append(_hit(1, 45, 3, 2000, 0.86))
+    spans = merge_chunk_hits(hits)
+    assert len(spans) == 2
+    span = spans[0]
+    assert (span["left_start_index"], span["left_end_index"]) == (0, 320)
+    assert (span["right_start_index"], span["right_end_index"]) == (300, 622)
+    assert span["hit_number"] == 6 and abs(span["similarity"] - 0.9) < 1e-9
+    assert (spans[1]["right_start_index"], spans[1]["hit_number"]) == (2000, 1)
+
+
+def test_hits_on_different_pages_are_not_merged():
+    spans = merge_chunk_hits([_hit(1, 0, 2, 0), _hit(1, 45, 3, 45), _hit(2, 0, 2, 0)])
+    assert [(span["left_page"], span["right_page"]) for span in spans] == [(1, 2), (1, 3), (2, 2)]
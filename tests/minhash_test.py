@@ -0,0 +1,45 @@
+import numpy as np
+
+from apps.similarity.minhash import MinHash, MinHashLSH, banded_candidate_pairs, estimate_jaccard, shingle_hashes
+
+BASE = "本项目为道路绿化养护工程，投标人应具备市政园林资质，并在投标文件中提供近三年类似业绩证明材料及人员社保缴纳证明。" * 3
+
+
+def test_signature_estimates_jaccard():
+    minhash = MinHash(128)
+    left = minhash.text_signature(BASE)
+    assert estimate_jaccard(left, minhash.text_signature(BASE)) == 1.0
+    other = minhash.text_signature("施工组织设计包括进度计划、质量保证措施、安全文明施工措施及应急预案等内容。" * 3)
+    assert estimate_jaccard(left, other) < 0.1
+    assert len(shingle_hashes("短")) == 0
+
+
+def test_lsh_candidate_pairs():
+    minhash = MinHash(120)
+    lsh = MinHashLSH(120, 40)
+    lsh.add(1, minhash.text_signature(BASE))
+    lsh.add(2, minhash.text_signature(BASE.replace("三年", "五年")))
+    lsh.add(3, minhash.text_signature("施工组织设计包括进度计划、质量保证措施、安全文明施工措施及应急预案等内容。" * 3))
+    assert lsh.candidate_pairs() == {(1, 2)}
+    assert 0.29 < lsh.threshold < 0.3
+
+
+def test_batch_signatures_and_banded_candidates():
+    minhash = MinHash(32)
+    texts = [
+        "投标保证金应当在投标截止时间前以银行转账方式缴纳",
+        "投标保证金应当在投标截止时间前以银行转账方式缴纳完毕",
+        "施工组织设计包括进度计划与质量保证措施",
+        "",
+        "投标保证金应当在投标截止时间前以银行转账方式缴纳",
+    ]
+    hash_sets = [shingle_hashes(text, 3) for text in texts]
+    signatures = minhash.batch_signatures(hash_sets)
+    for hashes, signature in zip(hash_sets, signatures):
+        assert (signature == minhash.signature(hashes)).all()
+    # 第0、4行属于同一文件，不产生候选
+    left_rows, right_rows = banded_candidate_pairs(signatures, 16, np.array([0, 1, 1, 2, 0]))
+    assert list(zip(left_rows.tolist(), right_rows.tolist())) == [(0, 1), (4, 1)]
+    # 桶过大时不产生候选
+    left_rows, _ = banded_candidate_pairs(signatures, 16, np.array([0, 1, 1, 2, 0]), max_bucket=1)
+    assert len(left_rows) == 0
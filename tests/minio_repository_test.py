@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+from apps.repository.minio_repository import fetch_object_to_file
+
+
+class FakeResponse:
+    def __init__(self, chunks, fail=False):
+        self.chunks = chunks
+        self.fail = fail
+        self.released = False
+
+    def stream(self, amt):
+        yield from self.chunks
+        if self.fail:
+            raise ConnectionError("连接中断")
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeMinio:
+    def __init__(self, response):
+        self.response = response
+
+    def get_object(self, bucket_name, object_name):
+        self.requested = (bucket_name, object_name)
+        return self.response
+
+
+def test_fetch_object_to_file(tmp_path):
+    client = FakeMinio(FakeResponse([b"%PDF-", b"1.7"]))
+    path = fetch_object_to_file(client, "tender", "files/tender/a.pdf", ".pdf", str(tmp_path))
+    assert client.requested == ("tender", "files/tender/a.pdf")
+    assert path.endswith(".pdf")
+    with open(path, "rb") as f:
+        assert f.read() == b"%PDF-1.7"
+    assert client.response.released
+
+
+def test_fetch_object_failure_removes_file(tmp_path):
+    client = FakeMinio(FakeResponse([b"%PDF-"], fail=True))
+    with pytest.raises(ConnectionError):
+        fetch_object_to_file(client, "tender", "files/tender/a.pdf", ".pdf", str(tmp_path))
+    assert os.listdir(tmp_path) == []
+    assert client.response.released
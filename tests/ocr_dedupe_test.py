@@ -0,0 +1,80 @@
+import fitz
+
+from apps.document_parser.ocr import ImageOcrCache
+from apps.document_parser.pdf_parser import OCR_PENDING_PAGES, PdfParser
+
+
+class RecordingOcrPool:
+    """记录识别调用的OCR进程池替身"""
+    pool_size = 1
+    batch_size = 8
+    layout_routed = True
+
+    def __init__(self):
+        self.recognized = 0
+
+    def recognize(self, images):
+        self.recognized += len(images)
+        return [[(0.5, f"识别文本{image.shape[1]}")] for image in images]
+
+
+def scanned_pdf(widths) -> bytes:
+    doc = fitz.open()
+    for width in widths:
+        pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, 20), False)
+        pix.clear_with(200)
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(50, 300, 50 + width, 320), pixmap=pix)
+    return doc.tobytes()
+
+
+def test_same_image_recognized_once_across_documents():
+    ocr_pool = RecordingOcrPool()
+    ocr_cache = ImageOcrCache()
+    parser = PdfParser(ocr_pool=ocr_pool, ocr_cache=ocr_cache)
+    first = [page.page_content for page in parser.iter_pages(stream=scanned_pdf([40, 40, 60]), file_id=1)]
+    second = [page.page_content for page in parser.iter_pages(stream=scanned_pdf([60, 40]), file_id=2)]
+    assert first == ["识别文本40", "识别文本40", "识别文本60"]
+    assert second == ["识别文本60", "识别文本40"]
+    assert ocr_pool.recognized == 2
+
+
+
+class StreamingOcrPool(RecordingOcrPool):
+    batch_size = 1000
+
+
+def mixed_pdf(layout: str) -> bytes:
+    """b 空白页，s 扫描页，其余为文本页"""
+    doc = fitz.open()
+    for index, kind in enumerate(layout):
+        page = doc.new_page()
+        if kind == "s":
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40 + index, 20), False)
+            pix.clear_with(200)
+            page.insert_image(fitz.Rect(50, 300, 90 + index, 320), pixmap=pix)
+    return doc.tobytes()
+
+
+def first_page_after(layout: str):
+    """首个页面产出前读取的页数"""
+    parser = PdfParser(ocr_pool=StreamingOcrPool())
+    doc = fitz.open(stream=mixed_pdf(layout), filetype="pdf")
+    consumed = []
+
+    def source():
+        for page_num, kind in enumerate(layout):
+            consumed.append(page_num)
+            yield page_num, None if kind in "bs" else [(f"text page {page_num}", None)]
+
+    page_num, blocks = next(parser._ocr_scanned_pages(doc, source()))
+    return page_num, blocks, len(consumed)
+
+
+def test_pages_stream_without_waiting_for_ocr_batch():
+    # 空白首页不等待OCR，直接产出
+    assert first_page_after("b" + "t" * 40) == (0, None, 1)
+    # 扫描页之后缓冲的文本页达到上限即提交识别
+    page_num, blocks, consumed = first_page_after("s" + "t" * 40)
+    assert page_num == 0 and blocks[0][0] == "识别文本40"
+    assert consumed == OCR_PENDING_PAGES
@@ -0,0 +1,66 @@
+import os
+
+from apps.document_parser.base import HDocument, HFiledocument
+from apps.document_parser.base_parser import CHUNKING_DOCUMENT
+from apps.document_parser.parse_cache import ParseCache
+from apps.document_parser.pdf_parser import PdfParser
+
+
+def _file_document():
+    top = HFiledocument(1, 0, "第一页内容，投标人须知。")
+    top.next = HFiledocument(1, 1, "第二页内容，技术要求。")
+    return top
+
+
+def test_parse_cache_round_trip(tmp_path):
+    """
+    测试解析缓存写入读取，读取时使用新的文件id
+    """
+    cache = ParseCache(str(tmp_path), 1024 * 1024)
+    documents = [HDocument(1, 0, 0, "第一页内容，"), HDocument(1, 1, 0, "第二页内容，")]
+    assert cache.get("abc", "1", 50, 5) is None
+    cache.put("abc", "1", 50, 5, _file_document(), documents)
+    file_document, cached_documents = cache.get("abc", "1", 50, 5, file_id=7)
+    assert [(node.file_id, node.page, node.page_content) for node in file_document] == [
+        (7, 0, "第一页内容，投标人须知。"), (7, 1, "第二页内容，技术要求。")
+    ]
+    assert [(doc.file_id, doc.page, doc.start_index, doc.text) for doc in cached_documents] == [
+        (7, 0, 0, "第一页内容，"), (7, 1, 0, "第二页内容，")
+    ]
+    # 解析器版本或切片参数不同则不命中
+    assert cache.get("abc", "2", 50, 5) is None
+    assert cache.get("abc", "1", 100, 5) is None
+
+
+def test_parse_cache_lru_eviction(tmp_path):
+    """
+    测试超过容量上限时淘汰最久未访问的缓存
+    """
+    cache = ParseCache(str(tmp_path), 1024 * 1024)
+    cache.put("a", "1", 50, 5, _file_document(), [])
+    entry_size = os.path.getsize(cache._path("a", "1", 50, 5))
+    cache.max_bytes = entry_size * 2
+    cache.put("b", "1", 50, 5, _file_document(), [])
+    # 两个缓存都置为较早的访问时间，再访问a，使b成为最久未访问
+    for content_hash, mtime in (("a", 1000), ("b", 2000)):
+        os.utime(cache._path(content_hash, "1", 50, 5), (mtime, mtime))
+    assert cache.get("a", "1", 50, 5) is not None
+    cache.put("c", "1", 50, 5, _file_document(), [])
+    assert cache.get("b", "1", 50, 5) is None
+    assert cache.get("a", "1", 50, 5) is not None
+    assert cache.get("c", "1", 50, 5) is not None
+
+
+def test_parse_cache_document_chunking(tmp_path):
+    """
+    测试文档级切片缓存，跨页切片按页内偏移量保存，读取时还原
+    """
+    cache = ParseCache(str(tmp_path), 1024 * 1024)
+    file_document = _file_document()
+    documents = PdfParser().document_splitting(file_document, 8, 2)
+    cache.put("abc", "1", 8, 2, file_document, documents, CHUNKING_DOCUMENT)
+    assert cache.get("abc", "1", 8, 2) is None
+    _, cached_documents = cache.get("abc", "1", 8, 2, file_id=7, chunking_mode=CHUNKING_DOCUMENT)
+    assert [(doc.file_id, doc.page, doc.start_index, doc.text) for doc in cached_documents] == [
+        (7, doc.page, doc.start_index, doc.text) for doc in documents
+    ]
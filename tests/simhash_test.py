@@ -0,0 +1,54 @@
+import numpy as np
+
+from apps.similarity.simhash import MultiIndexHashTable, popcount, simhash_fingerprints, SimHashStore, token_hashes
+
+
+def test_simhash_near_duplicates_are_close():
+    texts = [
+        "投标保证金应当在投标截止时间前以银行转账方式缴纳",
+        "投标保证金应当在投标截止时间前以银行转帐方式缴纳",
+        "施工组织设计包括进度计划与质量保证措施",
+        "",
+    ]
+    fingerprints = simhash_fingerprints([token_hashes(text) for text in texts])
+    assert fingerprints[3] == 0
+    near = popcount(fingerprints[:1] ^ fingerprints[1:2])[0]
+    far = popcount(fingerprints[:1] ^ fingerprints[2:3])[0]
+    assert near < far
+    assert popcount(np.array([0, 1, 2 ** 64 - 1], dtype=np.uint64)).tolist() == [0, 1, 64]
+
+
+def test_multi_index_search_matches_full_scan():
+    rng = np.random.default_rng(0)
+    fingerprints = rng.integers(0, 2 ** 63, size=5000, dtype=np.uint64) * np.uint64(2)
+    queries = fingerprints[:50].copy()
+    for column in range(3):
+        queries ^= np.uint64(1) << rng.integers(0, 64, size=50).astype(np.uint64)
+    query_rows, rows, distances = MultiIndexHashTable(fingerprints, 3).search(queries)
+    for index, query in enumerate(queries):
+        expected = np.flatnonzero(popcount(fingerprints ^ query) <= 3)
+        assert rows[query_rows == index].tolist() == expected.tolist()
+    assert (distances <= 3).all()
+
+
+def test_token_hashes_follow_preprocess_text():
+    # 全角、标点、大小写不影响特征，字母数字词整体作为一个特征
+    assert token_hashes("ＧＢ５０３００标准，").tolist() == token_hashes("gb50300 标准").tolist()
+    assert len(token_hashes("GB50300标准")) == 2
+    assert len(token_hashes("，。、（）")) == 0
+
+
+def test_store_restores_index_table(tmp_path):
+    rng = np.random.default_rng(2)
+    fingerprints = rng.integers(0, 2 ** 63, size=300, dtype=np.uint64)
+    index = [(row // 10, row % 10 * 45, row % 10 * 45 + 50) for row in range(300)]
+    store = SimHashStore(str(tmp_path))
+    assert not store.contains(5, "a")
+    store.put(5, "a", fingerprints, index, 3, (320, 20))
+    assert store.contains(5, "a") and not store.contains(5, "b")
+    table, stored_index = store.get(5, "a", 3)
+    assert store.counts(5, "a") == (320, 20)
+    assert stored_index.tolist()[11] == [1, 45, 95]
+    expected = MultiIndexHashTable(fingerprints, 3).search(fingerprints[:20] ^ np.uint64(5))
+    actual = table.search(fingerprints[:20] ^ np.uint64(5))
+    assert all(a.tolist() == e.tolist() for a, e in zip(actual, expected))
@@ -0,0 +1,14 @@
+from apps.service.similarity_service import pop_pair_results
+
+
+def test_reverse_lookup_swaps_sides():
+    results = {(1, 2): [{"left_page": 1, "left_text": "甲", "right_page": 5, "right_text": "乙", "similarity": 0.9}]}
+    records = pop_pair_results(results, 2, 1)
+    assert records == [{"right_page": 1, "right_text": "甲", "left_page": 5, "left_text": "乙", "similarity": 0.9}]
+    assert results == {}
+
+
+def test_empty_hits_are_not_looked_up_in_reverse():
+    results = {(1, 2): [], (2, 1): [{"left_page": 1, "right_page": 2, "similarity": 0.9}]}
+    assert pop_pair_results(results, 1, 2) == []
+    assert (2, 1) in results
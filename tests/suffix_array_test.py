@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+
+from apps.similarity.suffix_array import adjacent_lcp, common_substrings, find_common_spans, suffix_array
+
+
+def test_suffix_array_and_lcp():
+    codes = np.array([ord(c) for c in "banana"])
+    order, ranks = suffix_array(codes)
+    assert order.tolist() == [5, 3, 1, 0, 4, 2]
+    assert adjacent_lcp(order, ranks).tolist() == [1, 3, 0, 0, 2]
+
+
+def test_common_substrings_are_maximal():
+    left = np.array([ord(c) for c in "xxabcdefgyyabcdz"])
+    right = np.array([ord(c) for c in "qabcdefgrrcdz"])
+    left_starts, right_starts, lengths = common_substrings(left, right, 3)
+    assert list(zip(left_starts.tolist(), right_starts.tolist(), lengths.tolist())) == [(2, 1, 7), (11, 1, 4), (13, 10, 3)]
+
+
+def test_common_substrings_report_every_occurrence():
+    # 同一片段在左侧出现三次、右侧出现两次，每一组位置都要报告
+    left = np.array([ord(c) for c in "abcdxabcdyabcd"])
+    right = np.array([ord(c) for c in "abcdzzabcd"])
+    left_starts, right_starts, lengths = common_substrings(left, right, 4)
+    assert sorted(zip(left_starts.tolist(), right_starts.tolist(), lengths.tolist())) == [
+        (left_start, right_start, 4) for left_start in (0, 5, 10) for right_start in (0, 6)
+    ]
+
+
+def test_find_common_spans_offsets():
+    copied = "投标人须知前附表中规定的投标保证金应当在投标截止时间前以银行转账方式缴纳"
+    left = "第一章 招标公告。" + copied + "。其余内容"
+    right = "完全不同的开头，" + copied.replace("投标保证金", "投标 保证金") + "！"
+    spans = find_common_spans(left, right, 20)
+    assert len(spans) == 1
+    assert left[spans[0].left_start:spans[0].left_end] == copied
+    assert right[spans[0].right_start:spans[0].right_end] == copied.replace("投标保证金", "投标 保证金")
+
+
+def test_repetitive_text_is_bounded():
+    # 报价表中大量重复的 0.00 不会展开为平方级的后缀组合
+    left = "甲" * 10 + "0.00 " * 5000
+    right = "乙" * 10 + "0.00 " * 5000
+    start = time.perf_counter()
+    spans = find_common_spans(left, right, 30)
+    assert time.perf_counter() - start < 5
+    assert len(spans) <= 2
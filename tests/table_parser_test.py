@@ -0,0 +1,64 @@
+import fitz
+
+from apps.document_parser.base import HTable
+from apps.document_parser.pdf_parser import PdfParser
+from apps.document_parser.table_parser import match_table_rows, normalize_rows, parse_table_html, TableParser, \
+    template_rows
+
+
+def test_normalize_rows():
+    rows = normalize_rows([["项目 经理", "１２０万"], [None, " "], ["张三", None]])
+    assert rows == [["项目经理", "120万"], ["张三", ""]]
+
+
+def test_parse_table_html():
+    html = "<html><body><table><tr><td colspan=\"2\">报价表</td></tr><tr><td>单价</td><td>1 00</td></tr></table></body></html>"
+    assert parse_table_html(html) == [["报价表", ""], ["单价", "100"]]
+
+
+def test_match_table_rows():
+    left = [HTable(1, 0, 0, [["序号", "名称", "单价"], ["1", "水泥", "350"], ["合计", "", ""]])]
+    right = [HTable(2, 3, 1, [["1", "水泥", "350"], ["合计", "", ""]])]
+    matches = match_table_rows(left, right)
+    assert [(m[0].file_id, m[1], m[2].page, m[3], m[4]) for m in matches] == [(1, 1, 3, 0, 1)]
+
+
+def test_match_table_rows_skips_headers_templates_and_repeats():
+    header = ["序号", "名称", "单价(元)"]
+    left = [HTable(1, 0, 0, [header, ["1", "水泥", "350"], ["2", "砂石", "80"], ["1", "水泥", "350"]])]
+    right = [HTable(2, 0, 0, [header, ["1", "水泥", "350"], ["2", "砂石", "80"]]),
+             HTable(2, 1, 0, [header, ["1", "水泥", "350"]])]
+    matches = match_table_rows(left, right)
+    # 表头行不匹配，重复行每个文件对只记录一次
+    assert [(m[1], m[3], m[4]) for m in matches] == [(1, 1, 2), (2, 2, 1)]
+    tender = [HTable(9, 0, 0, [header, ["2", "砂石", "80"]])]
+    matches = match_table_rows(left, right, excluded_rows=template_rows(tender))
+    assert [m[1] for m in matches] == [1]
+
+
+def _table_pdf() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    for x in (50, 150, 250):
+        page.draw_line((x, 50), (x, 110))
+    for y in (50, 80, 110):
+        page.draw_line((50, y), (250, y))
+    page.insert_text((60, 70), "name")
+    page.insert_text((160, 70), "price")
+    page.insert_text((60, 100), "cement")
+    page.insert_text((160, 100), "350")
+    return doc.tobytes()
+
+
+def test_extract_native_table():
+    tables = TableParser().parse(stream=_table_pdf(), file_id=7)
+    assert len(tables) == 1
+    assert tables[0].file_id == 7 and tables[0].page == 0
+    assert tables[0].rows == [["name", "price"], ["cement", "350"]]
+
+
+def test_tables_collected_during_text_parse():
+    parser = PdfParser(table_parser=TableParser())
+    top = parser.parse(stream=_table_pdf(), file_id=7)
+    assert "cement" in top.page_content
+    assert [(table.page, table.rows) for table in parser.tables] == [(0, [["name", "price"], ["cement", "350"]])]
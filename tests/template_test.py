@@ -0,0 +1,20 @@
+from apps.similarity.template import TemplateIndex
+from apps.similarity.winnowing import WinnowingFingerprint
+
+TENDER = "投标人须知：投标保证金应当在投标截止时间前以银行转账方式缴纳，投标文件应按招标文件规定的格式编制并密封。"
+
+
+def test_template_coverage():
+    template = TemplateIndex.build(TENDER)
+    assert template.coverage("投标保证金应当在投标截止时间前以银行转账方式缴纳") == 1.0
+    assert template.coverage("本公司承诺投入专业养护队伍并配备洒水车两台") == 0.0
+    assert template.coverage("短") == 0.0
+
+
+def test_fingerprint_excludes_template():
+    bid = TENDER + "本公司承诺投入专业养护队伍并配备洒水车两台、修剪机械四套，确保绿化养护质量达标。"
+    template = TemplateIndex.build(TENDER, 13)
+    fingerprint = WinnowingFingerprint.build(bid)
+    kept = fingerprint.select(~template.contains(fingerprint.hashes))
+    assert 0 < len(kept) < len(fingerprint)
+    assert (kept.positions >= len(TENDER) - 12).all()
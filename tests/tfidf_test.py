@@ -0,0 +1,29 @@
+import numpy as np
+
+from apps.similarity.tfidf import TfidfModel, cross_file_sparse_topk, sparse_topk, tokenize
+
+
+def test_tokenize_drops_stop_words_and_folds_radicals():
+    tokens = tokenize("项⽬的投标保证金, 和 ABC")
+    assert "的" not in tokens and "和" not in tokens
+    assert "项目" in tokens and "abc" in tokens
+
+
+def test_rare_terms_weigh_more():
+    documents = [["投标", "文件", "密封"], ["投标", "文件", "递交"], ["投标", "文件", "密封"], ["投标", "文件", "递交"]]
+    matrix = TfidfModel().fit_transform(documents)
+    assert np.allclose(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel(), 1.0)
+    rare = TfidfModel().fit_transform([["投标", "文件", "张三"], ["投标", "文件", "张三"], ["投标", "文件", "递交"],
+                                       ["投标", "文件", "递交"], ["投标", "文件", "递交"], ["投标", "文件", "递交"]])
+    assert (rare[0] @ rare[1].T).toarray()[0, 0] > 0.99
+    assert (rare[0] @ rare[2].T).toarray()[0, 0] < 0.5
+
+
+def test_cross_file_sparse_topk():
+    documents = [["报价", "一百万"], ["工期", "九十天"], ["报价", "一百万"], ["质保", "两年"], ["工期", "九十天", "质保"]]
+    matrix = TfidfModel().fit_transform(documents)
+    results = cross_file_sparse_topk(matrix, [0, 2, 5], 1, 0.5, block_rows=1)
+    left_rows, right_rows, scores = results[(0, 1)]
+    assert list(zip(left_rows.tolist(), right_rows.tolist())) == [(0, 2), (1, 4)]
+    assert np.isclose(scores[0], 1.0)
+    assert len(sparse_topk(matrix[:1], matrix[3:4], 3, 0.1)[0]) == 0
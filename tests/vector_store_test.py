@@ -0,0 +1,50 @@
+import numpy as np
+
+from apps.similarity.dense import QuantizedVectors, block_topk, normalize_rows
+from apps.similarity.vector_store import CompactVectorStore
+
+
+def _rows(vectors):
+    return [
+        {"page": index // 10 + 1, "start_index": index % 10 * 45, "text_content": "x" * 50, "vector": vector.tolist()}
+        for index, vector in enumerate(vectors)
+    ]
+
+
+def test_store_roundtrip_and_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((40, 1024))
+    for dtype, ratio in (("int8", 4), ("float16", 2)):
+        store = CompactVectorStore(str(tmp_path), dtype)
+        assert not store.contains(7, "a")
+        store.put(7, "a", _rows(vectors))
+        assert store.contains(7, "a")
+        # 入库参数变化（如模板过滤、切片参数）后不复用旧向量
+        assert not store.contains(7, "b")
+        assert not store.contains(7, None)
+        stored, index = store.get(7, "a")
+        assert index.tolist()[11] == [2, 45, 95]
+        dense = stored.dequantize() if isinstance(stored, QuantizedVectors) else np.asarray(stored, dtype=np.float32)
+        assert np.allclose(dense, normalize_rows(vectors), atol=0.01)
+        assert normalize_rows(vectors).nbytes / stored.nbytes >= ratio * 0.95
+        store.put(7, "b", _rows(vectors[:5]))
+        assert not store.contains(7, "a")
+        assert len(store.get(7, "b")[1]) == 5
+        store.remove(7)
+        assert not store.contains(7, "b")
+
+
+def test_int8_ranking_matches_float32(tmp_path):
+    rng = np.random.default_rng(1)
+    left = rng.standard_normal((50, 256))
+    # 右侧为左侧加不同强度噪声的副本，相似度梯度明显
+    right = np.concatenate([left + scale * rng.standard_normal(left.shape) for scale in (0.3, 0.6, 1.0)])
+    store = CompactVectorStore(str(tmp_path), "int8")
+    store.put(1, "k", _rows(left))
+    store.put(2, "k", _rows(right))
+    expected = block_topk(normalize_rows(left), normalize_rows(right), 3, 0.0)
+    # 内存预算只够容纳右侧少量行，两侧都按块反量化
+    for memory_budget in (1 << 30, 4 * 256 * 16):
+        actual = block_topk(store.get(1, "k")[0], store.get(2, "k")[0], 3, 0.0, memory_budget=memory_budget)
+        assert actual[1].tolist() == expected[1].tolist()
+        assert np.abs(actual[2] - expected[2]).max() < 0.01
@@ -0,0 +1,42 @@
+from array import array
+
+import numpy as np
+
+from apps.document_parser.base import HChunkList
+from apps.similarity.base import FileText
+from apps.similarity.winnowing import WinnowingFingerprint, kgram_hashes, match_spans, normalize_codes
+
+COPIED = "本项目为道路绿化养护工程，投标人应具备市政园林资质，并在投标文件中提供近三年类似业绩证明材料及人员社保缴纳证明。"
+
+
+def test_normalize_codes():
+    codes, offsets = normalize_codes("Ａb, 中文１")
+    assert "".join(map(chr, codes)) == "ab中文1"
+    assert offsets.tolist() == [0, 1, 4, 5, 6]
+
+
+def test_kgram_hashes_match_substrings():
+    codes, _ = normalize_codes("甲乙丙丁甲乙丙")
+    hashes = kgram_hashes(codes, 3)
+    assert hashes.dtype == np.uint64
+    assert hashes[0] == hashes[4] and len(set(hashes.tolist())) == 4
+
+
+def test_match_spans_near_copy():
+    left = "第一部分与本次采购无关的说明文字。" + COPIED
+    right = "其他供应商自行编写的内容，彼此并不相同。" + COPIED.replace("，", ",").replace("投标人", "投 标 人") + "结尾。"
+    spans = match_spans(WinnowingFingerprint.build(left), WinnowingFingerprint.build(right))
+    assert len(spans) == 1
+    span = spans[0]
+    assert COPIED[10:40] in left[span.left_start:span.left_end]
+    assert "投 标 人" in right[span.right_start:span.right_end]
+    assert match_spans(WinnowingFingerprint.build(left), WinnowingFingerprint.build("完全不同的另一份文件内容" * 5)) == []
+
+
+def test_file_text_locate():
+    chunks = HChunkList()
+    chunks.add_page(1, 0, "第一页")
+    chunks.add_text(1, "第二页 第三页", array("l", [0, 4]), array("l", [1, 2]))
+    file_text = FileText.from_chunks(1, chunks)
+    assert file_text.text == "第一页 第二页 第三页"
+    assert file_text.locate(file_text.text.index("第三页") + 1) == (2, 1)